@@ -0,0 +1,68 @@
+"""Hot-path secondary indexes
+
+Revision ID: 02_hot_path_indexes
+Revises: 01_enhanced_ai
+Create Date: 2026-10-16 10:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '02_hot_path_indexes'
+down_revision: Union[str, None] = '01_enhanced_ai'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+# (index name, table, columns) – must match __table_args__ of the models
+HOT_PATH_INDEXES = [
+    ('ix_applications_status_created_at', 'applications', ['status', 'created_at']),
+    ('ix_applications_user_id', 'applications', ['user_id']),
+    ('ix_users_phone', 'users', ['phone']),
+    ('ix_dialogue_messages_session_created_at', 'dialogue_messages',
+     ['session_id', 'created_at']),
+    ('ix_dialogue_sessions_user_status_activity', 'dialogue_sessions',
+     ['user_id', 'resolution_status', 'last_activity']),
+    ('ix_content_fingerprints_type_created_at', 'content_fingerprints',
+     ['content_type', 'created_at']),
+]
+
+
+def _existing_tables() -> set:
+    return set(sa.inspect(op.get_bind()).get_table_names())
+
+
+def upgrade() -> None:
+    tables = _existing_tables()
+    is_postgres = op.get_context().dialect.name == 'postgresql'
+
+    # CONCURRENTLY не блокирует запись в таблицы, но требует autocommit
+    with op.get_context().autocommit_block():
+        for name, table, columns in HOT_PATH_INDEXES:
+            # content_fingerprints создаётся init_db(), а не миграциями
+            if table not in tables:
+                continue
+            op.create_index(
+                name, table, columns,
+                if_not_exists=True,
+                postgresql_concurrently=is_postgres,
+            )
+
+
+def downgrade() -> None:
+    tables = _existing_tables()
+    is_postgres = op.get_context().dialect.name == 'postgresql'
+
+    with op.get_context().autocommit_block():
+        for name, table, _columns in reversed(HOT_PATH_INDEXES):
+            if table not in tables:
+                continue
+            op.drop_index(
+                name, table_name=table,
+                if_exists=True,
+                postgresql_concurrently=is_postgres,
+            )
@@ -0,0 +1,51 @@
+"""Normalized E.164 phone column for users
+
+Revision ID: 03_users_phone_e164
+Revises: 02_hot_path_indexes
+Create Date: 2026-10-16 12:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+from bot.services.db import backfill_users_phone_e164
+
+
+# revision identifiers, used by Alembic.
+revision: str = '03_users_phone_e164'
+down_revision: Union[str, None] = '02_hot_path_indexes'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    bind = op.get_bind()
+    # init_db() мог уже добавить колонку на работающем инстансе
+    columns = {column['name'] for column in sa.inspect(bind).get_columns('users')}
+    if 'phone_e164' not in columns:
+        op.add_column('users', sa.Column('phone_e164', sa.String(length=16), nullable=True))
+        # один номер – один пользователь, страницами от новых id к старым
+        backfill_users_phone_e164(bind)
+
+    is_postgres = op.get_context().dialect.name == 'postgresql'
+    with op.get_context().autocommit_block():
+        op.create_index(
+            'ux_users_phone_e164', 'users', ['phone_e164'],
+            unique=True,
+            if_not_exists=True,
+            postgresql_concurrently=is_postgres,
+        )
+
+
+def downgrade() -> None:
+    is_postgres = op.get_context().dialect.name == 'postgresql'
+    with op.get_context().autocommit_block():
+        op.drop_index(
+            'ux_users_phone_e164', table_name='users',
+            if_exists=True,
+            postgresql_concurrently=is_postgres,
+        )
+    with op.batch_alter_table('users') as batch_op:
+        batch_op.drop_column('phone_e164')
@@ -0,0 +1,37 @@
+"""Index for keyset pagination of applications
+
+Revision ID: 04_applications_keyset
+Revises: 03_users_phone_e164
+Create Date: 2026-10-16 14:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = '04_applications_keyset'
+down_revision: Union[str, None] = '03_users_phone_e164'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    is_postgres = op.get_context().dialect.name == 'postgresql'
+    with op.get_context().autocommit_block():
+        op.create_index(
+            'ix_applications_created_at_id', 'applications', ['created_at', 'id'],
+            if_not_exists=True,
+            postgresql_concurrently=is_postgres,
+        )
+
+
+def downgrade() -> None:
+    is_postgres = op.get_context().dialect.name == 'postgresql'
+    with op.get_context().autocommit_block():
+        op.drop_index(
+            'ix_applications_created_at_id', table_name='applications',
+            if_exists=True,
+            postgresql_concurrently=is_postgres,
+        )
@@ -4,21 +4,44 @@
 import os
 import sys
 import asyncio
+import hmac
+from datetime import datetime
 
 import fastapi
 import uvicorn
-from fastapi.staticfiles import StaticFiles
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import StreamingResponse
 from bot.services.ai_enhanced import AIEnhancedManager
 from bot.services.db import async_sessionmaker
 from sqlalchemy import text
 from aiohttp import web
-import json
 from bot.services.db import async_sessionmaker, User, Application as AppModel, Category, Payment, Admin
 from sqlalchemy import select, func, desc
 from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup, WebAppInfo
+from telegram.error import RetryAfter
 from telegram.ext import ContextTypes
 from bot.services.pay import create_payment
+from bot.services.category_registry import category_registry
+from bot.services.users import user_service
+from bot.services.write_behind import write_behind
+from bot.services.update_queue import update_queue
+from bot.services.update_dedup import update_dedup
+from bot.services.uploads import (
+    UploadError, close_uploads, read_submission, send_uploads_to_admins,
+    store_uploads, load_stored_uploads, discard_stored_uploads,
+)
+from bot.services.outbox import PartialFailure, outbox
+from bot.services.admin_fanout import admin_fanout
+from bot.services.send_governor import SendPriority, send_governor
+from bot.services.health_snapshot import health_monitor
+from bot.services.static_assets import webapp_static_files
+from bot.utils.fast_json import FastJSONResponse, read_json
+from bot.core.prometheus_metrics import HAS_PROMETHEUS, observe_handlers, render_metrics
+from bot.core.metrics import span, traced
+from bot.services.query_profiler import query_profiler
+from bot.services.exports import EXPORT_FORMATS, iter_applications_export
+from bot.services.application_listing import list_applications
+from bot.config.settings import ADMIN_API_TOKEN, METRICS_TOKEN
 from bot.services.sheets import append_lead
 from bot.services.notifications import notify_client_application_received, notify_client_status_update, notify_client_payment_required
 
@@ -68,7 +91,7 @@ print("✅ Environment variables OK")
 print(f"🔗 Database URL: {os.getenv('DATABASE_URL')[:30]}...")
 
 # Create FastAPI app FIRST - always available for import
-app = fastapi.FastAPI()
+app = fastapi.FastAPI(default_response_class=FastJSONResponse)
 
 # Add CORS middleware for Mini App
 app.add_middleware(
@@ -91,6 +114,8 @@ try:
     async def startup_event():
         """Initialize bot on FastAPI startup"""
         global bot_application
+        # DB / AI checks for /health run in the background, not in probes
+        health_monitor.start()
         try:
             print("🔧 FastAPI Startup: Initializing bot application...")
 
@@ -98,7 +123,7 @@ try:
             from telegram.ext import Application
 
             # Create bot application
-            application = Application.builder().token(TOKEN).build()
+            application = Application.builder().token(TOKEN).rate_limiter(send_governor).build()
 
             # Setup handlers (import from bot.main)
             from bot.main import cmd_start, cmd_admin, universal_callback_handler, post_init
@@ -113,6 +138,7 @@ try:
             from bot.main import ai_chat
             application.add_handler(MessageHandler(
                 filters.TEXT & ~filters.COMMAND, ai_chat))
+            observe_handlers(application)
 
             print("✅ Handlers registered")
 
@@ -134,11 +160,25 @@ try:
             print(
                 f"🔍 Global bot_application initialized: {bot_application is not None}")
 
+            # Resume side-effect jobs left pending by the previous run
+            outbox.wake()
+
         except Exception as e:
             print(f"❌ Bot startup error: {e}")
             import traceback
             traceback.print_exc()
 
+    @app.on_event("shutdown")
+    async def shutdown_event():
+        """Finish queued updates, stop the bot, then flush queued dialogue/analytics rows"""
+        await update_queue.stop()
+        await outbox.stop()
+        await health_monitor.stop()
+        update_dedup.save()
+        if bot_application and bot_application.running:
+            await bot_application.stop()
+        await write_behind.drain()
+
     # ===== API ROUTES FIRST (before static mounts) =====
 
     @app.get("/")
@@ -151,6 +191,8 @@ try:
             "endpoints": {
                 "webapp": "/webapp/",
                 "health": "/health",
+                "liveness": "/health/live",
+                "metrics": "/metrics",
                 "docs": "/docs",
                 "api": "/api/"
             },
@@ -160,25 +202,35 @@ try:
 
     @app.get("/health")
     async def health():
-        ai_manager = AIEnhancedManager()
-        await ai_manager.initialize()
-        ai_health = await ai_manager.health_check()
-
-        async with async_sessionmaker() as session:
-            try:
-                await session.execute(text("SELECT 1"))
-                db_status = "connected"
-            except:
-                db_status = "disconnected"
+        # DB / AI checks come from the background snapshot – probes cost nothing
+        snapshot = health_monitor.get_snapshot()
+        if snapshot["status"] == "starting":
+            return {
+                "status": "starting",
+                "bot_status": "running" if bot_application else "starting",
+                "update_queue": update_queue.get_stats(),
+                "update_dedup": update_dedup.get_stats(),
+                "outbox": outbox.get_stats()
+            }
 
         return {
             "status": "healthy",
             "bot_status": "running",
-            "db_status": db_status,
-            "enhanced_ai_status": "INITIALIZED" if ai_manager._initialized else "NOT INITIALIZED",
-            "enhanced_ai_health": ai_health
+            "db_status": snapshot["db"]["status"],
+            "enhanced_ai_status": "INITIALIZED" if snapshot["ai"]["initialized"] else "NOT INITIALIZED",
+            "enhanced_ai_health": snapshot["ai"]["health"],
+            "checked_at": snapshot["checked_at"],
+            "snapshot_age_seconds": snapshot["age_seconds"],
+            "update_queue": update_queue.get_stats(),
+            "update_dedup": update_dedup.get_stats(),
+            "outbox": outbox.get_stats()
         }
 
+    @app.get("/health/live")
+    async def health_live():
+        """Liveness probe: the process serves requests, no I/O"""
+        return {"status": "alive"}
+
     @app.get("/api/stats")
     async def api_stats():
         return {
@@ -196,23 +248,89 @@ try:
             "ai_requests": 0
         }
 
+    @app.get("/metrics")
+    async def metrics_endpoint(request: fastapi.Request):
+        """Prometheus scrape endpoint (Bearer METRICS_TOKEN when set)"""
+        if METRICS_TOKEN:
+            provided = request.headers.get("Authorization", "").removeprefix("Bearer ")
+            if not hmac.compare_digest(provided, METRICS_TOKEN):
+                raise fastapi.HTTPException(status_code=403, detail="Forbidden")
+        if not HAS_PROMETHEUS:
+            raise fastapi.HTTPException(status_code=503, detail="prometheus-client is not installed")
+
+        # Сбор очередей может читать общий SQLite – не в event loop
+        body, content_type = await asyncio.to_thread(render_metrics)
+        return fastapi.Response(content=body, media_type=content_type)
+
+    def _check_admin_token(request: fastapi.Request):
+        """Admin HTTP API guard: X-Admin-Token must match ADMIN_API_TOKEN"""
+        provided = request.headers.get("X-Admin-Token", "")
+        if not ADMIN_API_TOKEN or not hmac.compare_digest(provided, ADMIN_API_TOKEN):
+            raise fastapi.HTTPException(status_code=403, detail="Forbidden")
+
+    @app.get("/api/admin/export/applications")
+    async def api_export_applications(request: fastapi.Request, format: str = "csv"):
+        """Stream all applications with user and category as CSV or JSONL"""
+        _check_admin_token(request)
+        if format not in EXPORT_FORMATS:
+            raise fastapi.HTTPException(
+                status_code=400, detail=f"format must be one of: {', '.join(EXPORT_FORMATS)}")
+
+        filename = f"applications_{datetime.now():%Y%m%d_%H%M%S}.{format}"
+        return StreamingResponse(
+            iter_applications_export(format),
+            media_type=EXPORT_FORMATS[format],
+            headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+        )
+
+    @app.get("/api/admin/queries")
+    async def api_query_stats(request: fastapi.Request, top: int = 10):
+        """SQL top offenders: slowest statements, N+1 repeats, queries per request"""
+        _check_admin_token(request)
+        return query_profiler.get_stats(top=min(max(top, 1), 100))
+
+    @app.get("/api/admin/applications")
+    async def api_list_applications(
+        request: fastapi.Request,
+        status: str = None,
+        category_id: int = None,
+        assigned_admin: str = None,
+        cursor: str = None,
+        limit: int = 20,
+    ):
+        """Keyset-paginated applications, newest first; pass next_cursor to continue"""
+        _check_admin_token(request)
+        try:
+            page = await list_applications(
+                status=status,
+                category_id=category_id,
+                assigned_admin=assigned_admin,
+                cursor=cursor,
+                limit=limit,
+            )
+        except ValueError as e:
+            raise fastapi.HTTPException(status_code=400, detail=str(e))
+        return page.to_dict()
+
     # Move ai_status to correct path
     @app.get("/api/ai_status")
     async def api_ai_status():
-        ai_manager = AIEnhancedManager()
-        await ai_manager.initialize()
-        return await ai_manager.health_check()
+        snapshot = health_monitor.get_snapshot()
+        if snapshot["status"] == "starting":
+            return snapshot
+        return snapshot["ai"]["health"]
 
     # Add the endpoint that production_test.py expects
     @app.get("/api/ai/status")
     async def api_ai_status_alt():
-        ai_manager = AIEnhancedManager()
-        await ai_manager.initialize()
-        health = await ai_manager.health_check()
+        snapshot = health_monitor.get_snapshot()
+        if snapshot["status"] == "starting":
+            return {"enhanced_ai_initialized": False, "health": "starting", "using_fallback": True}
+        initialized = snapshot["ai"]["initialized"]
         return {
-            "enhanced_ai_initialized": ai_manager._initialized,
-            "health": health.get("status", "unknown"),
-            "using_fallback": not ai_manager._initialized
+            "enhanced_ai_initialized": initialized,
+            "health": snapshot["ai"]["health"].get("status", "unknown"),
+            "using_fallback": not initialized
         }
 
     @app.post("/api/ai_chat_test")
@@ -260,28 +378,32 @@ try:
             return fastapi.Response(status_code=401, content="Unauthorized")
 
         try:
-            data = await request.json()
-            print(f"📨 Received webhook data: {len(str(data))} chars")
-            print(f"🔍 Bot application state: {bot_application is not None}")
-
-            # Process update through bot application
-            if bot_application:
-                update = Update.de_json(data, bot_application.bot)
-                print(
-                    f"📥 Processing update: {update.update_id if update else 'None'}")
-                await bot_application.process_update(update)
-                print("✅ Update processed successfully")
-            else:
-                print("⚠️ Bot application not ready yet - checking global state...")
-                print(
-                    f"⚠️ Global bot_application is None: {bot_application is None}")
+            data = await read_json(request)
+        except Exception as e:
+            print(f"❌ Webhook error: invalid JSON: {e}")
+            return fastapi.Response(status_code=400, content="Bad Request")
 
+        if not bot_application:
+            print("⚠️ Bot application not ready yet - update dropped")
             return fastapi.Response(status_code=200, content="OK")
+
+        try:
+            update = Update.de_json(data, bot_application.bot)
         except Exception as e:
-            print(f"❌ Webhook error: {e}")
-            import traceback
-            print(f"❌ Traceback: {traceback.format_exc()}")
-            return fastapi.Response(status_code=500, content="Error")
+            print(f"❌ Webhook error: malformed update: {e}")
+            return fastapi.Response(status_code=400, content="Bad Request")
+
+        # Повторная доставка того же апдейта (в т.ч. на другой воркер) – подтверждаем и пропускаем
+        if not await update_dedup.accept(update.update_id):
+            return fastapi.Response(status_code=200, content="OK")
+
+        # Обработка идёт в пуле воркеров – Telegram получает ответ сразу
+        if not await update_queue.submit(update, bot_application):
+            # очередь переполнена – Telegram повторит доставку позже
+            await update_dedup.forget(update.update_id)
+            return fastapi.Response(status_code=503, content="Busy")
+
+        return fastapi.Response(status_code=200, content="OK")
 
     # Also handle the exact webhook URL format used
     # ===== MINI APP SUBMIT ENDPOINT (MUST BE BEFORE /{token}) =====
@@ -299,11 +421,25 @@ try:
         )
 
     @app.post("/submit")
+    @traced("submit_application")
     async def submit_application(request: fastapi.Request):
         """Handle Mini App form submissions"""
+        uploads = []
+        stored_files = []
         try:
-            # Parse form data
-            data = await request.json()
+            # Parse form data; files are streamed into spooled temp files
+            try:
+                with span("parse"):
+                    data, uploads = await read_submission(request)
+            except UploadError as e:
+                print(f"❌ Upload rejected: {e.message}")
+                return FastJSONResponse(
+                    status_code=e.status_code,
+                    content={
+                        "status": "error",
+                        "message": e.message
+                    }
+                )
             print(f"📝 Received application data: {data}")
 
             # Validate required fields
@@ -314,13 +450,12 @@ try:
 
             if missing_fields:
                 print(f"❌ Missing required fields: {missing_fields}")
-                return fastapi.Response(
+                return FastJSONResponse(
                     status_code=400,
-                    content=json.dumps({
+                    content={
                         "status": "error",
                         "message": f"Missing required fields: {', '.join(missing_fields)}"
-                    }),
-                    media_type="application/json"
+                    }
                 )
 
             # Extract and validate data
@@ -333,53 +468,41 @@ try:
             email = data.get('email', '')
             contact_method = data.get('contact_method', '')
             contact_time = data.get('contact_time', 'any')
-            files = data.get('files', [])
             tg_user_id = data.get('tg_user_id')
             utm_source = data.get('utm_source')
 
             print(f"👤 Processing application for: {name} ({phone})")
             print(f"📋 Category: {category_name} (ID: {category_id})")
             print(f"📞 Contact: {contact_method} at {contact_time}")
-            print(f"📄 Files: {len(files)} uploaded")
+            print(f"📄 Files: {len(uploads)} uploaded")
 
             # Save to database
             async with async_sessionmaker() as session:
                 try:
-                    # Get or create user
+                    # Get or create user (single atomic upsert by tg_id)
                     user = None
-                    if tg_user_id:
-                        result = await session.execute(
-                            select(User).where(User.tg_id == tg_user_id)
-                        )
-                        user = result.scalar_one_or_none()
-
-                    if not user:
-                        # Create new user with fallback tg_id
-                        fallback_tg_id = tg_user_id if tg_user_id else hash(
-                            phone + name) % 2147483647
-                        user = User(
-                            tg_id=fallback_tg_id,
-                            first_name=name.split()[0] if name else "Unknown",
-                            last_name=" ".join(name.split()[1:]) if len(
-                                name.split()) > 1 else "",
-                            phone=phone,
-                            email=email
-                        )
-                        session.add(user)
-                        await session.flush()  # Get user.id
-                        print(f"✅ Created new user: {user.id}")
+                    fallback_tg_id = tg_user_id
+                    if not fallback_tg_id:
+                        # Web form without Telegram: attach to the user with this phone,
+                        # but never change their profile from unauthenticated form data
+                        with span("user.find_by_phone"):
+                            user = await user_service.find_by_phone(session, phone)
+                        fallback_tg_id = hash(phone + name) % 2147483647
+                    if user is None:
+                        name_parts = name.split()
+                        with span("user.upsert"):
+                            user = await user_service.upsert_user(
+                                session,
+                                fallback_tg_id,
+                                first_name=name_parts[0] if name_parts else "",
+                                last_name=" ".join(name_parts[1:]),
+                                phone=phone,
+                                email=email,
+                                defaults={"first_name": "Unknown"},
+                            )
+                        print(f"✅ Upserted user: {user.id}")
                     else:
-                        # Update existing user
-                        if name:
-                            name_parts = name.split()
-                            user.first_name = name_parts[0]
-                            user.last_name = " ".join(name_parts[1:]) if len(
-                                name_parts) > 1 else ""
-                        if phone:
-                            user.phone = phone
-                        if email:
-                            user.email = email
-                        print(f"✅ Updated existing user: {user.id}")
+                        print(f"✅ Matched existing user by phone: {user.id}")
 
                     # Create application
                     application = AppModel(
@@ -394,55 +517,21 @@ try:
                         status="new"
                     )
                     session.add(application)
-                    await session.flush()  # Get application.id
+                    with span("application.insert"):
+                        await session.flush()  # Get application.id
 
                     print(f"✅ Created application: #{application.id}")
 
                     # Handle files if any
-                    files_info = []
-                    if files:
-                        for i, file_data in enumerate(files):
-                            filename = file_data.get('name', f'file_{i+1}')
-                            file_size = len(file_data.get(
-                                'data', '')) if file_data.get('data') else 0
-                            files_info.append(
-                                f"{filename} ({file_size} bytes)")
+                    if uploads:
+                        files_info = [
+                            f"{upload.filename} ({upload.size} bytes)" for upload in uploads]
 
                         # Add files info to application notes
                         application.notes = f"Uploaded files: {', '.join(files_info)}"
-                        print(f"📎 Processed {len(files)} files")
-
-                    await session.commit()
-
-                    # Try to add to Google Sheets
-                    try:
-                        # Fetch the category object
-                        category_result = await session.execute(
-                            select(Category).where(Category.id == category_id)
-                        )
-                        category = category_result.scalar_one_or_none()
-                        
-                        # append_lead is not async, so don't await it
-                        append_lead(application, user, category)
-                        print("✅ Added to Google Sheets")
-                    except Exception as e:
-                        print(f"⚠️ Failed to add to Google Sheets: {e}")
-
-                    # Try to send notifications
-                    try:
-                        await notify_client_application_received(user, application)
-                        print("✅ Client notification sent")
-                    except Exception as e:
-                        print(f"⚠️ Failed to send client notification: {e}")
-
-                    # Try to notify admins via Telegram
-                    try:
-                        await notify_admins_new_application(user, application, data)
-                        print("✅ Admin notification sent")
-                    except Exception as e:
-                        print(f"⚠️ Failed to send admin notification: {e}")
+                        print(f"📎 Processed {len(uploads)} files")
 
-                    # Try to create payment if needed
+                    # Payment link is built locally (no I/O) – keep it in the response
                     payment_url = None
                     try:
                         # Define prices for categories (you can adjust these)
@@ -472,11 +561,28 @@ try:
                         else:
                             print("⚠️ Payment system disabled or not configured")
 
-                        await session.commit()
-
                     except Exception as e:
                         print(f"⚠️ Failed to create payment: {e}")
 
+                    # Side effects run after commit in outbox workers (with retries):
+                    # Google Sheets, client notification, admin messages + files
+                    with span("uploads.store", files=len(uploads)):
+                        stored_files = await store_uploads(uploads)
+                    outbox.enqueue(session, "submit.sheets",
+                                   {"application_id": application.id})
+                    outbox.enqueue(session, "submit.client_notification",
+                                   {"application_id": application.id})
+                    outbox.enqueue(session, "submit.admin_notification", {
+                        "application_id": application.id,
+                        "form_data": data,
+                        "files": stored_files,
+                    })
+
+                    with span("commit"):
+                        await session.commit()
+                    outbox.wake()
+                    print(f"📬 Queued side effects for application #{application.id}")
+
                     # Return success response
                     return {
                         "status": "ok",
@@ -487,17 +593,17 @@ try:
 
                 except Exception as e:
                     await session.rollback()
+                    discard_stored_uploads(stored_files)
                     print(f"❌ Database error: {e}")
                     import traceback
                     print(f"❌ Traceback: {traceback.format_exc()}")
 
-                    return fastapi.Response(
+                    return FastJSONResponse(
                         status_code=500,
-                        content=json.dumps({
+                        content={
                             "status": "error",
                             "message": "Ошибка при сохранении заявки"
-                        }),
-                        media_type="application/json"
+                        }
                     )
 
         except Exception as e:
@@ -505,21 +611,22 @@ try:
             import traceback
             print(f"❌ Traceback: {traceback.format_exc()}")
 
-            return fastapi.Response(
+            return FastJSONResponse(
                 status_code=500,
-                content=json.dumps({
+                content={
                     "status": "error",
                     "message": "Внутренняя ошибка сервера"
-                }),
-                media_type="application/json"
+                }
             )
+        finally:
+            close_uploads(uploads)
 
     # ===== CLIENT NOTIFICATION ENDPOINT =====
     @app.post("/notify-client")
     async def notify_client_telegram(request: fastapi.Request):
         """Send Telegram notification to client about application status"""
         try:
-            data = await request.json()
+            data = await read_json(request)
             application_id = data.get('application_id')
             user_data = data.get('user_data', {})
 
@@ -538,11 +645,7 @@ try:
                     # Look for user by phone first
                     user = None
                     if phone:
-                        result = await session.execute(
-                            select(User).where(User.phone.like(
-                                f"%{phone.replace(' ', '').replace('-', '').replace('(', '').replace(')', '')}%"))
-                        )
-                        user = result.scalar_one_or_none()
+                        user = await user_service.find_by_phone(session, phone)
 
                     if not user and name:
                         # Look for user by name
@@ -576,11 +679,11 @@ try:
 Спасибо за обращение! 🙏
 """
 
-                        await bot_application.bot.send_message(
+                        await send_governor.send(user.tg_id, lambda: bot_application.bot.send_message(
                             chat_id=user.tg_id,
                             text=message,
                             parse_mode='Markdown'
-                        )
+                        ), SendPriority.USER_REPLY)
 
                         print(
                             f"✅ Sent Telegram notification to user {user.tg_id} for application #{application_id}")
@@ -599,20 +702,23 @@ try:
             return {"status": "error", "message": "Notification failed"}
 
     # ===== ADMIN NOTIFICATION FUNCTION =====
-    async def notify_admins_new_application(user, application, form_data):
-        """Send notification to ALL admins about new Mini App application"""
+    async def notify_admins_new_application(user, application, form_data, uploads=(), admin_ids=None):
+        """Send notification to ALL admins (or admin_ids) about new Mini App application.
+
+        Returns admin_id -> error for admins that did not get the message or a file.
+        """
         if not bot_application:
-            print("⚠️ Bot application not initialized, cannot send admin notification")
-            return
+            raise RuntimeError("Bot application not initialized")
 
         import os
         from datetime import datetime
 
-        # Получаем всех администраторов
-        from bot.main import ADMIN_USERS
-        if not ADMIN_USERS:
+        # Получаем всех администраторов (кэш с TTL)
+        if admin_ids is None:
+            admin_ids = await admin_fanout.get_admin_ids()
+        if not admin_ids:
             print("⚠️ No admin users configured, cannot send admin notification")
-            return
+            return {}
 
         # Format contact method
         contact_methods = {
@@ -654,24 +760,11 @@ try:
 🕐 **Время подачи:** {datetime.now().strftime('%d.%m.%Y %H:%M')}
 """
 
-        if form_data.get('files'):
-            admin_text += f"\n📎 **Файлы:** {len(form_data['files'])} шт."
+        if uploads:
+            admin_text += f"\n📎 **Файлы:** {len(uploads)} шт."
 
-        # Отправляем уведомление ВСЕМ администраторам
-        for admin_id in ADMIN_USERS:
-            try:
-                await bot_application.bot.send_message(
-                    chat_id=admin_id,
-                    text=admin_text,
-                    parse_mode='Markdown'
-                )
-                print(f"✅ Sent admin notification to {admin_id}")
-            except Exception as e:
-                print(
-                    f"❌ Failed to send admin notification to {admin_id}: {e}")
-                # Попробуем без Markdown если есть проблемы с форматированием
-                try:
-                    simple_text = f"""
+        # Без Markdown – если есть проблемы с форматированием
+        simple_text = f"""
 НОВАЯ ЗАЯВКА ИЗ MINI APP
 
 Клиент: {form_data.get('name', 'Не указано')}
@@ -689,47 +782,95 @@ Email: {form_data.get('email', 'Не указан') or 'Не указан'}
 ID заявки: #{application.id}
 Время: {datetime.now().strftime('%d.%m.%Y %H:%M')}
 """
-                    await bot_application.bot.send_message(
-                        chat_id=admin_id,
-                        text=simple_text
-                    )
-                    print(f"✅ Sent simple admin notification to {admin_id}")
-                except Exception as e2:
-                    print(
-                        f"❌ Failed to send simple admin notification to {admin_id}: {e2}")
-
-        # Теперь отправляем файлы ВСЕМ администраторам
-        if form_data.get('files'):
-            for admin_id in ADMIN_USERS:
-                for i, file_data in enumerate(form_data['files']):
-                    try:
-                        if file_data.get('data') and file_data.get('name'):
-                            # Декодируем base64 данные файла
-                            import base64
-                            file_bytes = base64.b64decode(file_data['data'])
 
-                            # Создаем caption для файла
-                            file_caption = f"""📁 **ФАЙЛ ОТ КЛИЕНТА**
+        async def send_to_admin(admin_id):
+            try:
+                await bot_application.bot.send_message(
+                    chat_id=admin_id,
+                    text=admin_text,
+                    parse_mode='Markdown'
+                )
+            except RetryAfter:
+                raise  # send_governor дождётся и повторит
+            except Exception as e:
+                print(
+                    f"❌ Failed to send admin notification to {admin_id}: {e}")
+                # вторая отправка – send_governor выдаст ей отдельное разрешение
+                await bot_application.bot.send_message(
+                    chat_id=admin_id,
+                    text=simple_text
+                )
+
+        # Отправляем уведомление ВСЕМ администраторам параллельно
+        result = await admin_fanout.run(send_to_admin, admin_ids)
+        failed = dict(result.failed)
+        print(
+            f"✅ Admin notification: {len(result.delivered)} delivered, {len(result.failed)} failed")
+
+        # Теперь отправляем файлы ВСЕМ администраторам:
+        # каждый файл загружается в Telegram один раз, остальным – по file_id
+        if uploads:
+            def file_caption(upload):
+                return f"""📁 **ФАЙЛ ОТ КЛИЕНТА**
 
 👤 **Клиент:** {form_data.get('name', 'Не указано')}
 📱 **Телефон:** {form_data.get('phone', 'Не указан')}
 📋 **Заявка:** #{application.id}
-📄 **Файл:** {file_data['name']}
-📊 **Размер:** {len(file_bytes)} байт"""
-
-                            # Отправляем файл администратору
-                            await bot_application.bot.send_document(
-                                chat_id=admin_id,
-                                document=file_bytes,
-                                filename=file_data['name'],
-                                caption=file_caption,
-                                parse_mode='Markdown'
-                            )
-                            print(
-                                f"✅ Sent file {file_data['name']} to admin {admin_id}")
-                    except Exception as e:
-                        print(
-                            f"❌ Failed to send file to admin {admin_id}: {e}")
+📄 **Файл:** {upload.filename}
+📊 **Размер:** {upload.size} байт"""
+
+            files_result = await send_uploads_to_admins(
+                bot_application.bot, admin_ids, uploads, caption=file_caption)
+            failed.update(files_result.failed)
+            print(f"✅ Files: {len(files_result.delivered)} admins got all {len(uploads)}, "
+                  f"{len(files_result.failed)} failed")
+
+        return failed
+
+    # ===== SUBMIT SIDE EFFECTS (OUTBOX JOBS) =====
+    async def _load_submitted_application(application_id):
+        """Application and its user for an outbox job"""
+        async with async_sessionmaker() as session:
+            application = await session.get(AppModel, application_id)
+            if application is None:
+                raise LookupError(f"Application #{application_id} not found")
+            user = await session.get(User, application.user_id)
+            return application, user
+
+    @outbox.handler("submit.sheets")
+    async def submit_sheets_job(payload):
+        application, user = await _load_submitted_application(payload["application_id"])
+        category = await category_registry.get(application.category_id)
+        # gspread is synchronous – keep it off the event loop
+        await asyncio.to_thread(append_lead, application, user, category, True)
+        print(f"✅ Added application #{application.id} to Google Sheets")
+
+    @outbox.handler("submit.client_notification")
+    async def submit_client_notification_job(payload):
+        application, user = await _load_submitted_application(payload["application_id"])
+        failed = await notify_client_application_received(user, application, payload.get("channels"))
+        if failed:
+            # повтор – только по каналам, которые не сработали
+            raise PartialFailure(f"Client notification failed: {failed}",
+                                 {**payload, "channels": sorted(failed)})
+        print(f"✅ Client notification sent for application #{application.id}")
+
+    @outbox.handler("submit.admin_notification")
+    async def submit_admin_notification_job(payload):
+        if not bot_application:
+            # бот ещё не поднят – задача повторится позже
+            raise RuntimeError("Bot application not initialized")
+        application, user = await _load_submitted_application(payload["application_id"])
+        files = payload.get("files") or []
+        failed = await notify_admins_new_application(
+            user, application, payload.get("form_data") or {}, load_stored_uploads(files),
+            admin_ids=payload.get("admin_ids"))
+        if failed:
+            # файлы остаются на диске до повтора – только для тех, кому не дошло
+            raise PartialFailure(f"Not delivered to admins {sorted(failed)}: {next(iter(failed.values()))}",
+                                 {**payload, "admin_ids": sorted(failed)})
+        discard_stored_uploads(files)
+        print(f"✅ Admin notification sent for application #{application.id}")
 
     # ===== TELEGRAM WEBHOOK WILDCARD (AFTER ALL SPECIFIC ROUTES) =====
     @app.post("/{token}")
@@ -737,8 +878,9 @@ ID заявки: #{application.id}
         return await handle_telegram_webhook(token, request)
 
     # ===== STATIC MOUNTS LAST =====
-    app.mount("/webapp", StaticFiles(directory="webapp", html=True), name="webapp")
-    app.mount("/admin", StaticFiles(directory="webapp", html=True), name="admin")
+    # built assets (manage.py build-assets) when present: precompressed + immutable caching
+    app.mount("/webapp", webapp_static_files("webapp"), name="webapp")
+    app.mount("/admin", webapp_static_files("webapp"), name="admin")
 
     async def main():
         global bot_application
@@ -756,7 +898,7 @@ ID заявки: #{application.id}
             print("🔧 Starting bot setup...")
 
             # Import and setup the bot application
-            application = Application.builder().token(TOKEN).build()
+            application = Application.builder().token(TOKEN).rate_limiter(send_governor).build()
 
             # Store globally for webhook access - FIX: proper global assignment
             bot_application = application
@@ -776,6 +918,7 @@ ID заявки: #{application.id}
             from bot.main import ai_chat
             application.add_handler(MessageHandler(
                 filters.TEXT & ~filters.COMMAND, ai_chat))
+            observe_handlers(application)
 
             print("✅ Handlers registered")
 
@@ -5,8 +5,7 @@ All environment variables and constants should be defined here.
 """
 
 import os
-from typing import Set, Dict, Any
-from collections import defaultdict
+from typing import Dict, Any
 
 # ================ CORE CONFIGURATION ================
 
@@ -26,8 +25,7 @@ DEBUG_MODE = os.getenv("DEBUG", "false").lower() == "true"
 
 RATE_LIMIT_REQUESTS = 10  # requests
 RATE_LIMIT_WINDOW = 60    # seconds
-user_request_counts = defaultdict(list)  # user_id -> [timestamps]
-blocked_users: Set[int] = set()
+RATE_LIMIT_EVICT_INTERVAL = float(os.getenv("RATE_LIMIT_EVICT_INTERVAL", "60"))  # purge idle users in shared state
 
 # ================ AUTOPOST SETTINGS ================
 
@@ -52,6 +50,12 @@ if admin_ids_str:
 ADDITIONAL_ADMINS = {6373924442, 439952839}  # Known admin users
 ADMIN_USERS.update(ADDITIONAL_ADMINS)
 
+# Token for admin HTTP API (exports, listings); endpoints are disabled when unset
+ADMIN_API_TOKEN = os.getenv("ADMIN_API_TOKEN")
+
+# Bearer token for the Prometheus /metrics endpoint; open when unset
+METRICS_TOKEN = os.getenv("METRICS_TOKEN")
+
 # ================ WEB APP SETTINGS ================
 
 # Web application URLs  
@@ -108,9 +112,82 @@ MAX_CALLBACK_DATA_LENGTH = 64
 REQUEST_TIMEOUT = 30  # seconds
 DATABASE_TIMEOUT = 10  # seconds
 
+# ================ DATABASE POOL ================
+
+# Connection pool sizing (ignored for SQLite)
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "10"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "20"))
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))  # seconds
+DB_POOL_TIMEOUT = int(os.getenv("DB_POOL_TIMEOUT", str(DATABASE_TIMEOUT)))  # seconds
+
+# asyncpg prepared statement cache (per connection)
+DB_STATEMENT_CACHE_SIZE = int(os.getenv("DB_STATEMENT_CACHE_SIZE", "500"))
+
+# tg_id → users.id LRU (bot.services.users)
+USER_ID_CACHE_SIZE = int(os.getenv("USER_ID_CACHE_SIZE", "10000"))
+
+# Write-behind queue for dialogue/analytics rows (bot.services.write_behind)
+WRITE_BEHIND_BATCH_SIZE = int(os.getenv("WRITE_BEHIND_BATCH_SIZE", "200"))
+WRITE_BEHIND_FLUSH_INTERVAL = float(os.getenv("WRITE_BEHIND_FLUSH_INTERVAL", "1.0"))  # seconds
+WRITE_BEHIND_MAX_QUEUE = int(os.getenv("WRITE_BEHIND_MAX_QUEUE", "10000"))
+
+# Rows fetched per server-side cursor round trip in exports (bot.services.exports)
+EXPORT_BATCH_SIZE = int(os.getenv("EXPORT_BATCH_SIZE", "1000"))
+
+# Webhook intake: bounded update queue + worker pool (bot.services.update_queue)
+UPDATE_QUEUE_MAX_SIZE = int(os.getenv("UPDATE_QUEUE_MAX_SIZE", "1000"))
+UPDATE_WORKERS = int(os.getenv("UPDATE_WORKERS", "8"))
+UPDATE_CHAT_LEASE = float(os.getenv("UPDATE_CHAT_LEASE", "300"))  # shared backend: a stuck chat turn expires after this
+
+# PTB Application: parallel handlers, serialized per user (bot.services.update_processor)
+UPDATE_CONCURRENCY = int(os.getenv("UPDATE_CONCURRENCY", "8"))
+UPDATE_WAIT_WARN_MS = float(os.getenv("UPDATE_WAIT_WARN_MS", "5000"))  # log updates that queued longer
+
+# Outbound Telegram sends: global + per-chat buckets, priority lanes (bot.services.send_governor)
+SEND_GLOBAL_RATE = float(os.getenv("SEND_GLOBAL_RATE", "25"))  # messages/s for the whole bot
+SEND_GLOBAL_BURST = int(os.getenv("SEND_GLOBAL_BURST", "5"))
+SEND_CHAT_RATE = float(os.getenv("SEND_CHAT_RATE", "1"))  # messages/s per private chat
+SEND_CHAT_BURST = int(os.getenv("SEND_CHAT_BURST", "3"))
+SEND_GROUP_RATE_PER_MINUTE = float(os.getenv("SEND_GROUP_RATE_PER_MINUTE", "20"))  # groups and channels
+SEND_MAX_RETRIES = int(os.getenv("SEND_MAX_RETRIES", "3"))  # retries after RetryAfter
+
+# Recent update_id window for dropping Telegram redeliveries (bot.services.update_dedup)
+UPDATE_DEDUP_CAPACITY = int(os.getenv("UPDATE_DEDUP_CAPACITY", "10000"))
+UPDATE_DEDUP_STATE_FILE = os.getenv("UPDATE_DEDUP_STATE_FILE")  # optional, survives restarts
+UPDATE_DEDUP_TTL = float(os.getenv("UPDATE_DEDUP_TTL", "86400"))  # shared backend: seconds an update_id is kept
+
+# Post-commit side effects of /submit: outbox table + workers (bot.services.outbox)
+OUTBOX_WORKERS = int(os.getenv("OUTBOX_WORKERS", "2"))
+OUTBOX_MAX_ATTEMPTS = int(os.getenv("OUTBOX_MAX_ATTEMPTS", "8"))
+OUTBOX_RETRY_BASE = float(os.getenv("OUTBOX_RETRY_BASE", "5.0"))  # seconds, doubled per attempt
+OUTBOX_RETRY_MAX = float(os.getenv("OUTBOX_RETRY_MAX", "3600.0"))
+OUTBOX_POLL_INTERVAL = float(os.getenv("OUTBOX_POLL_INTERVAL", "5.0"))
+OUTBOX_LEASE_SECONDS = float(os.getenv("OUTBOX_LEASE_SECONDS", "300.0"))  # crashed worker's job is retried after this
+OUTBOX_FILES_DIR = os.getenv("OUTBOX_FILES_DIR", "outbox_files")  # uploads waiting for delivery to admins
+
+# Admin notifications: concurrent sends + cached admin list (bot.services.admin_fanout)
+ADMIN_FANOUT_CONCURRENCY = int(os.getenv("ADMIN_FANOUT_CONCURRENCY", "10"))
+ADMIN_LIST_CACHE_TTL = float(os.getenv("ADMIN_LIST_CACHE_TTL", "300"))  # seconds
+
+# /health snapshot refreshed in background (bot.services.health_snapshot)
+HEALTH_REFRESH_INTERVAL = float(os.getenv("HEALTH_REFRESH_INTERVAL", "30"))  # seconds
+HEALTH_CHECK_TIMEOUT = float(os.getenv("HEALTH_CHECK_TIMEOUT", "10"))  # per check
+
+# Output of `python manage.py build-assets` (bot.services.static_assets)
+STATIC_BUILD_DIR = os.getenv("STATIC_BUILD_DIR", "static_build")
+
+# Shared state for multi-worker deployments (bot.services.state_backend)
+STATE_BACKEND = os.getenv("STATE_BACKEND", "memory")  # memory | sqlite
+STATE_DB_PATH = os.getenv("STATE_DB_PATH", "shared_state.db")  # SQLite WAL file shared by workers
+
 # File upload limits
 MAX_FILE_SIZE = 10 * 1024 * 1024  # 10MB
-ALLOWED_FILE_TYPES = {'.pdf', '.doc', '.docx', '.txt', '.jpg', '.png'}
+ALLOWED_FILE_TYPES = {'.pdf', '.doc', '.docx', '.txt', '.jpg', '.jpeg', '.png'}
+
+# Streaming /submit uploads (bot.services.uploads)
+UPLOAD_MAX_FILES = int(os.getenv("UPLOAD_MAX_FILES", "5"))
+UPLOAD_SPOOL_SIZE = int(os.getenv("UPLOAD_SPOOL_SIZE", str(1024 * 1024)))  # bytes kept in RAM before spilling to disk
+UPLOAD_MAX_FIELD_SIZE = int(os.getenv("UPLOAD_MAX_FIELD_SIZE", str(64 * 1024)))  # non-file form fields
 
 # ================ MONITORING ================
 
@@ -124,6 +201,15 @@ SYSTEM_METRICS = {
     "start_time": None,
 }
 
+# Request traces (bot.core.metrics): log the span breakdown of slower requests
+TRACE_SLOW_MS = float(os.getenv("TRACE_SLOW_MS", "3000"))
+TRACE_MAX_SPANS = int(os.getenv("TRACE_MAX_SPANS", "500"))  # per request, extra spans are counted as dropped
+
+# SQL per request (bot.services.query_profiler): flag requests over budget or repeating a statement (N+1)
+QUERY_BUDGET = int(os.getenv("QUERY_BUDGET", "25"))
+QUERY_REPEAT_THRESHOLD = int(os.getenv("QUERY_REPEAT_THRESHOLD", "5"))
+QUERY_STATS_MAX_STATEMENTS = int(os.getenv("QUERY_STATS_MAX_STATEMENTS", "500"))  # distinct normalized statements kept
+
 # ================ LOGGING CONFIGURATION ================
 
 LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO")
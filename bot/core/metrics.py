@@ -2,15 +2,24 @@
 """
 System metrics and monitoring functionality.
 Tracks bot performance and usage statistics.
+
+Request tracing: `trace()` / `MetricsContext` start a span tree for one
+request, `span()` times a step inside it, `record_span()` adds a step timed
+elsewhere (DB cursor events, AI provider calls, Bot API requests). Requests
+slower than TRACE_SLOW_MS log their per-span breakdown as one JSON line.
 """
 
+import json
 import time
 import logging
 from datetime import datetime
-from typing import Dict, Any
+from typing import Dict, Any, Callable, List, Optional
+from contextlib import contextmanager
+from contextvars import ContextVar
 from dataclasses import dataclass, field
+from functools import wraps
 
-from bot.config.settings import SYSTEM_METRICS
+from bot.config.settings import SYSTEM_METRICS, TRACE_SLOW_MS, TRACE_MAX_SPANS
 
 logger = logging.getLogger(__name__)
 
@@ -134,20 +143,259 @@ def log_request_metrics(user_id: int, request_type: str, success: bool, duration
     if request_type == "ai":
         increment_ai_requests()
 
+# ================ TRACING ================
+#
+# Trace = дерево span'ов одного запроса (апдейт, /submit, AI-ответ).
+# Текущий span живёт в contextvar, поэтому вложенные вызовы, await и
+# asyncio.create_task/gather автоматически пишут в нужное место дерева.
+# Без активного trace span() и record_span() ничего не делают.
+
+_current_trace: ContextVar[Optional["Trace"]] = ContextVar("current_trace", default=None)
+_current_span: ContextVar[Optional["Span"]] = ContextVar("current_span", default=None)
+# вызываются при завершении каждого корневого trace
+_trace_end_hooks: List[Callable[["Trace"], None]] = []
+
+
+class Span:
+    """One timed step of a trace"""
+    __slots__ = ("name", "attrs", "started", "ended", "children")
+
+    def __init__(self, name: str, attrs: Dict[str, Any], started: float, ended: Optional[float] = None):
+        self.name = name
+        self.attrs = attrs
+        self.started = started
+        self.ended = ended
+        self.children: List["Span"] = []
+
+    @property
+    def duration_ms(self) -> float:
+        ended = self.ended if self.ended is not None else time.perf_counter()
+        return (ended - self.started) * 1000
+
+
+class Trace:
+    """Span tree of one request"""
+
+    def __init__(self, name: str, attrs: Dict[str, Any]):
+        self.root = Span(name, attrs, time.perf_counter())
+        self.span_count = 0
+        self.dropped = 0
+        # данные других подсистем за время запроса (например, счётчики SQL)
+        self.extras: Dict[str, Any] = {}
+
+    def add(self, parent: Span, name: str, attrs: Dict[str, Any],
+            started: float, ended: Optional[float] = None) -> Optional[Span]:
+        if self.span_count >= TRACE_MAX_SPANS:
+            self.dropped += 1
+            return None
+        node = Span(name, attrs, started, ended)
+        parent.children.append(node)
+        self.span_count += 1
+        return node
+
+    def breakdown(self) -> Dict[str, Any]:
+        """Time per span path (`ai_chat/db.SELECT`), aggregated over repeats"""
+        paths: Dict[str, Dict[str, Any]] = {}
+
+        def walk(node: Span, prefix: str) -> None:
+            for child in node.children:
+                path = f"{prefix}{child.name}"
+                ms = child.duration_ms
+                entry = paths.setdefault(path, {"span": path, "count": 0, "total_ms": 0.0, "max_ms": 0.0})
+                entry["count"] += 1
+                entry["total_ms"] += ms
+                entry["max_ms"] = max(entry["max_ms"], ms)
+                if "error" in child.attrs:
+                    entry["error"] = child.attrs["error"]
+                walk(child, f"{path}/")
+
+        walk(self.root, "")
+        total_ms = self.root.duration_ms
+        # параллельные дочерние span'ы могут в сумме превышать родителя
+        covered_ms = sum(child.duration_ms for child in self.root.children)
+        return {
+            "trace": self.root.name,
+            **self.root.attrs,
+            "total_ms": round(total_ms, 1),
+            "unaccounted_ms": round(max(0.0, total_ms - covered_ms), 1),
+            "spans": [
+                {**entry, "total_ms": round(entry["total_ms"], 1), "max_ms": round(entry["max_ms"], 1)}
+                for entry in paths.values()
+            ],
+            "dropped_spans": self.dropped,
+        }
+
+
+class span:
+    """Child span of the current trace: `with span("db.commit"):` or `async with`"""
+
+    def __init__(self, name: str, **attrs):
+        self.name = name
+        self.attrs = attrs
+        self._node: Optional[Span] = None
+        self._token = None
+
+    def __enter__(self) -> "span":
+        trace = _current_trace.get()
+        parent = _current_span.get()
+        if trace is not None and parent is not None:
+            self._node = trace.add(parent, self.name, self.attrs, time.perf_counter())
+            if self._node is not None:
+                self._token = _current_span.set(self._node)
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        if self._node is not None:
+            self._node.ended = time.perf_counter()
+            if exc_type is not None:
+                self._node.attrs["error"] = exc_type.__name__
+            _current_span.reset(self._token)
+
+    async def __aenter__(self) -> "span":
+        return self.__enter__()
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        self.__exit__(exc_type, exc_val, exc_tb)
+
+
+class trace(span):
+    """Root of a new trace, or a child span when one is already active.
+
+    The root logs its per-span breakdown when it took longer than
+    TRACE_SLOW_MS.
+    """
+
+    def __init__(self, name: str, **attrs):
+        super().__init__(name, **attrs)
+        self.trace: Optional[Trace] = None
+        self._tokens = None
+
+    def __enter__(self) -> "trace":
+        if _current_trace.get() is not None:
+            super().__enter__()
+            return self
+        self.trace = Trace(self.name, self.attrs)
+        self._tokens = (_current_trace.set(self.trace), _current_span.set(self.trace.root))
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        if self.trace is None:
+            super().__exit__(exc_type, exc_val, exc_tb)
+            return
+        root = self.trace.root
+        root.ended = time.perf_counter()
+        if exc_type is not None:
+            root.attrs["error"] = exc_type.__name__
+        trace_token, span_token = self._tokens
+        _current_span.reset(span_token)
+        _current_trace.reset(trace_token)
+
+        for hook in _trace_end_hooks:
+            try:
+                hook(self.trace)
+            except Exception as e:
+                logger.error(f"Trace end hook failed: {e}")
+
+        if root.duration_ms >= TRACE_SLOW_MS:
+            logger.warning(
+                f"🐢 Slow {root.name}: {root.duration_ms:.0f} ms "
+                f"{json.dumps(self.trace.breakdown(), ensure_ascii=False, default=str)}")
+
+
+def traced(name: str):
+    """Decorator: run an async function inside `trace(name)`"""
+    def decorator(func):
+        @wraps(func)
+        async def wrapper(*args, **kwargs):
+            with trace(name):
+                return await func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def record_span(name: str, seconds: float, **attrs) -> None:
+    """Add an already finished step (e.g. timed by a driver hook) to the current trace"""
+    trace_ = _current_trace.get()
+    parent = _current_span.get()
+    if trace_ is None or parent is None:
+        return
+    ended = time.perf_counter()
+    trace_.add(parent, name, attrs, ended - seconds, ended)
+
+
+def current_trace() -> Optional[Trace]:
+    """Trace of the running request, if any"""
+    return _current_trace.get()
+
+
+def on_trace_end(hook: Callable[[Trace], None]) -> None:
+    """Call hook(trace) whenever a root trace finishes"""
+    _trace_end_hooks.append(hook)
+
+
 class MetricsContext:
-    """Context manager for tracking request metrics"""
+    """Context manager for tracking request metrics.
+
+    Opens a trace (or a child span inside an active one) named after
+    request_type; works with `with` and `async with`.
+    """
     
     def __init__(self, user_id: int, request_type: str):
         self.user_id = user_id
         self.request_type = request_type
         self.start_time = None
         self.success = False
+        self._failed = False
+        self._trace = trace(request_type, user_id=user_id)
+    
+    def mark_failed(self):
+        """Count the request as failed although no exception escaped"""
+        self._failed = True
     
     def __enter__(self):
         self.start_time = time.time()
+        self._trace.__enter__()
         return self
     
     def __exit__(self, exc_type, exc_val, exc_tb):
         duration = time.time() - self.start_time
-        self.success = exc_type is None
-        log_request_metrics(self.user_id, self.request_type, self.success, duration)
\ No newline at end of file
+        self.success = exc_type is None and not self._failed
+        self._trace.__exit__(exc_type, exc_val, exc_tb)
+        log_request_metrics(self.user_id, self.request_type, self.success, duration)
+    
+    async def __aenter__(self):
+        return self.__enter__()
+    
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        self.__exit__(exc_type, exc_val, exc_tb)
+
+
+class StartupTimer:
+    """Collects durations of startup phases and logs one summary line"""
+    
+    def __init__(self, name: str):
+        self.name = name
+        self.phases: Dict[str, float] = {}
+        self.start_time = time.perf_counter()
+    
+    @contextmanager
+    def phase(self, phase_name: str):
+        """Time one phase: `with timer.phase("create_all"): ...`"""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.phases[phase_name] = (time.perf_counter() - started) * 1000
+    
+    def total_ms(self) -> float:
+        """Elapsed time since the timer was created"""
+        return (time.perf_counter() - self.start_time) * 1000
+    
+    def summary(self) -> str:
+        """`name 120ms: a=10ms, b=110ms`"""
+        parts = ", ".join(f"{name}={ms:.0f}ms" for name, ms in self.phases.items())
+        return f"{self.name} {self.total_ms():.0f}ms: {parts}"
+    
+    def log(self):
+        """Write the breakdown to the log"""
+        logger.info(f"⏱️ Startup timing – {self.summary()}")
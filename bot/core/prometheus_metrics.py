@@ -0,0 +1,259 @@
+#!/usr/bin/env python3
+"""
+Prometheus metrics: latency histograms and queue depths for /metrics.
+
+    bot_update_handler_seconds{handler, status}       PTB handler callbacks
+    bot_ai_request_seconds{provider, model, status}   one call per AI provider
+    bot_db_query_seconds{operation}                   every SQL statement
+    bot_telegram_api_seconds{method, status}          every Bot API request
+    bot_telegram_send_wait_seconds{lane}              wait for a send_governor permit
+    bot_queue_depth{queue}                            sampled on every scrape
+    bot_request_queries{trace}                        SQL statements per request
+    bot_query_flags_total{trace, kind}                query budget / N+1 flags
+
+The last two (and the top-statement counters) are fed by
+bot.services.query_profiler.
+
+The lifetime counters of bot.core.metrics stay as they are; these are the
+series to graph and alert on. The same hooks feed the request trace of
+bot.core.metrics: every handler call is a trace, DB statements, AI calls
+and Bot API requests become its spans. Without prometheus-client the
+histograms are no-ops (spans are still recorded) and /metrics answers 503.
+
+With several web workers set PROMETHEUS_MULTIPROC_DIR (an empty directory
+shared by the workers); histograms are then aggregated across processes.
+Queue depths come from the shared state backend, so any worker reports them.
+
+Usage:
+    from bot.core.prometheus_metrics import observe_handlers, register_queue_depth
+
+    observe_handlers(application)           # after all add_handler calls
+    register_queue_depth("publisher", lambda: len(publisher.publish_queue))
+    body, content_type = render_metrics()
+"""
+
+import logging
+import os
+import time
+from contextlib import contextmanager
+from functools import wraps
+from typing import Any, Callable, Dict, Iterator, List, Tuple
+
+from bot.core.metrics import record_span, span, trace
+
+try:
+    from prometheus_client import (
+        CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, Counter, Histogram, generate_latest,
+    )
+    from prometheus_client.core import GaugeMetricFamily
+    from prometheus_client import multiprocess
+except ImportError:
+    Histogram = None
+
+logger = logging.getLogger(__name__)
+
+__all__ = [
+    "HAS_PROMETHEUS",
+    "UPDATE_HANDLER_LATENCY",
+    "AI_REQUEST_LATENCY",
+    "DB_QUERY_LATENCY",
+    "TELEGRAM_API_LATENCY",
+    "TELEGRAM_SEND_WAIT",
+    "REQUEST_QUERIES",
+    "QUERY_FLAGS",
+    "observe_handlers",
+    "observe_ai_request",
+    "observe_telegram_request",
+    "instrument_engine",
+    "register_queue_depth",
+    "register_collector",
+    "render_metrics",
+]
+
+HAS_PROMETHEUS = Histogram is not None
+
+# от быстрых SQL-запросов до долгих ответов AI
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+class _NoopMetric:
+    """Stand-in when prometheus-client is not installed"""
+
+    def labels(self, *args, **kwargs):
+        return self
+
+    def observe(self, amount: float) -> None:
+        pass
+
+    def inc(self, amount: float = 1) -> None:
+        pass
+
+
+def _histogram(name: str, documentation: str, labelnames: Tuple[str, ...],
+               buckets: Tuple[float, ...] = LATENCY_BUCKETS):
+    if not HAS_PROMETHEUS:
+        return _NoopMetric()
+    return Histogram(name, documentation, labelnames, buckets=buckets)
+
+
+def _counter(name: str, documentation: str, labelnames: Tuple[str, ...]):
+    if not HAS_PROMETHEUS:
+        return _NoopMetric()
+    return Counter(name, documentation, labelnames)
+
+
+UPDATE_HANDLER_LATENCY = _histogram(
+    "bot_update_handler_seconds", "Telegram update handler latency", ("handler", "status"))
+AI_REQUEST_LATENCY = _histogram(
+    "bot_ai_request_seconds", "AI provider request latency", ("provider", "model", "status"))
+DB_QUERY_LATENCY = _histogram(
+    "bot_db_query_seconds", "Database statement latency", ("operation",))
+TELEGRAM_API_LATENCY = _histogram(
+    "bot_telegram_api_seconds", "Telegram Bot API request latency", ("method", "status"))
+TELEGRAM_SEND_WAIT = _histogram(
+    "bot_telegram_send_wait_seconds", "Wait for an outbound send permit", ("lane",))
+REQUEST_QUERIES = _histogram(
+    "bot_request_queries", "SQL statements per request", ("trace",),
+    buckets=(1, 2, 5, 10, 20, 50, 100, 200, 500))
+QUERY_FLAGS = _counter(
+    "bot_query_flags", "Requests over the query budget or repeating one statement", ("trace", "kind"))
+
+
+# -------- handlers ----------
+
+def _timed_callback(callback: Callable, name: str) -> Callable:
+    @wraps(callback)
+    async def wrapper(update, context):
+        started = time.perf_counter()
+        status = "ok"
+        user = getattr(update, "effective_user", None)
+        try:
+            with trace(f"handler.{name}", user_id=user.id if user else None):
+                return await callback(update, context)
+        except Exception:
+            status = "error"
+            raise
+        finally:
+            UPDATE_HANDLER_LATENCY.labels(name, status).observe(time.perf_counter() - started)
+
+    wrapper._prometheus_timed = True
+    return wrapper
+
+
+def observe_handlers(application) -> int:
+    """Wrap the callback of every registered handler; returns number wrapped"""
+    wrapped = 0
+    for handlers in application.handlers.values():
+        for handler in handlers:
+            callback = getattr(handler, "callback", None)
+            # ConversationHandler и т.п. без собственного callback – пропускаем
+            if callback is None or getattr(callback, "_prometheus_timed", False):
+                continue
+            handler.callback = _timed_callback(callback, getattr(callback, "__name__", type(handler).__name__))
+            wrapped += 1
+    return wrapped
+
+
+# -------- AI / Telegram ----------
+
+def observe_ai_request(provider: str, model: str, seconds: float, success: bool) -> None:
+    """Record one provider call (fallback attempts are recorded separately)"""
+    AI_REQUEST_LATENCY.labels(provider, model, "ok" if success else "error").observe(seconds)
+    record_span(f"ai.{provider}", seconds, model=model, success=success)
+
+
+@contextmanager
+def observe_telegram_request(method: str) -> Iterator[None]:
+    """Time one Bot API request: `with observe_telegram_request("sendMessage"): ...`"""
+    started = time.perf_counter()
+    status = "ok"
+    try:
+        with span(f"telegram.{method}"):
+            yield
+    except Exception as e:
+        status = type(e).__name__  # RetryAfter, BadRequest, TimedOut, ...
+        raise
+    finally:
+        TELEGRAM_API_LATENCY.labels(method, status).observe(time.perf_counter() - started)
+
+
+# -------- database ----------
+
+def _operation(statement: str) -> str:
+    words = statement.lstrip().split(None, 1)
+    return words[0].upper() if words else "OTHER"
+
+
+def instrument_engine(engine) -> None:
+    """Time every statement of an (async) SQLAlchemy engine"""
+    from sqlalchemy import event
+
+    sync_engine = getattr(engine, "sync_engine", engine)
+
+    @event.listens_for(sync_engine, "before_cursor_execute")
+    def _before(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_started", []).append(time.perf_counter())
+
+    @event.listens_for(sync_engine, "after_cursor_execute")
+    def _after(conn, cursor, statement, parameters, context, executemany):
+        started = conn.info["query_started"].pop()
+        operation = _operation(statement)
+        seconds = time.perf_counter() - started
+        DB_QUERY_LATENCY.labels(operation).observe(seconds)
+        record_span(f"db.{operation}", seconds)
+
+    @event.listens_for(sync_engine, "handle_error")
+    def _error(exception_context):
+        conn = exception_context.connection
+        if conn is not None and conn.info.get("query_started"):
+            conn.info["query_started"].pop()
+
+
+# -------- scrape-time collectors ----------
+
+# коллекторы, которые считают значения при каждом scrape (и в multiprocess-режиме)
+_live_collectors: List[Any] = []
+
+
+def register_collector(collector) -> None:
+    """Add a collector (object with collect()) evaluated on every scrape"""
+    if not HAS_PROMETHEUS:
+        return
+    _live_collectors.append(collector)
+    REGISTRY.register(collector)
+
+
+_queue_depths: Dict[str, Callable[[], int]] = {}
+
+
+def register_queue_depth(name: str, depth: Callable[[], int]) -> None:
+    """Report depth() as bot_queue_depth{queue=name} on every scrape"""
+    _queue_depths[name] = depth
+
+
+class _QueueDepthCollector:
+    def collect(self):
+        family = GaugeMetricFamily("bot_queue_depth", "Items waiting in internal queues", labels=["queue"])
+        for name, depth in list(_queue_depths.items()):
+            try:
+                family.add_metric([name], float(depth()))
+            except Exception as e:
+                logger.warning(f"⚠️ Queue depth {name} unavailable: {e}")
+        yield family
+
+
+register_collector(_QueueDepthCollector())
+
+
+def render_metrics() -> Tuple[bytes, str]:
+    """Exposition body and content type for /metrics"""
+    if not HAS_PROMETHEUS:
+        raise RuntimeError("prometheus-client is not installed")
+
+    if os.getenv("PROMETHEUS_MULTIPROC_DIR"):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        for collector in _live_collectors:
+            registry.register(collector)
+        return generate_latest(registry), CONTENT_TYPE_LATEST
+    return generate_latest(REGISTRY), CONTENT_TYPE_LATEST
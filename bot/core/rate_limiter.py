@@ -2,87 +2,168 @@
 """
 Rate limiting functionality for the bot.
 Prevents spam and abuse by limiting requests per user.
+
+GCRA (generic cell rate algorithm): every user is one float – the
+theoretical arrival time (TAT) of their next request. A request is allowed
+while TAT is less than RATE_LIMIT_WINDOW ahead of now, so a user may burst
+RATE_LIMIT_REQUESTS requests and then one more every
+RATE_LIMIT_WINDOW / RATE_LIMIT_REQUESTS seconds. Checks and records are O(1).
+
+A user whose TAT is in the past is indistinguishable from a new one, so the
+entry is dropped: in process memory entries are kept in update order and a
+few expired ones are evicted from the front on every record; in the shared
+state backend the entry's TTL does the same and expired rows are purged
+every RATE_LIMIT_EVICT_INTERVAL seconds. Handlers use the async
+`check_rate_limit` / `record_user_request`, which run the shared-backend
+reads and writes in a thread instead of on the event loop.
+
+Benchmark: `python manage.py bench-rate-limiter`.
 """
 
+import asyncio
 import time
 import logging
-from typing import Dict, List
-from collections import defaultdict
+from collections import OrderedDict
+from typing import Callable, Dict, Optional
 
-from bot.config.settings import (
-    RATE_LIMIT_REQUESTS, RATE_LIMIT_WINDOW, 
-    user_request_counts, blocked_users
-)
+from bot.config.settings import RATE_LIMIT_REQUESTS, RATE_LIMIT_WINDOW, RATE_LIMIT_EVICT_INTERVAL
+from bot.services.state_backend import SharedDict, StateBackend, state_backend
 
 logger = logging.getLogger(__name__)
 
+# сколько просроченных записей вытеснять за один record_request
+EVICT_BATCH = 64
+
 class RateLimiter:
-    """Rate limiting for user requests"""
-    
-    def __init__(self):
-        self.request_counts = user_request_counts
-        self.blocked_users = blocked_users
-        
+    """GCRA rate limiting for user requests, one float of state per user"""
+
+    def __init__(self, requests: int = RATE_LIMIT_REQUESTS, window: float = RATE_LIMIT_WINDOW,
+                 backend: Optional[StateBackend] = None, clock: Callable[[], float] = time.time):
+        self.window = window
+        self.emission_interval = window / requests
+        self.clock = clock
+        backend = backend or state_backend
+
+        # user_id -> TAT
+        self.shared = backend.name != "memory"
+        if self.shared:
+            self._tats = SharedDict("rate_limit.tat", backend, ttl=window)
+        else:
+            self._tats: "OrderedDict[int, float]" = OrderedDict()
+        self._backend = backend
+        self.blocked_users = SharedDict("rate_limit.blocked", backend)
+
+        self._last_purge = clock()
+        self.limited = 0
+        self.evicted = 0
+
+    def _tat(self, user_id: int, now: float) -> float:
+        tat = self._tats.get(user_id)
+        return now if tat is None or tat < now else tat
+
     def is_rate_limited(self, user_id: int) -> bool:
         """Check if user is rate limited"""
         if user_id in self.blocked_users:
             return True
-            
-        current_time = time.time()
-        user_requests = self.request_counts[user_id]
-        
-        # Remove old requests outside the time window
-        cutoff_time = current_time - RATE_LIMIT_WINDOW
-        user_requests[:] = [req_time for req_time in user_requests if req_time > cutoff_time]
-        
-        # Check if user exceeded the limit
-        if len(user_requests) >= RATE_LIMIT_REQUESTS:
+
+        # Следующий запрос сдвинет TAT дальше окна – лимит исчерпан
+        now = self.clock()
+        if self._tat(user_id, now) + self.emission_interval - now > self.window:
+            self.limited += 1
             logger.warning(f"Rate limit exceeded for user {user_id}")
             return True
-            
+
         return False
-    
+
     def record_request(self, user_id: int) -> None:
         """Record a request for rate limiting"""
-        if user_id not in self.blocked_users:
-            self.request_counts[user_id].append(time.time())
-    
+        if user_id in self.blocked_users:
+            return
+
+        now = self.clock()
+
+        def advance(tat: Optional[float]) -> float:
+            tat = now if tat is None or tat < now else tat
+            # не дальше окна: запросы сверх лимита не продлевают блокировку бесконечно
+            return min(tat + self.emission_interval, now + self.window)
+
+        if self.shared:
+            self._tats.modify(user_id, advance)
+        else:
+            tat = advance(self._tats.pop(user_id, None))
+            self._tats[user_id] = tat  # в конец – порядок по времени обновления
+
+        self.evict_idle(now, limit=EVICT_BATCH)
+
+    def evict_idle(self, now: Optional[float] = None, limit: Optional[int] = None) -> int:
+        """Drop users whose TAT has passed; returns number evicted"""
+        now = self.clock() if now is None else now
+
+        if self.shared:
+            if now - self._last_purge < RATE_LIMIT_EVICT_INTERVAL:
+                return 0
+            self._last_purge = now
+            evicted = self._backend.purge_expired()
+        else:
+            # Старейшие обновления – в начале; TAT <= обновление + окно,
+            # поэтому остановка на первой живой записи задерживает остальные не дольше окна
+            evicted = 0
+            while self._tats and (limit is None or evicted < limit):
+                user_id, tat = next(iter(self._tats.items()))
+                if tat > now:
+                    break
+                self._tats.popitem(last=False)
+                evicted += 1
+
+        self.evicted += evicted
+        return evicted
+
+    async def ais_rate_limited(self, user_id: int) -> bool:
+        """is_rate_limited() off the event loop for a blocking backend"""
+        if self._backend.blocking:
+            return await asyncio.to_thread(self.is_rate_limited, user_id)
+        return self.is_rate_limited(user_id)
+
+    async def arecord_request(self, user_id: int) -> None:
+        """record_request() off the event loop for a blocking backend"""
+        if self._backend.blocking:
+            await asyncio.to_thread(self.record_request, user_id)
+        else:
+            self.record_request(user_id)
+
     def block_user(self, user_id: int) -> None:
         """Block user from making requests"""
-        self.blocked_users.add(user_id)
+        self.blocked_users[user_id] = True
         logger.warning(f"User {user_id} has been blocked")
-    
+
     def unblock_user(self, user_id: int) -> None:
         """Unblock user"""
-        self.blocked_users.discard(user_id)
+        self.blocked_users.pop(user_id, None)
         logger.info(f"User {user_id} has been unblocked")
-    
+
     def get_user_request_count(self, user_id: int) -> int:
-        """Get current request count for user"""
-        current_time = time.time()
-        user_requests = self.request_counts[user_id]
-        
-        # Remove old requests
-        cutoff_time = current_time - RATE_LIMIT_WINDOW
-        user_requests[:] = [req_time for req_time in user_requests if req_time > cutoff_time]
-        
-        return len(user_requests)
-    
+        """Requests currently counted against the user (0..RATE_LIMIT_REQUESTS)"""
+        now = self.clock()
+        backlog = self._tat(user_id, now) - now
+        return int(-(-backlog // self.emission_interval))  # ceil
+
     def get_stats(self) -> Dict:
         """Get rate limiting statistics"""
         return {
-            "active_users": len(self.request_counts),
+            "active_users": len(self._tats),
             "blocked_users": len(self.blocked_users),
-            "total_requests": sum(len(reqs) for reqs in self.request_counts.values())
+            "limited_requests": self.limited,
+            "evicted_users": self.evicted,
+            "backend": self._backend.name,
         }
 
 # Global rate limiter instance
 rate_limiter = RateLimiter()
 
-def check_rate_limit(user_id: int) -> bool:
+async def check_rate_limit(user_id: int) -> bool:
     """Convenience function to check rate limit"""
-    return rate_limiter.is_rate_limited(user_id)
+    return await rate_limiter.ais_rate_limited(user_id)
 
-def record_user_request(user_id: int) -> None:
+async def record_user_request(user_id: int) -> None:
     """Convenience function to record request"""
-    rate_limiter.record_request(user_id)
\ No newline at end of file
+    await rate_limiter.arecord_request(user_id)
@@ -13,8 +13,9 @@ from telegram.ext import Application, CommandHandler, CallbackQueryHandler, Mess
 from telegram.constants import ParseMode
 from sqlalchemy import select, func
 
-from bot.services.db import async_sessionmaker, User, Application as AppModel
+from bot.services.db import readonly_sessionmaker, User, Application as AppModel
 from bot.services.autopost_unified import autopost_system
+from bot.services.category_registry import category_registry
 from bot.config.settings import ADMIN_USERS, TARGET_CHANNEL_ID, is_admin
 from bot.core.metrics import get_system_stats
 
@@ -74,7 +75,8 @@ async def admin_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
 async def show_stats(query, context):
     """Показать базовую статистику"""
     try:
-        async with async_sessionmaker() as session:
+        # отчётные запросы – на реплику (или основную БД, если реплики нет)
+        async with readonly_sessionmaker() as session:
             # Пользователи
             users_count = await session.execute(select(func.count(User.id)))
             total_users = users_count.scalar()
@@ -257,6 +259,20 @@ async def system_menu(query, context):
         logger.error(f"Error showing system info: {e}")
         await query.edit_message_text("❌ Ошибка получения системной информации")
 
+# ================ КАТЕГОРИИ ================
+
+async def cmd_reload_categories(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Сброс кэша категорий после ручного редактирования"""
+    user = update.effective_user
+    
+    if not is_admin(user.id):
+        await update.message.reply_text("❌ Доступ запрещен")
+        return
+    
+    category_registry.invalidate()
+    categories = await category_registry.all()
+    await update.message.reply_text(f"✅ Категории перезагружены: {len(categories)}")
+
 # ================ НАВИГАЦИЯ ================
 
 async def back_to_main(query, context):
@@ -282,6 +298,7 @@ def register_simple_admin_handlers(app: Application):
     
     # Команды
     app.add_handler(CommandHandler("admin", cmd_admin))
+    app.add_handler(CommandHandler("reload_categories", cmd_reload_categories))
     
     # Callbacks
     app.add_handler(CallbackQueryHandler(
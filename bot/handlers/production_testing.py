@@ -10,6 +10,7 @@ from telegram.ext import Application, CommandHandler, ContextTypes
 
 from bot.config.settings import is_admin
 from bot.core.metrics import get_system_stats
+from bot.services.query_profiler import query_profiler
 
 logger = logging.getLogger(__name__)
 
@@ -31,8 +32,42 @@ async def cmd_test_system(update: Update, context: ContextTypes.DEFAULT_TYPE):
     except Exception as e:
         await update.message.reply_text(f"❌ Ошибка тестирования: {e}")
 
+async def cmd_query_stats(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """SQL-запросы: самые тяжёлые выражения и запросы с N+1 / превышением бюджета"""
+    user = update.effective_user
+    
+    if not is_admin(user.id):
+        await update.message.reply_text("❌ Доступ запрещен")
+        return
+    
+    stats = query_profiler.get_stats(top=5)
+    lines = [
+        f"🗄️ SQL: {stats['total_queries']} запросов, "
+        f"бюджет {stats['budget']} на запрос, повтор ≥ {stats['repeat_threshold']}",
+        "",
+        "⏱️ Топ по суммарному времени:",
+    ]
+    for item in stats["top_statements"]:
+        lines.append(f"• {item['total_ms']:.0f} ms, {item['calls']}× (avg {item['avg_ms']} ms) – {item['sql']}")
+    
+    lines += ["", "📊 Запросов SQL на обработку:"]
+    for item in stats["top_requests"]:
+        lines.append(f"• {item['trace']}: avg {item['avg_queries']}, max {item['max_queries']}, "
+                     f"помечено {item['flagged']} из {item['requests']}")
+    
+    if stats["recent_flags"]:
+        lines += ["", "🔁 Последние срабатывания:"]
+        for flag in stats["recent_flags"]:
+            worst = flag["repeated"][0] if flag["repeated"] else None
+            detail = f"{worst['times']}× {worst['sql']}" if worst else "превышен бюджет"
+            lines.append(f"• {flag['trace']}: {flag['queries']} SQL – {detail}")
+    
+    # SQL содержит * и _ – без parse_mode; лимит сообщения Telegram 4096
+    await update.message.reply_text("\n".join(lines)[:4000])
+
 def register_production_testing_handlers(app: Application):
     """Регистрация минимального тестирования"""
     app.add_handler(CommandHandler("test", cmd_test_system))
+    app.add_handler(CommandHandler("queries", cmd_query_stats))
     
     logger.info("✅ Minimal testing handlers registered")
\ No newline at end of file
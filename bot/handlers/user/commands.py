@@ -15,9 +15,11 @@ from typing import Dict, Any
 from telegram import Update, MenuButtonWebApp, WebAppInfo, InlineKeyboardButton, InlineKeyboardMarkup
 from telegram.ext import ContextTypes
 from telegram.constants import ParseMode
-from sqlalchemy import select
 
-from bot.services.db import async_sessionmaker, User, Application as AppModel, Category, Admin
+from bot.services.db import async_sessionmaker, Application as AppModel
+from bot.services.admin_fanout import admin_fanout
+from bot.services.users import user_service
+from bot.services.category_registry import category_registry
 from bot.services.sheets import append_lead
 from bot.services.ai_unified import unified_ai_service, AIModel
 from bot.services.legal_expert_ai import world_class_legal_ai, LegalCase, LegalCategory, ConsultationType
@@ -34,11 +36,10 @@ logger.info("🚫 Enhanced AI FORCE DISABLED - using only natural AI conversatio
 from bot.services.notifications import notify_client_application_received
 from bot.config.settings import (
     ADMIN_USERS, WEBAPP_URL, TARGET_CHANNEL_USERNAME,
-    RATE_LIMIT_REQUESTS, RATE_LIMIT_WINDOW, 
-    user_request_counts, blocked_users, SYSTEM_METRICS
+    RATE_LIMIT_REQUESTS, RATE_LIMIT_WINDOW, SYSTEM_METRICS
 )
 from bot.core.rate_limiter import check_rate_limit, record_user_request
-from bot.core.metrics import increment_total_requests, increment_successful_requests, increment_failed_requests, increment_ai_requests
+from bot.core.metrics import increment_total_requests, increment_successful_requests, increment_failed_requests, increment_ai_requests, span, traced
 from bot.utils.helpers import extract_user_info, format_datetime, format_phone_number
 
 logger = logging.getLogger(__name__)
@@ -62,7 +63,7 @@ async def cmd_start(update: Update, context: ContextTypes.DEFAULT_TYPE):
     try:
         # Record metrics
         increment_total_requests()
-        record_user_request(user.id)
+        await record_user_request(user.id)
         
         # Set menu button with webapp
         try:
@@ -78,27 +79,12 @@ async def cmd_start(update: Update, context: ContextTypes.DEFAULT_TYPE):
         # Register/update user in database
         try:
             async with async_sessionmaker() as session:
-                result = await session.execute(select(User).where(User.tg_id == user.id))
-                existing_user = result.scalar_one_or_none()
-                
-                if existing_user:
-                    # Update existing user
-                    existing_user.first_name = user.first_name or existing_user.first_name
-                    existing_user.last_name = user.last_name or existing_user.last_name
-                    existing_user.username = user.username or existing_user.username
-                    existing_user.last_activity = datetime.now()
-                else:
-                    # Create new user
-                    new_user = User(
-                        tg_id=user.id,
-                        first_name=user.first_name or "Пользователь",
-                        last_name=user.last_name or "",
-                        username=user.username or "",
-                        preferred_contact="telegram",
-                        last_activity=datetime.now()
-                    )
-                    session.add(new_user)
-                
+                await user_service.upsert_user_id(
+                    session,
+                    user.id,
+                    first_name=user.first_name,
+                    last_name=user.last_name,
+                )
                 await session.commit()
                 logger.info(f"✅ User {user.id} registered/updated in database")
         except Exception as e:
@@ -144,6 +130,7 @@ async def cmd_start(update: Update, context: ContextTypes.DEFAULT_TYPE):
 
 # ================ AI CHAT HANDLERS ================
 
+@traced("ai_chat")
 async def ai_chat(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """💬 AI CONVERSATION WITH MEMORY"""
     
@@ -160,7 +147,7 @@ async def ai_chat(update: Update, context: ContextTypes.DEFAULT_TYPE):
         from bot.services.simple_memory import simple_memory
         
         # Check rate limiting
-        if check_rate_limit(user.id):
+        if await check_rate_limit(user.id):
             await update.message.reply_text(
                 f"⏰ Превышен лимит запросов ({RATE_LIMIT_REQUESTS} запросов в {RATE_LIMIT_WINDOW} секунд). "
                 "Подождите немного и попробуйте снова."
@@ -171,10 +158,11 @@ async def ai_chat(update: Update, context: ContextTypes.DEFAULT_TYPE):
         logger.info(f"💬 AI CONVERSATION for user {user.id}: {message_text[:50]}...")
         increment_total_requests()
         increment_ai_requests()
-        record_user_request(user.id)
+        await record_user_request(user.id)
         
         # Get conversation history for context
-        history = await simple_memory.get_conversation_history(user.id)
+        with span("memory.history"):
+            history = await simple_memory.get_conversation_history(user.id)
         logger.info(f"📚 Retrieved {len(history)} previous messages for user {user.id}")
         
         # Prepare messages with conversation context
@@ -208,18 +196,21 @@ async def ai_chat(update: Update, context: ContextTypes.DEFAULT_TYPE):
         })
         
         # Generate AI response with conversation context
-        response = await unified_ai_service.generate_simple_response(
-            messages=messages,
-            model=AIModel.GPT_4O_MINI,
-            max_tokens=1000
-        )
+        with span("ai.generate"):
+            response = await unified_ai_service.generate_simple_response(
+                messages=messages,
+                model=AIModel.GPT_4O_MINI,
+                max_tokens=1000
+            )
         
         # Store conversation in memory
-        await simple_memory.add_message(user.id, "user", message_text)
-        await simple_memory.add_message(user.id, "assistant", response.content)
+        with span("memory.save"):
+            await simple_memory.add_message(user.id, "user", message_text)
+            await simple_memory.add_message(user.id, "assistant", response.content)
         
         # Send response
-        await update.message.reply_text(response.content)
+        with span("telegram.reply"):
+            await update.message.reply_text(response.content)
         
         logger.info(f"✅ Conversational response sent to user {user.id}")
         increment_successful_requests()
@@ -370,11 +361,9 @@ async def handle_chat_consultation(update: Update, context: ContextTypes.DEFAULT
 
 Выберите категорию вашего вопроса для более точной консультации:"""
     
-    # Get categories from database
+    # Get categories from registry (cached)
     try:
-        async with async_sessionmaker() as session:
-            result = await session.execute(select(Category))
-            categories = result.scalars().all()
+        categories = await category_registry.all()
     except Exception as e:
         logger.error(f"Failed to load categories: {e}")
         categories = []
@@ -436,9 +425,7 @@ async def handle_consultation_category(update: Update, context: ContextTypes.DEF
     
     try:
         # Get category info
-        async with async_sessionmaker() as session:
-            result = await session.execute(select(Category).where(Category.id == int(category_id)))
-            category = result.scalar_one_or_none()
+        category = await category_registry.get(int(category_id))
         
         if not category:
             await query.message.reply_text("Категория не найдена.")
@@ -600,7 +587,7 @@ async def handle_submit_call_request(update: Update, context: ContextTypes.DEFAU
 👤 {user.first_name or 'Пользователь'} (@{user.username or 'без username'})
 📱 {format_phone_number(phone)}
 🆔 ID: {user.id}
-🕐 {format_datetime(datetime.now())}""")
+🕐 {format_datetime(datetime.now())}""", bot=context.bot)
             
             # Notify client
             try:
@@ -628,35 +615,34 @@ async def handle_submit_call_request(update: Update, context: ContextTypes.DEFAU
 
 # ================ HELPER FUNCTIONS ================
 
-async def notify_all_admins(message: str, keyboard: InlineKeyboardMarkup = None):
-    """Notify all admins with message"""
-    try:
-        async with async_sessionmaker() as session:
-            result = await session.execute(select(Admin))
-            admins = result.scalars().all()
-            
-            for admin in admins:
-                try:
-                    # Use context.bot if available, otherwise this won't work
-                    # This function needs to be called from a handler with access to bot
-                    pass  # Implementation depends on having bot instance
-                except Exception as e:
-                    logger.error(f"Failed to notify admin {admin.tg_id}: {e}")
-                    
-    except Exception as e:
-        logger.error(f"Failed to notify admins: {e}")
+async def notify_all_admins(message: str, keyboard: InlineKeyboardMarkup = None, bot=None):
+    """Notify all admins with message (concurrently, cached admin list)"""
+    if bot is None:
+        from bot.main import get_bot_application
+        application = get_bot_application()
+        if not application:
+            logger.error("Failed to notify admins: bot application not initialized")
+            return None
+        bot = application.bot
+
+    return await admin_fanout.send_message(
+        bot,
+        message,
+        reply_markup=keyboard,
+        parse_mode=ParseMode.MARKDOWN
+    )
 
-async def notify_all_admins_with_keyboard(message: str, keyboard: InlineKeyboardMarkup):
+async def notify_all_admins_with_keyboard(message: str, keyboard: InlineKeyboardMarkup, bot=None):
     """Notify all admins with inline keyboard"""
-    await notify_all_admins(message, keyboard)
+    return await notify_all_admins(message, keyboard, bot)
 
 def is_admin(user_id: int) -> bool:
     """Check if user is admin"""
     return user_id in ADMIN_USERS
 
-def is_rate_limited(user_id: int) -> bool:
+async def is_rate_limited(user_id: int) -> bool:
     """Check if user is rate limited (legacy function)"""
-    return check_rate_limit(user_id)
+    return await check_rate_limit(user_id)
 
 def log_request(user_id: int, request_type: str, success: bool = True):
     """Log request for monitoring"""
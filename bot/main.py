@@ -24,8 +24,13 @@ if DISABLE_ENHANCED_AI:
 # Import refactored modules
 from bot.config.settings import TOKEN, validate_config, ADMIN_USERS, PRODUCTION_MODE
 from bot.core.rate_limiter import rate_limiter
-from bot.core.metrics import metrics, get_system_stats
+from bot.core.metrics import metrics, get_system_stats, StartupTimer
+from bot.core.prometheus_metrics import observe_handlers
 from bot.services.db import init_db
+from bot.services.write_behind import write_behind
+from bot.services.admin_fanout import admin_fanout
+from bot.services.update_processor import update_processor
+from bot.services.send_governor import send_governor
 from bot.services.ai_unified import unified_ai_service, ai_health_check
 from bot.services.autopost_unified import initialize_autopost_system, autopost_system
 from bot.handlers.user.commands import (
@@ -51,30 +56,44 @@ class LegalCenterBot:
         """Initialize all bot components"""
         try:
             logger.info("🚀 Initializing Legal Center Bot...")
+            timer = StartupTimer("bot.initialize")
             
             # Validate configuration
-            validate_config()
+            with timer.phase("config"):
+                validate_config()
             logger.info("✅ Configuration validated")
             
             # Initialize database
-            await init_db()
+            with timer.phase("database"):
+                await init_db()
             logger.info("✅ Database initialized")
             
             # Initialize AI services
-            await initialize_ai_manager()
+            with timer.phase("ai"):
+                await initialize_ai_manager()
             logger.info("✅ AI services initialized")
             
-            # Create telegram application
-            self.application = Application.builder().token(TOKEN).build()
+            # Create telegram application: parallel across users, ordered per user
+            with timer.phase("application"):
+                self.application = (
+                    Application.builder()
+                    .token(TOKEN)
+                    .concurrent_updates(update_processor)
+                    .rate_limiter(send_governor)
+                    .build()
+                )
+            logger.info(f"✅ Update concurrency: {update_processor.concurrency} (serialized per user)")
             
             # Initialize autopost system
-            initialize_autopost_system(self.application)
-            if autopost_system:
-                await autopost_system.initialize()
-                logger.info("✅ Autopost system initialized")
+            with timer.phase("autopost"):
+                initialize_autopost_system(self.application)
+                if autopost_system:
+                    await autopost_system.initialize()
+                    logger.info("✅ Autopost system initialized")
             
             # Register handlers
-            await self._register_handlers()
+            with timer.phase("handlers"):
+                await self._register_handlers()
             logger.info("✅ Handlers registered")
             
             # Set admin users
@@ -82,6 +101,7 @@ class LegalCenterBot:
             
             # Update metrics
             metrics.start_time = datetime.now().timestamp()
+            timer.log()
             
             self.is_initialized = True
             logger.info("✅ Bot initialization completed successfully")
@@ -136,6 +156,9 @@ class LegalCenterBot:
         register_quick_fixes_handlers(app)
         register_production_testing_handlers(app)
         
+        # bot_update_handler_seconds
+        observe_handlers(app)
+        
         logger.info("📋 All handlers registered successfully")
     
     async def start(self):
@@ -202,6 +225,12 @@ class LegalCenterBot:
                 except Exception as e:
                     logger.error(f"❌ Error stopping telegram app: {e}")
             
+            # Flush queued dialogue/analytics rows – after the handlers that queue them have stopped
+            try:
+                await write_behind.drain(timeout=5.0)
+            except Exception as e:
+                logger.error(f"❌ Error draining write-behind queue: {e}")
+            
             logger.info("✅ Bot stopped successfully")
             
         except Exception as e:
@@ -219,6 +248,8 @@ async def health_check() -> dict:
         ai_status = await ai_health_check()
         autopost_stats = autopost_system.get_stats() if autopost_system else {"status": "not_initialized"}
         rate_limiter_stats = rate_limiter.get_stats()
+        update_processor_stats = update_processor.get_stats()
+        send_governor_stats = send_governor.get_stats()
         
         return {
             "status": "healthy" if bot.is_initialized else "initializing",
@@ -229,7 +260,9 @@ async def health_check() -> dict:
                 "database": "connected",  # Assumed if we got this far
                 "ai_services": ai_status,
                 "autopost": autopost_stats,
-                "rate_limiter": rate_limiter_stats
+                "rate_limiter": rate_limiter_stats,
+                "update_processor": update_processor_stats,
+                "send_governor": send_governor_stats
             },
             "metrics": system_stats
         }
@@ -245,21 +278,17 @@ async def health_check() -> dict:
 # ================ ADMIN HELPER FUNCTIONS ================
 
 async def notify_all_admins(message: str, keyboard=None):
-    """Notify all admin users"""
+    """Notify all admin users concurrently; returns per-admin FanoutResult"""
     if not bot.application:
         logger.error("Bot application not initialized")
-        return
+        return None
     
-    for admin_id in ADMIN_USERS:
-        try:
-            await bot.application.bot.send_message(
-                chat_id=admin_id,
-                text=message,
-                reply_markup=keyboard,
-                parse_mode="Markdown"
-            )
-        except Exception as e:
-            logger.error(f"Failed to notify admin {admin_id}: {e}")
+    return await admin_fanout.send_message(
+        bot.application.bot,
+        message,
+        reply_markup=keyboard,
+        parse_mode="Markdown"
+    )
 
 def is_admin(user_id: int) -> bool:
     """Check if user is admin"""
@@ -0,0 +1,132 @@
+"""Concurrent delivery of one notification to all admins.
+
+Admin ids are ADMIN_USERS from settings plus active rows of the `admins`
+table; the merged list is cached for ADMIN_LIST_CACHE_TTL seconds (call
+`invalidate()` after changing admins). Messages go out concurrently, at most
+ADMIN_FANOUT_CONCURRENCY at a time so a burst of applications stays within
+Telegram's global send limit. Every send goes through `send_governor` in the
+ADMIN_ALERT lane (after user replies, before channel posts), which also waits
+out and retries a RetryAfter from Telegram. One failing admin never blocks
+or cancels the others – failures are collected per recipient in the result.
+
+Usage:
+    from bot.services.admin_fanout import admin_fanout
+
+    result = await admin_fanout.send_message(bot, text, parse_mode="Markdown")
+    if result.failed:
+        logger.warning(f"Not delivered to {list(result.failed)}")
+
+    # custom per-admin send (fallbacks, documents, ...)
+    result = await admin_fanout.run(lambda admin_id: bot.send_document(admin_id, ...))
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import time
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional
+
+from sqlalchemy import select
+
+from bot.config.settings import ADMIN_FANOUT_CONCURRENCY, ADMIN_LIST_CACHE_TTL, ADMIN_USERS
+from bot.services.db import async_sessionmaker, Admin
+from bot.services.send_governor import SendPriority, send_governor
+
+logger = logging.getLogger(__name__)
+
+__all__ = ["FanoutResult", "AdminFanout", "admin_fanout"]
+
+
+@dataclass
+class FanoutResult:
+    """Per-recipient outcome of a fan-out"""
+    delivered: List[int] = field(default_factory=list)
+    failed: Dict[int, str] = field(default_factory=dict)
+    elapsed_ms: float = 0.0
+
+    @property
+    def ok(self) -> bool:
+        return not self.failed
+
+
+class AdminFanout:
+    """Admin list cache + bounded concurrent sender"""
+
+    def __init__(self, concurrency: int = ADMIN_FANOUT_CONCURRENCY, cache_ttl: float = ADMIN_LIST_CACHE_TTL):
+        self.concurrency = concurrency
+        self.cache_ttl = cache_ttl
+        self._admin_ids: Optional[List[int]] = None
+        self._loaded_at = 0.0
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    # -------- admin list ----------
+
+    async def get_admin_ids(self) -> List[int]:
+        """ADMIN_USERS + active DB admins, cached for cache_ttl seconds"""
+        if self._admin_ids is not None and time.monotonic() - self._loaded_at < self.cache_ttl:
+            return self._admin_ids
+
+        admin_ids = set(ADMIN_USERS)
+        try:
+            async with async_sessionmaker() as session:
+                result = await session.execute(
+                    select(Admin.tg_id).where(Admin.is_active.is_(True)))
+                admin_ids.update(tg_id for tg_id in result.scalars() if tg_id)
+        except Exception as e:
+            # без БД – хотя бы админы из настроек
+            logger.warning(f"⚠️ Could not load admins from DB: {e}")
+
+        self._admin_ids = sorted(admin_ids)
+        self._loaded_at = time.monotonic()
+        return self._admin_ids
+
+    def invalidate(self) -> None:
+        """Drop the cached admin list (e.g. after adding/removing an admin)"""
+        self._admin_ids = None
+
+    # -------- sending ----------
+
+    def _get_semaphore(self) -> asyncio.Semaphore:
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            self._semaphore = asyncio.Semaphore(self.concurrency)
+            self._loop = loop
+        return self._semaphore
+
+    async def _deliver(self, admin_id: int, send: Callable[[int], Awaitable[Any]], result: FanoutResult) -> None:
+        async with self._get_semaphore():
+            try:
+                await send_governor.send(admin_id, lambda: send(admin_id), SendPriority.ADMIN_ALERT)
+                result.delivered.append(admin_id)
+            except Exception as e:
+                result.failed[admin_id] = str(e)
+                logger.error(f"❌ Failed to notify admin {admin_id}: {e}")
+
+    async def run(self, send: Callable[[int], Awaitable[Any]],
+                  admin_ids: Optional[Iterable[int]] = None) -> FanoutResult:
+        """Call send(admin_id) for every admin concurrently"""
+        started = time.perf_counter()
+        if admin_ids is None:
+            admin_ids = await self.get_admin_ids()
+
+        result = FanoutResult()
+        await asyncio.gather(*(self._deliver(admin_id, send, result) for admin_id in admin_ids))
+        result.elapsed_ms = (time.perf_counter() - started) * 1000
+
+        if result.failed:
+            logger.warning(
+                f"⚠️ Admin fan-out: {len(result.delivered)} delivered, {len(result.failed)} failed")
+        return result
+
+    async def send_message(self, bot, text: str, admin_ids: Optional[Iterable[int]] = None,
+                           **kwargs) -> FanoutResult:
+        """bot.send_message(text, **kwargs) to every admin"""
+        return await self.run(
+            lambda admin_id: bot.send_message(chat_id=admin_id, text=text, **kwargs), admin_ids)
+
+
+# Global fan-out instance
+admin_fanout = AdminFanout()
@@ -4,9 +4,12 @@ PRIMARY: OpenAI GPT API, FALLBACK: Azure OpenAI
 """
 
 import os
+import time
 import aiohttp
 import json
 
+from bot.core.prometheus_metrics import observe_ai_request
+
 # OpenAI Configuration - PRIMARY
 OPENAI_API_KEY = os.getenv("API_GPT")
 
@@ -22,14 +25,14 @@ async def generate_ai_response(messages: list[dict], model: str = "gpt-4o-mini",
     # Try OpenAI first
     if OPENAI_API_KEY:
         try:
-            return await _openai_request(messages, model, max_tokens)
+            return await _timed("openai", model, _openai_request(messages, model, max_tokens))
         except Exception as e:
             print(f"❌ OpenAI error: {e}")
     
     # Fallback to Azure OpenAI
     if AZURE_OPENAI_API_KEY and AZURE_OPENAI_ENDPOINT:
         try:
-            return await _azure_openai_request(messages, model, max_tokens)
+            return await _timed("azure_openai", model, _azure_openai_request(messages, model, max_tokens))
         except Exception as e:
             print(f"❌ Azure OpenAI error: {e}")
             return "🤖 AI консультант временно недоступен. Проверьте настройки OpenAI API."
@@ -37,6 +40,18 @@ async def generate_ai_response(messages: list[dict], model: str = "gpt-4o-mini",
     return "🤖 OpenAI API не настроен. Обратитесь к администратору."
 
 
+async def _timed(provider: str, model: str, request):
+    """Await one provider request, recording bot_ai_request_seconds"""
+    started = time.perf_counter()
+    success = False
+    try:
+        result = await request
+        success = True
+        return result
+    finally:
+        observe_ai_request(provider, model, time.perf_counter() - started, success)
+
+
 async def _openai_request(messages: list[dict], model: str, max_tokens: int) -> str:
     """Make request to OpenAI API"""
     async with aiohttp.ClientSession() as session:
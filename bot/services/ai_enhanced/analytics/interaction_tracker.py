@@ -8,8 +8,7 @@ import logging
 from typing import Dict, Any, Optional
 from datetime import datetime
 
-from sqlalchemy import select
-from ...db import async_sessionmaker
+from ...write_behind import write_behind
 from ...ai_enhanced_models import AIMetrics
 from ..core.context_builder import AIContext
 
@@ -81,21 +80,17 @@ class InteractionTracker:
 
             metrics = self.daily_metrics[today]
 
-            async with async_sessionmaker() as session:
-                # Создаем или обновляем запись метрик
-                ai_metrics = AIMetrics(
-                    metric_date=datetime.now(),
-                    total_requests=metrics['total_requests'],
-                    successful_requests=metrics['successful_requests'],
-                    average_response_time=metrics['total_response_time'] / max(
-                        metrics['total_requests'], 1),
-                    total_tokens_used=metrics['total_tokens'],
-                    # примерная стоимость
-                    total_cost_usd=metrics['total_tokens'] * 0.00001
-                )
-
-                session.add(ai_metrics)
-                await session.commit()
+            # Запись уходит в write-behind очередь, не блокируя вызывающего
+            await write_behind.insert(AIMetrics, {
+                "metric_date": datetime.now(),
+                "total_requests": metrics['total_requests'],
+                "successful_requests": metrics['successful_requests'],
+                "average_response_time": metrics['total_response_time'] / max(
+                    metrics['total_requests'], 1),
+                "total_tokens_used": metrics['total_tokens'],
+                # примерная стоимость
+                "total_cost_usd": metrics['total_tokens'] * 0.00001,
+            })
 
             logger.info(
                 f"Saved daily metrics: {metrics['total_requests']} requests")
@@ -40,8 +40,7 @@ except ImportError:
                     return (sum(i * i for i in x)) ** 0.5
             return linalg()
 
-from sqlalchemy import select
-from ...db import async_sessionmaker, Category
+from ...category_registry import category_registry
 
 logger = logging.getLogger(__name__)
 
@@ -224,13 +223,8 @@ class MLClassifier:
     async def _load_categories(self):
         """Загрузка категорий из БД"""
         try:
-            async with async_sessionmaker() as session:
-                result = await session.execute(select(Category))
-                categories = result.scalars().all()
-
-                self.categories_cache = {
-                    cat.name: cat.id for cat in categories}
-                logger.info(f"Loaded {len(self.categories_cache)} categories")
+            self.categories_cache = await category_registry.name_to_id()
+            logger.info(f"Loaded {len(self.categories_cache)} categories")
 
         except Exception as e:
             logger.error(f"Failed to load categories: {e}")
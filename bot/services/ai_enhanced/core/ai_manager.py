@@ -18,11 +18,13 @@ import uuid
 from datetime import datetime, timedelta
 from typing import Dict, List, Optional, Any
 
-from sqlalchemy import select
+from sqlalchemy import bindparam, select
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from ...db import async_sessionmaker, User
+from ...db import readonly_sessionmaker, User
+from ...write_behind import write_behind
 from ...ai import generate_ai_response as basic_ai_response
+from ....core.metrics import span, traced
 from ...ai_enhanced_models import (
     UserProfile, DialogueSession, DialogueMessage, AIMetrics
 )
@@ -52,6 +54,18 @@ from ..analytics.quality_analyzer import QualityAnalyzer
 
 logger = logging.getLogger(__name__)
 
+# Абсолютные значения из объекта сессии: повторная запись безопасна
+_sessions = DialogueSession.__table__
+_UPDATE_SESSION_ACTIVITY = (
+    _sessions.update()
+    .where(_sessions.c.id == bindparam("session_pk"))
+    .values(
+        message_count=bindparam("message_count"),
+        last_activity=bindparam("last_activity"),
+        detected_categories=bindparam("detected_categories"),
+    )
+)
+
 
 class AIEnhancedManager:
     """Главный менеджер Enhanced AI системы"""
@@ -116,6 +130,7 @@ class AIEnhancedManager:
             logger.error("Failed to initialize Enhanced AI: %s", e)
             raise
 
+    @traced("ai_enhanced.generate_response")
     async def generate_response(
         self,
         user_id: int,
@@ -141,62 +156,71 @@ class AIEnhancedManager:
                 await self.initialize()
 
             # 1. Получаем/создаем профиль пользователя
-            user_profile = await self.user_profiler.get_or_create_profile(user_id)
+            with span("profile"):
+                user_profile = await self.user_profiler.get_or_create_profile(user_id)
 
             # 2. Получаем/создаем сессию диалога
-            session = await self.session_manager.get_or_create_session(user_id)
+            with span("session"):
+                session = await self.session_manager.get_or_create_session(user_id)
 
             # 3. Классифицируем сообщение
-            classification_result = await self.ml_classifier.classify_message(message)
-            intent_result = await self.intent_detector.detect_intent(message)
+            with span("classification"):
+                classification_result = await self.ml_classifier.classify_message(message)
+                intent_result = await self.intent_detector.detect_intent(message)
 
             # 4. Строим контекст для AI
-            ai_context = await self.context_builder.build_context(
-                user_id=user_id,
-                message=message,
-                user_profile=user_profile,
-                session=session,
-                classification=classification_result,
-                intent=intent_result,
-                additional_context=context
-            )
+            with span("context"):
+                ai_context = await self.context_builder.build_context(
+                    user_id=user_id,
+                    message=message,
+                    user_profile=user_profile,
+                    session=session,
+                    classification=classification_result,
+                    intent=intent_result,
+                    additional_context=context
+                )
 
             # 5. Генерируем базовый ответ
-            base_response = await self._generate_base_response(ai_context)
+            with span("ai"):
+                base_response = await self._generate_base_response(ai_context)
 
             # 6. Персонализируем ответ
-            personalized_response = await self.style_adapter.adapt_response(
-                response=base_response,
-                user_profile=user_profile,
-                context=ai_context
-            )
+            with span("personalization"):
+                personalized_response = await self.style_adapter.adapt_response(
+                    response=base_response,
+                    user_profile=user_profile,
+                    context=ai_context
+                )
 
             # 7. Оптимизируем финальный ответ
-            final_response = await self.response_optimizer.optimize_response(
-                response=personalized_response,
-                context=ai_context,
-                user_profile=user_profile
-            )
+            with span("optimization"):
+                final_response = await self.response_optimizer.optimize_response(
+                    response=personalized_response,
+                    context=ai_context,
+                    user_profile=user_profile
+                )
 
             # 8. Сохраняем взаимодействие в память
-            await self._save_interaction(
-                user_id=user_id,
-                session=session,
-                user_message=message,
-                ai_response=final_response,
-                ai_context=ai_context,
-                response_time=time.time() - start_time
-            )
+            with span("persistence"):
+                await self._save_interaction(
+                    user_id=user_id,
+                    session=session,
+                    user_message=message,
+                    ai_response=final_response,
+                    ai_context=ai_context,
+                    response_time=time.time() - start_time
+                )
 
             # 9. Трекинг для аналитики
-            await self.interaction_tracker.track_interaction(
-                user_id=user_id,
-                session_id=session.id,
-                message=message,
-                response=final_response,
-                context=ai_context,
-                response_time_ms=int((time.time() - start_time) * 1000)
-            )
+            with span("tracking"):
+                await self.interaction_tracker.track_interaction(
+                    user_id=user_id,
+                    session_id=session.id,
+                    message=message,
+                    response=final_response,
+                    context=ai_context,
+                    response_time_ms=int((time.time() - start_time) * 1000)
+                )
 
             return final_response
 
@@ -283,40 +307,49 @@ class AIEnhancedManager:
         ai_context: AIContext,
         response_time: float
     ):
-        """Сохранение взаимодействия в базу данных"""
+        """Сохранение взаимодействия в базу данных (через write-behind очередь)"""
         try:
-            async with async_sessionmaker() as db_session:
-                # Сохраняем сообщение пользователя
-                user_msg = DialogueMessage(
-                    session_id=session.id,
-                    role="user",
-                    content=user_message,
-                    intent_confidence=ai_context.intent_confidence,
-                    category_predictions=ai_context.category_predictions
-                )
-                db_session.add(user_msg)
-
-                # Сохраняем ответ AI
-                ai_msg = DialogueMessage(
-                    session_id=session.id,
-                    role="assistant",
-                    content=ai_response,
-                    response_time_ms=int(response_time * 1000)
-                )
-                db_session.add(ai_msg)
-
-                # Обновляем сессию
-                session.message_count += 2
-                session.last_activity = datetime.now()
-
-                if ai_context.predicted_category:
-                    if not session.detected_categories:
-                        session.detected_categories = []
-                    if ai_context.predicted_category not in session.detected_categories:
-                        session.detected_categories.append(
-                            ai_context.predicted_category)
-
-                await db_session.commit()
+            now = datetime.now()
+            await write_behind.insert(DialogueMessage, {
+                "session_id": session.id,
+                "role": "user",
+                "content": user_message,
+                "intent_confidence": ai_context.intent_confidence,
+                "category_predictions": ai_context.category_predictions,
+                "response_time_ms": None,
+                "created_at": now,
+                "updated_at": now,
+            })
+            # +1 мкс – порядок user → assistant внутри одной пачки
+            answered = now + timedelta(microseconds=1)
+            await write_behind.insert(DialogueMessage, {
+                "session_id": session.id,
+                "role": "assistant",
+                "content": ai_response,
+                "intent_confidence": None,
+                "category_predictions": None,
+                "response_time_ms": int(response_time * 1000),
+                "created_at": answered,
+                "updated_at": answered,
+            })
+
+            # Обновляем сессию (объект из кэша SessionManager – источник истины)
+            session.message_count = (session.message_count or 0) + 2
+            session.last_activity = now
+
+            if ai_context.predicted_category:
+                if not session.detected_categories:
+                    session.detected_categories = []
+                if ai_context.predicted_category not in session.detected_categories:
+                    session.detected_categories.append(
+                        ai_context.predicted_category)
+
+            await write_behind.execute(_UPDATE_SESSION_ACTIVITY, {
+                "session_pk": session.id,
+                "message_count": session.message_count,
+                "last_activity": session.last_activity,
+                "detected_categories": list(session.detected_categories or []),
+            })
 
         except Exception as e:
             logger.error(f"Failed to save interaction: {e}")
@@ -374,7 +407,7 @@ class AIEnhancedManager:
     async def get_analytics_summary(self) -> Dict[str, Any]:
         """Получение сводки аналитики"""
         try:
-            async with async_sessionmaker() as session:
+            async with readonly_sessionmaker() as session:
                 # Получаем последние метрики
                 result = await session.execute(
                     select(AIMetrics).order_by(
@@ -429,6 +462,9 @@ class AIEnhancedManager:
                         "status": "error", "error": str(e)}
                     health["status"] = "degraded"
 
+            # Очередь отложенной записи диалогов/аналитики
+            health["components"]["write_behind"] = write_behind.get_stats()
+
         except Exception as e:
             health["status"] = "error"
             health["error"] = str(e)
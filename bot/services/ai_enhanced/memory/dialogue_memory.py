@@ -10,7 +10,8 @@ from datetime import datetime, timedelta
 import uuid
 
 from sqlalchemy import select, desc
-from ...db import async_sessionmaker
+from ...db import session_scope
+from ...write_behind import write_behind
 from ...ai_enhanced_models import DialogueSession, DialogueMessage, UserProfile
 
 logger = logging.getLogger(__name__)
@@ -41,7 +42,7 @@ class DialogueMemory:
     ) -> List[DialogueMessage]:
         """Получение релевантного контекста из истории"""
         try:
-            async with async_sessionmaker() as session:
+            async with session_scope() as session:
                 # Получаем последние сообщения пользователя
                 result = await session.execute(
                     select(DialogueMessage)
@@ -81,26 +82,25 @@ class DialogueMemory:
         user_message: str,
         ai_response: str
     ):
-        """Сохранение взаимодействия в память"""
+        """Сохранение взаимодействия в память (через write-behind очередь)"""
         try:
-            async with async_sessionmaker() as db_session:
-                # Сохраняем сообщение пользователя
-                user_msg = DialogueMessage(
-                    session_id=session_id,
-                    role="user",
-                    content=user_message
-                )
-                db_session.add(user_msg)
-
-                # Сохраняем ответ AI
-                ai_msg = DialogueMessage(
-                    session_id=session_id,
-                    role="assistant",
-                    content=ai_response
-                )
-                db_session.add(ai_msg)
-
-                await db_session.commit()
+            # явный created_at сохраняет порядок user → assistant внутри пачки
+            now = datetime.now()
+            await write_behind.insert(DialogueMessage, {
+                "session_id": session_id,
+                "role": "user",
+                "content": user_message,
+                "created_at": now,
+                "updated_at": now,
+            })
+            answered = now + timedelta(microseconds=1)
+            await write_behind.insert(DialogueMessage, {
+                "session_id": session_id,
+                "role": "assistant",
+                "content": ai_response,
+                "created_at": answered,
+                "updated_at": answered,
+            })
 
         except Exception as e:
             logger.error(f"Failed to store interaction: {e}")
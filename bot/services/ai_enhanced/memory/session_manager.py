@@ -10,7 +10,8 @@ from typing import Optional, Dict, Any
 from datetime import datetime, timedelta
 
 from sqlalchemy import select, desc
-from ...db import async_sessionmaker, User
+from ...db import session_scope
+from ...users import user_service
 from ...ai_enhanced_models import DialogueSession
 
 logger = logging.getLogger(__name__)
@@ -48,32 +49,16 @@ class SessionManager:
                     await self._end_session(session)
                     del self.active_sessions[user_id]
 
-            async with async_sessionmaker() as db_session:
-                # ИСПРАВЛЕНО: Сначала проверяем/создаем пользователя
-                user_result = await db_session.execute(
-                    select(User).where(User.tg_id == user_id)
-                )
-                user = user_result.scalar_one_or_none()
-
-                if not user:
-                    # Создаем базового пользователя если его нет
-                    user = User(
-                        tg_id=user_id,
-                        first_name="Пользователь",
-                        preferred_contact="telegram"
-                    )
-                    db_session.add(user)
-                    await db_session.commit()
-                    await db_session.refresh(user)
-                    logger.info(
-                        f"✅ Created missing user with tg_id: {user_id}")
+            async with session_scope() as db_session:
+                # users.id по tg_id (атомарный upsert + LRU кэш)
+                user_pk = await user_service.get_user_id(user_id, session=db_session)
 
                 # Ищем активную сессию в БД по правильному user.id
                 cutoff_time = datetime.now() - timedelta(hours=self.session_timeout_hours)
                 result = await db_session.execute(
                     select(DialogueSession)
                     .where(
-                        DialogueSession.user_id == user.id,  # ИСПРАВЛЕНО: используем user.id
+                        DialogueSession.user_id == user_pk,  # ИСПРАВЛЕНО: используем user.id
                         DialogueSession.resolution_status == "ongoing",
                         DialogueSession.last_activity >= cutoff_time
                     )
@@ -94,7 +79,7 @@ class SessionManager:
 
                 # Создаем новую сессию с правильным user.id
                 new_session = DialogueSession(
-                    user_id=user.id,  # ИСПРАВЛЕНО: используем user.id, не tg_id
+                    user_id=user_pk,  # ИСПРАВЛЕНО: используем user.id, не tg_id
                     session_uuid=str(uuid.uuid4()),
                     context_summary="",
                     message_count=0,
@@ -134,7 +119,7 @@ class SessionManager:
             session.last_activity = datetime.now()
 
             # Обновляем в БД
-            async with async_sessionmaker() as db_session:
+            async with session_scope() as db_session:
                 await db_session.merge(session)
                 await db_session.commit()
 
@@ -147,7 +132,7 @@ class SessionManager:
             session.resolution_status = "ended"
             session.ended_at = datetime.now()
 
-            async with async_sessionmaker() as db_session:
+            async with session_scope() as db_session:
                 await db_session.merge(session)
                 await db_session.commit()
 
@@ -9,7 +9,8 @@ from typing import Optional, Dict, Any
 from datetime import datetime
 
 from sqlalchemy import select
-from ...db import async_sessionmaker, User
+from ...db import session_scope
+from ...users import user_service
 from ...ai_enhanced_models import UserProfile
 
 logger = logging.getLogger(__name__)
@@ -39,36 +40,20 @@ class UserProfiler:
             if user_id in self.profiles_cache:
                 return self.profiles_cache[user_id]
 
-            async with async_sessionmaker() as session:
-                # ИСПРАВЛЕНО: Сначала проверяем/создаем пользователя
-                user_result = await session.execute(
-                    select(User).where(User.tg_id == user_id)
-                )
-                user = user_result.scalar_one_or_none()
-
-                if not user:
-                    # Создаем базового пользователя если его нет
-                    user = User(
-                        tg_id=user_id,
-                        first_name="Пользователь",
-                        preferred_contact="telegram"
-                    )
-                    session.add(user)
-                    await session.commit()
-                    await session.refresh(user)
-                    logger.info(
-                        f"✅ Created missing user with tg_id: {user_id}")
+            async with session_scope() as session:
+                # users.id по tg_id (атомарный upsert + LRU кэш)
+                user_pk = await user_service.get_user_id(user_id, session=session)
 
                 # Теперь ищем профиль по database user.id (не tg_id!)
                 result = await session.execute(
-                    select(UserProfile).where(UserProfile.user_id == user.id)
+                    select(UserProfile).where(UserProfile.user_id == user_pk)
                 )
                 profile = result.scalar_one_or_none()
 
                 if not profile:
                     # Создаем новый профиль с правильным user.id
                     profile = UserProfile(
-                        user_id=user.id,  # ИСПРАВЛЕНО: используем user.id, не tg_id
+                        user_id=user_pk,  # ИСПРАВЛЕНО: используем user.id, не tg_id
                         experience_level="beginner",
                         preferred_style="friendly",
                         communication_speed="normal",
@@ -129,7 +114,7 @@ class UserProfiler:
                 profile.experience_level = "intermediate"
 
             # Сохраняем изменения
-            async with async_sessionmaker() as session:
+            async with session_scope() as session:
                 await session.merge(profile)
                 await session.commit()
 
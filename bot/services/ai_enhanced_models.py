@@ -16,7 +16,7 @@ from datetime import datetime
 from typing import Optional, Dict, Any, List
 
 from sqlalchemy import (
-    String, Integer, DateTime, Boolean, Numeric, ForeignKey, Text, JSON, func, LargeBinary, Float
+    String, Integer, DateTime, Boolean, Numeric, ForeignKey, Text, JSON, func, LargeBinary, Float, Index
 )
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 
@@ -62,6 +62,10 @@ class UserProfile(Base, TimestampMixin):
 class DialogueSession(Base, TimestampMixin):
     """Сессия диалога с пользователем"""
     __tablename__ = "dialogue_sessions"
+    __table_args__ = (
+        Index("ix_dialogue_sessions_user_status_activity",
+              "user_id", "resolution_status", "last_activity"),
+    )
 
     id: Mapped[int] = mapped_column(
         Integer, primary_key=True, autoincrement=True)
@@ -94,6 +98,10 @@ class DialogueSession(Base, TimestampMixin):
 class DialogueMessage(Base, TimestampMixin):
     """Сообщение в диалоге"""
     __tablename__ = "dialogue_messages"
+    __table_args__ = (
+        Index("ix_dialogue_messages_session_created_at",
+              "session_id", "created_at"),
+    )
 
     id: Mapped[int] = mapped_column(
         Integer, primary_key=True, autoincrement=True)
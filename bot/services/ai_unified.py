@@ -6,6 +6,7 @@ Replaces duplicate AI services with a single, comprehensive interface.
 
 import os
 import logging
+import time
 from typing import List, Dict, Any, Optional
 from abc import ABC, abstractmethod
 from dataclasses import dataclass
@@ -15,6 +16,7 @@ from bot.config.settings import (
     OPENAI_API_KEY, OPENROUTER_API_KEY, AZURE_OPENAI_API_KEY, 
     AZURE_OPENAI_ENDPOINT, AZURE_OPENAI_API_VERSION
 )
+from bot.core.prometheus_metrics import observe_ai_request
 
 logger = logging.getLogger(__name__)
 
@@ -503,7 +505,10 @@ class UnifiedAIService:
                 continue
             
             logger.info(f"Attempting generation with {provider_type.value}")
+            started = time.perf_counter()
             response = await provider.generate_response(request)
+            observe_ai_request(provider_type.value, response.model or request.model.value,
+                               time.perf_counter() - started, response.success)
             
             if response.success:
                 logger.info(f"✅ Success with {provider_type.value}")
@@ -0,0 +1,141 @@
+"""Keyset-paginated listing of applications for admin panels.
+
+Pages are ordered by `(created_at, id)` descending and continue from an
+opaque cursor that encodes the last row of the previous page, so page N costs
+the same index range scan as page 1 (no OFFSET).
+
+Usage:
+    from bot.services.application_listing import list_applications
+
+    page = await list_applications(status="new", limit=20)
+    next_page = await list_applications(status="new", cursor=page.next_cursor)
+"""
+
+from __future__ import annotations
+
+import base64
+import json
+import logging
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+from sqlalchemy import func, literal, select, tuple_
+
+from bot.services.category_registry import category_registry
+from bot.services.db import readonly_engine, readonly_sessionmaker, Application, User
+
+logger = logging.getLogger(__name__)
+
+__all__ = ["ApplicationPage", "encode_cursor", "decode_cursor", "list_applications"]
+
+DEFAULT_PAGE_SIZE = 20
+MAX_PAGE_SIZE = 100
+
+
+@dataclass
+class ApplicationPage:
+    """One page of applications plus cursor for the next one"""
+    items: List[Dict[str, Any]] = field(default_factory=list)
+    next_cursor: Optional[str] = None
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"items": self.items, "next_cursor": self.next_cursor}
+
+
+# -------- cursor ----------
+
+def encode_cursor(created_at: datetime, application_id: int) -> str:
+    """Opaque cursor for the position after (created_at, id)"""
+    raw = json.dumps([created_at.isoformat(), application_id]).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, int]:
+    """Inverse of encode_cursor; raises ValueError on malformed input"""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        created_at, application_id = json.loads(base64.urlsafe_b64decode(padded))
+        return datetime.fromisoformat(created_at), int(application_id)
+    except (TypeError, ValueError, json.JSONDecodeError) as e:
+        raise ValueError(f"Invalid cursor: {cursor!r}") from e
+
+
+# -------- listing ----------
+
+def _sort_key(value):
+    """created_at as compared in SQL.
+
+    SQLite keeps dates as text, and rows written by CURRENT_TIMESTAMP differ in
+    format from bound datetimes – normalize both sides there.
+    """
+    if readonly_engine.dialect.name == "sqlite":
+        return func.strftime("%Y-%m-%d %H:%M:%f", value)
+    return value if not isinstance(value, datetime) else literal(value, Application.created_at.type)
+
+
+async def list_applications(
+    *,
+    status: Optional[str] = None,
+    category_id: Optional[int] = None,
+    assigned_admin: Optional[str] = None,
+    cursor: Optional[str] = None,
+    limit: int = DEFAULT_PAGE_SIZE,
+) -> ApplicationPage:
+    """Newest-first page of applications matching the filters"""
+    limit = max(1, min(limit, MAX_PAGE_SIZE))
+    sort_key = _sort_key(Application.created_at)
+
+    stmt = (
+        select(
+            Application.id,
+            Application.created_at,
+            Application.status,
+            Application.category_id,
+            Application.subcategory,
+            Application.assigned_admin,
+            Application.contact_method,
+            User.first_name,
+            User.last_name,
+            User.phone,
+        )
+        .join(User, Application.user_id == User.id)
+        .order_by(sort_key.desc(), Application.id.desc())
+        .limit(limit + 1)  # +1 строка – признак следующей страницы
+    )
+
+    if status:
+        stmt = stmt.where(Application.status == status)
+    if category_id is not None:
+        stmt = stmt.where(Application.category_id == category_id)
+    if assigned_admin:
+        stmt = stmt.where(Application.assigned_admin == assigned_admin)
+    if cursor:
+        created_at, application_id = decode_cursor(cursor)
+        stmt = stmt.where(
+            tuple_(sort_key, Application.id) < tuple_(_sort_key(created_at), application_id))
+
+    async with readonly_sessionmaker() as session:
+        rows = (await session.execute(stmt)).all()
+
+    page = ApplicationPage()
+    for row in rows[:limit]:
+        client = " ".join(part for part in (row.first_name, row.last_name) if part)
+        page.items.append({
+            "id": row.id,
+            "created_at": row.created_at.isoformat() if row.created_at else None,
+            "status": row.status,
+            "category_id": row.category_id,
+            "category": await category_registry.get_name(row.category_id),
+            "subcategory": row.subcategory,
+            "assigned_admin": row.assigned_admin,
+            "contact_method": row.contact_method,
+            "client": client or None,
+            "phone": row.phone,
+        })
+
+    if len(rows) > limit:
+        last = rows[limit - 1]
+        page.next_cursor = encode_cursor(last.created_at, last.id)
+
+    return page
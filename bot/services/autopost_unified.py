@@ -24,6 +24,9 @@ if DISABLE_ENHANCED_AI:
 from bot.services.db import async_sessionmaker, ContentFingerprint
 from bot.services.ai_unified import unified_ai_service, AIModel
 from bot.services.content_deduplication_pg import PostgreSQLContentDeduplicationSystem
+from bot.core.prometheus_metrics import register_queue_depth
+from bot.services.send_governor import SendPriority, send_governor
+from bot.services.state_backend import SharedDict
 from bot.config.settings import (
     POST_INTERVAL_HOURS, TARGET_CHANNEL_ID, TARGET_CHANNEL_USERNAME,
     ADMIN_USERS, PRODUCTION_MODE
@@ -72,7 +75,9 @@ class UnifiedAutopostSystem:
     def __init__(self, bot_application: TelegramApplication):
         self.bot_application = bot_application
         self.deduplication_service = PostgreSQLContentDeduplicationSystem()
-        self.scheduled_posts: Dict[str, ScheduledPost] = {}
+        # post_id -> ScheduledPost, shared between workers
+        self.scheduled_posts = SharedDict("autopost.scheduled_posts")
+        register_queue_depth("autopost", lambda: len(self.scheduled_posts))
         self.is_running = False  # DISABLED BY DEFAULT - admin must manually enable
         self.background_tasks = []  # Track background tasks for cleanup
         self.stats = {
@@ -188,10 +193,13 @@ class UnifiedAutopostSystem:
             try:
                 current_time = datetime.now()
                 
-                for post_id, post in list(self.scheduled_posts.items()):
+                for post_id, post in await self.scheduled_posts.aitems():
                     if (post.status == PostStatus.SCHEDULED and 
                         post.scheduled_time <= current_time):
                         
+                        # Claim before publishing so only one worker posts it
+                        if await self.scheduled_posts.apop(post_id) is None:
+                            continue
                         await self._publish_scheduled_post(post)
                 
                 await asyncio.sleep(60)  # Check every minute
@@ -339,11 +347,11 @@ class UnifiedAutopostSystem:
 💬 Остались вопросы? Обращайтесь к нашему AI-консультанту: {TARGET_CHANNEL_USERNAME}"""
             
             # Send to channel
-            await self.bot_application.bot.send_message(
+            await send_governor.send(TARGET_CHANNEL_ID, lambda: self.bot_application.bot.send_message(
                 chat_id=TARGET_CHANNEL_ID,
                 text=message_text,
                 parse_mode="Markdown"
-            )
+            ), SendPriority.CHANNEL_POST)
             
             # Update stats
             self.stats["total_posts"] += 1
@@ -377,7 +385,7 @@ class UnifiedAutopostSystem:
             created_at=datetime.now()
         )
         
-        self.scheduled_posts[post_id] = scheduled_post
+        await self.scheduled_posts.aset(post_id, scheduled_post)
         
         logger.info(f"📅 Post scheduled for {scheduled_time}: {content.title}")
         return post_id
@@ -385,12 +393,10 @@ class UnifiedAutopostSystem:
     async def _publish_scheduled_post(self, post: ScheduledPost):
         """Publish a scheduled post"""
         try:
+            # Already removed from scheduled posts by the processor
             post.status = PostStatus.PUBLISHED
             await self._publish_post(post.content, post.post_type)
             
-            # Remove from scheduled posts
-            self.scheduled_posts.pop(post.id, None)
-            
         except Exception as e:
             post.attempts += 1
             post.last_error = str(e)
@@ -400,8 +406,12 @@ class UnifiedAutopostSystem:
                 logger.error(f"❌ Scheduled post failed after 3 attempts: {e}")
             else:
                 # Retry in 10 minutes
+                post.status = PostStatus.SCHEDULED
                 post.scheduled_time = datetime.now() + timedelta(minutes=10)
                 logger.warning(f"⚠️ Scheduled post failed, retrying: {e}")
+            
+            # Put it back (values in the shared backend are copies)
+            await self.scheduled_posts.aset(post.id, post)
     
     async def create_manual_post(self, topic: str) -> bool:
         """Create and publish a manual post immediately"""
@@ -420,11 +430,12 @@ class UnifiedAutopostSystem:
     
     def get_stats(self) -> Dict[str, Any]:
         """Get autopost statistics"""
+        scheduled = self.scheduled_posts.values()
         return {
             **self.stats,
             "is_running": self.is_running,
-            "scheduled_posts_count": len(self.scheduled_posts),
-            "pending_scheduled": len([p for p in self.scheduled_posts.values() 
+            "scheduled_posts_count": len(scheduled),
+            "pending_scheduled": len([p for p in scheduled 
                                    if p.status == PostStatus.SCHEDULED]),
             "success_rate": (self.stats["successful_posts"] / max(self.stats["total_posts"], 1)) * 100
         }
@@ -445,8 +456,7 @@ class UnifiedAutopostSystem:
     
     async def cancel_scheduled_post(self, post_id: str) -> bool:
         """Cancel a scheduled post"""
-        if post_id in self.scheduled_posts:
-            self.scheduled_posts.pop(post_id)
+        if await self.scheduled_posts.apop(post_id) is not None:
             logger.info(f"📅 Scheduled post cancelled: {post_id}")
             return True
         return False
@@ -0,0 +1,154 @@
+"""Category registry – in-process read-through cache of the `categories` table.
+
+Categories change rarely but are read on the busiest paths (consultation
+menus, /submit, ML classifier), so they are loaded once and served from memory.
+
+The cache is invalidated automatically after any committed ORM change to
+`Category` and can be reset manually with `category_registry.invalidate()`
+(admin command /reload_categories). A TTL refresh covers edits made by other
+processes (web and worker run separately on Railway).
+
+Usage:
+    from bot.services.category_registry import category_registry
+
+    categories = await category_registry.all()
+    name = await category_registry.get_name(3)
+    category_id = await category_registry.get_id("Наследство")
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import time
+from dataclasses import dataclass
+from typing import Dict, List, Optional
+
+from sqlalchemy import event, select
+from sqlalchemy.orm import Session
+
+from bot.services.db import async_sessionmaker, Category
+
+logger = logging.getLogger(__name__)
+
+__all__ = ["CategoryInfo", "CategoryRegistry", "category_registry"]
+
+
+@dataclass(frozen=True)
+class CategoryInfo:
+    """Detached snapshot of a Category row"""
+    id: int
+    name: str
+    description: Optional[str] = None
+
+
+class CategoryRegistry:
+    """Read-through cache for categories with id→name and name→id lookups"""
+
+    def __init__(self, ttl_seconds: float = 600):
+        self.ttl_seconds = ttl_seconds
+        self._by_id: Dict[int, CategoryInfo] = {}
+        self._by_name: Dict[str, CategoryInfo] = {}
+        self._loaded_at: Optional[float] = None
+        self._lock = asyncio.Lock()
+        self.loads = 0
+        self.hits = 0
+
+    def _is_fresh(self) -> bool:
+        if self._loaded_at is None:
+            return False
+        return time.monotonic() - self._loaded_at < self.ttl_seconds
+
+    async def ensure_loaded(self) -> None:
+        """Load categories from DB if cache is empty or stale"""
+        if self._is_fresh():
+            self.hits += 1
+            return
+
+        async with self._lock:
+            # другой вызов мог уже загрузить данные, пока мы ждали
+            if self._is_fresh():
+                self.hits += 1
+                return
+
+            async with async_sessionmaker() as session:
+                result = await session.execute(select(Category).order_by(Category.id))
+                rows = result.scalars().all()
+
+            by_id = {
+                row.id: CategoryInfo(id=row.id, name=row.name, description=row.description)
+                for row in rows
+            }
+            self._by_id = by_id
+            self._by_name = {info.name: info for info in by_id.values()}
+            self._loaded_at = time.monotonic()
+            self.loads += 1
+            logger.info(f"📚 Category registry loaded {len(by_id)} categories")
+
+    def invalidate(self) -> None:
+        """Drop cached categories – next lookup reloads from DB"""
+        self._loaded_at = None
+        logger.info("🔄 Category registry invalidated")
+
+    async def all(self) -> List[CategoryInfo]:
+        """All categories ordered by id"""
+        await self.ensure_loaded()
+        return list(self._by_id.values())
+
+    async def get(self, category_id: int) -> Optional[CategoryInfo]:
+        """Category by id"""
+        await self.ensure_loaded()
+        return self._by_id.get(category_id)
+
+    async def get_name(self, category_id: int) -> Optional[str]:
+        """Category name by id"""
+        info = await self.get(category_id)
+        return info.name if info else None
+
+    async def get_id(self, name: str) -> Optional[int]:
+        """Category id by exact name"""
+        await self.ensure_loaded()
+        info = self._by_name.get(name)
+        return info.id if info else None
+
+    async def name_to_id(self) -> Dict[str, int]:
+        """Mapping name → id (copy)"""
+        await self.ensure_loaded()
+        return {name: info.id for name, info in self._by_name.items()}
+
+    def get_stats(self) -> Dict:
+        """Registry statistics"""
+        return {
+            "categories": len(self._by_id),
+            "fresh": self._is_fresh(),
+            "loads": self.loads,
+            "hits": self.hits,
+        }
+
+
+# Global registry instance
+category_registry = CategoryRegistry()
+
+
+# -------- invalidation on ORM changes ----------
+
+_CHANGED_FLAG = "categories_changed"
+
+
+@event.listens_for(Session, "after_flush")
+def _track_category_changes(session, flush_context):
+    for obj in (*session.new, *session.dirty, *session.deleted):
+        if isinstance(obj, Category):
+            session.info[_CHANGED_FLAG] = True
+            return
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_on_commit(session):
+    if session.info.pop(_CHANGED_FLAG, False):
+        category_registry.invalidate()
+
+
+@event.listens_for(Session, "after_rollback")
+def _reset_on_rollback(session):
+    session.info.pop(_CHANGED_FLAG, None)
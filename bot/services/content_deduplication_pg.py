@@ -13,9 +13,9 @@ from typing import List, Dict, Optional, Set, Tuple
 from dataclasses import dataclass
 from difflib import SequenceMatcher
 
-from sqlalchemy import select, and_, or_
+from sqlalchemy import select, func, and_, or_
 from sqlalchemy.ext.asyncio import AsyncSession
-from .db import async_sessionmaker, ContentFingerprint
+from .db import async_sessionmaker, readonly_sessionmaker, ContentFingerprint
 
 logger = logging.getLogger(__name__)
 
@@ -213,12 +213,13 @@ class PostgreSQLContentDeduplicationSystem:
     async def get_blocked_topics_count(self) -> int:
         """Получение количества заблокированных тем"""
         try:
-            async with async_sessionmaker() as session:
+            # отчётный запрос – на реплику, считаем на стороне БД
+            async with readonly_sessionmaker() as session:
                 result = await session.execute(
-                    select(ContentFingerprint)
+                    select(func.count(ContentFingerprint.id))
                     .where(ContentFingerprint.blocked_until > datetime.now())
                 )
-                return len(result.scalars().all())
+                return result.scalar_one()
         except Exception:
             return 0
     
@@ -7,18 +7,31 @@ Tables:
     Admin           – администраторы / юристы с ролями
     Payment         – онлайн-оплата заявки
     Log             – системные логи (для будущего)
+    SchemaVersion   – отметка актуальной схемы (быстрый старт init_db)
+    OutboxJob       – фоновые задачи после коммита (bot.services.outbox)
 
 Usage:
     from bot.services.db import async_sessionmaker, init_db
     await init_db()  # создаёт таблицы при старте (если нет Alembic)
+
+    # одна сессия на весь апдейт Telegram
+    async with request_session():
+        await application.process_update(update)
+
+    # внутри сервисов – переиспользует сессию апдейта, если она есть
+    async with session_scope() as session:
+        ...
 """
 
 from __future__ import annotations
 
+import hashlib
 import logging
 import os
+from contextlib import asynccontextmanager
+from contextvars import ContextVar
 from datetime import datetime
-from typing import Optional
+from typing import AsyncIterator, Optional
 
 from sqlalchemy import (
     MetaData,
@@ -29,19 +42,43 @@ from sqlalchemy import (
     Boolean,
     Numeric,
     ForeignKey,
+    Index,
     Text,
     JSON,
+    bindparam,
+    event,
     func,
+    inspect,
     text,
+    select,
+    update,
 )
 from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
-from sqlalchemy.orm import DeclarativeBase, Mapped, mapped_column, relationship
+from sqlalchemy.ext.asyncio import async_sessionmaker as _session_factory
+from sqlalchemy.orm import DeclarativeBase, Mapped, Session, mapped_column, relationship, validates
+
+from bot.config.settings import (
+    DB_POOL_SIZE,
+    DB_MAX_OVERFLOW,
+    DB_POOL_RECYCLE,
+    DB_POOL_TIMEOUT,
+    DB_STATEMENT_CACHE_SIZE,
+)
+from bot.utils.helpers import normalize_phone_e164
+from bot.core.metrics import StartupTimer
+from bot.core.prometheus_metrics import instrument_engine
+from bot.services.query_profiler import query_profiler
 
 __all__ = [
     "async_engine",
     "async_sessionmaker",
+    "readonly_engine",
+    "readonly_sessionmaker",
+    "request_session",
+    "session_scope",
     "Base",
     "init_db",
+    "backfill_users_phone_e164",
     # models
     "Category",
     "User",
@@ -50,6 +87,8 @@ __all__ = [
     "Payment",
     "ContentFingerprint",
     "Log",
+    "SchemaVersion",
+    "OutboxJob",
 ]
 
 # Enhanced AI models DISABLED - not importing
@@ -83,12 +122,100 @@ if not os.getenv("DATABASE_URL"):
     print("🔗 Using fallback local SQLite database")
     DATABASE_URL = "sqlite+aiosqlite:///bot.db"
 
-async_engine = create_async_engine(
-    DATABASE_URL, echo=False, pool_pre_ping=True)
+
+
+def _engine_options(url: str) -> dict:
+    """Pool and driver options for the given database URL"""
+    options = {"echo": False, "pool_pre_ping": True}
+
+    # SQLite работает через файл – пул и кэш выражений не нужны
+    if url.startswith("sqlite"):
+        return options
+
+    options.update(
+        pool_size=DB_POOL_SIZE,
+        max_overflow=DB_MAX_OVERFLOW,
+        pool_recycle=DB_POOL_RECYCLE,
+        pool_timeout=DB_POOL_TIMEOUT,
+    )
+    if "+asyncpg" in url:
+        options["connect_args"] = {
+            "prepared_statement_cache_size": DB_STATEMENT_CACHE_SIZE,
+        }
+    return options
+
+
+async_engine = create_async_engine(DATABASE_URL, **_engine_options(DATABASE_URL))
 async_sessionmaker: async_sessionmaker[AsyncSession] = async_sessionmaker(
     bind=async_engine, expire_on_commit=False
 )
 
+# Read replica для отчётов (админ-статистика, дашборды, мониторинг).
+# Без DATABASE_READONLY_URL отчёты идут в основную БД.
+DATABASE_READONLY_URL = os.getenv("DATABASE_READONLY_URL")
+if DATABASE_READONLY_URL and DATABASE_READONLY_URL.startswith("postgresql://"):
+    DATABASE_READONLY_URL = DATABASE_READONLY_URL.replace(
+        "postgresql://", "postgresql+asyncpg://", 1)
+
+if DATABASE_READONLY_URL:
+    readonly_engine = create_async_engine(
+        DATABASE_READONLY_URL, **_engine_options(DATABASE_READONLY_URL))
+    print(f"🔗 Using read-only replica: {DATABASE_READONLY_URL[:50]}...")
+else:
+    readonly_engine = async_engine
+
+# bot_db_query_seconds + per-request statement counts
+instrument_engine(async_engine)
+query_profiler.install(async_engine)
+if readonly_engine is not async_engine:
+    instrument_engine(readonly_engine)
+    query_profiler.install(readonly_engine)
+
+# имя async_sessionmaker выше занято фабрикой основной БД
+readonly_sessionmaker: _session_factory[AsyncSession] = _session_factory(
+    bind=readonly_engine, expire_on_commit=False
+)
+
+# Сессия, привязанная к текущему апдейту / HTTP запросу
+_current_session: ContextVar[Optional[AsyncSession]] = ContextVar(
+    "current_db_session", default=None)
+
+
+@asynccontextmanager
+async def request_session() -> AsyncIterator[AsyncSession]:
+    """Open one session for the whole update and share it via contextvar.
+
+    Nested calls reuse the already bound session.
+    """
+    current = _current_session.get()
+    if current is not None:
+        yield current
+        return
+
+    async with async_sessionmaker() as session:
+        token = _current_session.set(session)
+        try:
+            yield session
+        finally:
+            _current_session.reset(token)
+
+
+@asynccontextmanager
+async def session_scope() -> AsyncIterator[AsyncSession]:
+    """Session for a service call: the request session if bound, else a new one"""
+    current = _current_session.get()
+    if current is None:
+        async with async_sessionmaker() as session:
+            yield session
+        return
+
+    try:
+        yield current
+    except Exception:
+        # не оставляем общую сессию в сломанной транзакции
+        await current.rollback()
+        raise
+
 metadata_obj = MetaData()
 
 
@@ -117,6 +244,10 @@ class Category(Base):
 
 class User(Base, TimestampMixin):
     __tablename__ = "users"
+    __table_args__ = (
+        Index("ix_users_phone", "phone"),
+        Index("ux_users_phone_e164", "phone_e164", unique=True),
+    )
 
     id: Mapped[int] = mapped_column(
         Integer, primary_key=True, autoincrement=True)
@@ -124,15 +255,49 @@ class User(Base, TimestampMixin):
     first_name: Mapped[Optional[str]] = mapped_column(String(100))
     last_name: Mapped[Optional[str]] = mapped_column(String(100))
     phone: Mapped[Optional[str]] = mapped_column(String(32))
+    # +79991234567 – заполняется при записи phone, используется для поиска
+    phone_e164: Mapped[Optional[str]] = mapped_column(String(16))
     email: Mapped[Optional[str]] = mapped_column(String(120))
     preferred_contact: Mapped[str] = mapped_column(
         String(20), default="telegram")
     applications: Mapped[list["Application"]
                          ] = relationship(back_populates="user")
 
+    @validates("phone")
+    def _normalize_phone(self, key: str, phone: Optional[str]) -> Optional[str]:
+        # номер освобождается у других пользователей при flush (_release_flushed_phones)
+        self.phone_e164 = normalize_phone_e164(phone)
+        return phone
+
+
+@event.listens_for(Session, "before_flush")
+def _release_flushed_phones(session, flush_context, instances) -> None:
+    """ORM writes of User.phone take the number over, like UserService.upsert_user.
+
+    ux_users_phone_e164 allows one user per number: before the new value is
+    flushed it is cleared on every other row, otherwise the flush fails with
+    IntegrityError.
+    """
+    for obj in (*session.new, *session.dirty):
+        if not isinstance(obj, User) or not obj.phone_e164:
+            continue
+        if obj not in session.new and not inspect(obj).attrs.phone_e164.history.has_changes():
+            continue
+        stmt = update(User.__table__).where(User.__table__.c.phone_e164 == obj.phone_e164)
+        if obj.id is not None:
+            stmt = stmt.where(User.__table__.c.id != obj.id)
+        # Core UPDATE – без autoflush и без синхронизации identity map
+        session.connection().execute(stmt.values(phone_e164=None))
+
 
 class Application(Base, TimestampMixin):
     __tablename__ = "applications"
+    __table_args__ = (
+        Index("ix_applications_status_created_at", "status", "created_at"),
+        Index("ix_applications_user_id", "user_id"),
+        # keyset-пагинация админ-списка (bot.services.application_listing)
+        Index("ix_applications_created_at_id", "created_at", "id"),
+    )
 
     id: Mapped[int] = mapped_column(
         Integer, primary_key=True, autoincrement=True)
@@ -199,6 +364,10 @@ class Log(Base):
 class ContentFingerprint(Base, TimestampMixin):
     """Отпечатки контента для системы дедупликации"""
     __tablename__ = "content_fingerprints"
+    __table_args__ = (
+        Index("ix_content_fingerprints_type_created_at",
+              "content_type", "created_at"),
+    )
 
     id: Mapped[int] = mapped_column(
         Integer, primary_key=True, autoincrement=True)
@@ -213,56 +382,178 @@ class ContentFingerprint(Base, TimestampMixin):
         DateTime(timezone=True), nullable=True)
 
 
-# -------- DB init ----------
+class SchemaVersion(Base):
+    """Marker of the schema that init_db() last brought the database to"""
+    __tablename__ = "schema_version"
 
-async def init_db() -> None:
-    """Create tables if they don't exist (for first run)"""
-    async with async_engine.begin() as conn:
-        await conn.run_sync(Base.metadata.create_all)
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    version: Mapped[str] = mapped_column(String(64))
+    applied_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True), default=func.now(), onupdate=func.now())
 
-        # 🚨 КРИТИЧЕСКИЙ ФИКС: Telegram ID overflow INTEGER → BIGINT
-        try:
-            print("🔧 Checking for Telegram ID overflow fix...")
 
-            # Проверяем тип колонки users.tg_id
-            result = await conn.execute(text("""
+class OutboxJob(Base, TimestampMixin):
+    """Side effect to run after commit (Sheets, notifications, ...)"""
+    __tablename__ = "outbox_jobs"
+    __table_args__ = (
+        # выборка готовых к запуску задач воркерами outbox
+        Index("ix_outbox_jobs_status_next_attempt_at", "status", "next_attempt_at"),
+    )
+
+    id: Mapped[int] = mapped_column(
+        Integer, primary_key=True, autoincrement=True)
+    kind: Mapped[str] = mapped_column(String(64), nullable=False)
+    payload: Mapped[dict] = mapped_column(JSON, default=dict)
+    status: Mapped[str] = mapped_column(
+        String(16), default="pending")  # pending/done/failed
+    attempts: Mapped[int] = mapped_column(Integer, default=0)
+    max_attempts: Mapped[int] = mapped_column(Integer, default=8)
+    # следующая попытка; у взятой в работу задачи – конец аренды
+    next_attempt_at: Mapped[datetime] = mapped_column(DateTime(timezone=True))
+    last_error: Mapped[Optional[str]] = mapped_column(Text)
+
+
+# -------- DB init ----------
+
+# Увеличить при изменении шагов init_db(), не связанных с моделями
+# (фиксы типов, сиды справочников)
+SCHEMA_INIT_REVISION = 2
+
+
+def schema_fingerprint() -> str:
+    """Hash of the declared tables, columns and indexes + init revision"""
+    parts = [f"init:{SCHEMA_INIT_REVISION}"]
+    for table in Base.metadata.sorted_tables:
+        parts.append(f"t:{table.name}")
+        for column in table.columns:
+            parts.append(f"c:{column.name}:{column.type!r}:{column.nullable}:{column.unique}")
+        for index in sorted(table.indexes, key=lambda ix: ix.name or ""):
+            parts.append(f"i:{index.name}:{index.unique}")
+    return hashlib.sha256("|".join(parts).encode()).hexdigest()[:32]
+
+
+async def _current_schema_version(conn) -> Optional[str]:
+    """Stored marker or None if the marker table does not exist yet"""
+    try:
+        # SAVEPOINT: на PostgreSQL ошибка иначе ломает всю транзакцию
+        async with conn.begin_nested():
+            result = await conn.execute(
+                select(SchemaVersion.version).where(SchemaVersion.id == 1))
+            return result.scalar_one_or_none()
+    except Exception:
+        return None
+
+
+async def _fix_telegram_id_overflow(conn) -> None:
+    """Convert users/admins.tg_id INTEGER → BIGINT on old databases"""
+    # 🚨 КРИТИЧЕСКИЙ ФИКС: Telegram ID overflow INTEGER → BIGINT
+    try:
+        print("🔧 Checking for Telegram ID overflow fix...")
+
+        # Проверяем тип колонки users.tg_id
+        result = await conn.execute(text("""
+            SELECT data_type FROM information_schema.columns 
+            WHERE table_name = 'users' AND column_name = 'tg_id'
+            AND table_schema = 'public'
+        """))
+
+        current_type = result.scalar_one_or_none()
+
+        if current_type == "integer":
+            print("🚨 APPLYING CRITICAL FIX: Converting INTEGER → BIGINT...")
+
+            # Фиксим users.tg_id
+            await conn.execute(text("ALTER TABLE users ALTER COLUMN tg_id TYPE BIGINT;"))
+            print("   ✅ users.tg_id → BIGINT")
+
+            # Фиксим admins.tg_id (если существует)
+            admin_check = await conn.execute(text("""
                 SELECT data_type FROM information_schema.columns 
-                WHERE table_name = 'users' AND column_name = 'tg_id'
+                WHERE table_name = 'admins' AND column_name = 'tg_id'
                 AND table_schema = 'public'
             """))
 
-            current_type = result.scalar_one_or_none()
+            if admin_check.scalar_one_or_none() == "integer":
+                await conn.execute(text("ALTER TABLE admins ALTER COLUMN tg_id TYPE BIGINT;"))
+                print("   ✅ admins.tg_id → BIGINT")
 
-            if current_type == "integer":
-                print("🚨 APPLYING CRITICAL FIX: Converting INTEGER → BIGINT...")
+            print("🎉 TELEGRAM ID OVERFLOW FIXED! Large IDs now supported.")
 
-                # Фиксим users.tg_id
-                await conn.execute(text("ALTER TABLE users ALTER COLUMN tg_id TYPE BIGINT;"))
-                print("   ✅ users.tg_id → BIGINT")
+        elif current_type == "bigint":
+            print("✅ Telegram ID overflow already fixed (BIGINT detected)")
+        else:
+            print(f"⚠️  Unexpected tg_id type: {current_type}")
 
-                # Фиксим admins.tg_id (если существует)
-                admin_check = await conn.execute(text("""
-                    SELECT data_type FROM information_schema.columns 
-                    WHERE table_name = 'admins' AND column_name = 'tg_id'
-                    AND table_schema = 'public'
-                """))
+    except Exception as e:
+        print(f"⚠️  Could not apply Telegram ID fix: {e}")
+        # Не критично - продолжаем инициализацию
 
-                if admin_check.scalar_one_or_none() == "integer":
-                    await conn.execute(text("ALTER TABLE admins ALTER COLUMN tg_id TYPE BIGINT;"))
-                    print("   ✅ admins.tg_id → BIGINT")
 
-                print("🎉 TELEGRAM ID OVERFLOW FIXED! Large IDs now supported.")
+PHONE_BACKFILL_BATCH_SIZE = 1000
 
-            elif current_type == "bigint":
-                print("✅ Telegram ID overflow already fixed (BIGINT detected)")
-            else:
-                print(f"⚠️  Unexpected tg_id type: {current_type}")
 
-        except Exception as e:
-            print(f"⚠️  Could not apply Telegram ID fix: {e}")
-            # Не критично - продолжаем инициализацию
+def backfill_users_phone_e164(sync_conn, batch_size: int = PHONE_BACKFILL_BATCH_SIZE) -> int:
+    """Fill users.phone_e164 from phone in pages of batch_size; returns rows updated.
 
-    # seed default categories if empty
+    One number – one user: the newest row wins, so pages go by id descending.
+    Shared by init_db() and alembic revision 03_users_phone_e164.
+    """
+    users = User.__table__
+    stmt = (
+        users.update()
+        .where(users.c.id == bindparam("user_id"))
+        .values(phone_e164=bindparam("phone_e164"))
+    )
+
+    seen = set()
+    updated = 0
+    last_id = None
+    while True:
+        query = (
+            select(users.c.id, users.c.phone)
+            .where(users.c.phone.isnot(None))
+            .order_by(users.c.id.desc())
+            .limit(batch_size)
+        )
+        if last_id is not None:
+            query = query.where(users.c.id < last_id)
+        rows = sync_conn.execute(query).all()
+        if not rows:
+            return updated
+        last_id = rows[-1][0]
+
+        updates = []
+        for user_id, phone in rows:
+            phone_e164 = normalize_phone_e164(phone)
+            if not phone_e164 or phone_e164 in seen:
+                continue
+            seen.add(phone_e164)
+            updates.append({"user_id": user_id, "phone_e164": phone_e164})
+        if updates:
+            sync_conn.execute(stmt, updates)
+            updated += len(updates)
+
+
+def _add_users_phone_e164(sync_conn) -> None:
+    """users.phone_e164 + backfill + unique index on tables created before it.
+
+    create_all() never adds columns to an existing table, and deploys do not
+    run `alembic upgrade` – without this every select(User) fails.
+    """
+    columns = {column["name"] for column in inspect(sync_conn).get_columns("users")}
+    if "phone_e164" not in columns:
+        print("🔧 Adding users.phone_e164...")
+        if_not_exists = "IF NOT EXISTS " if sync_conn.dialect.name == "postgresql" else ""
+        sync_conn.execute(text(f"ALTER TABLE users ADD COLUMN {if_not_exists}phone_e164 VARCHAR(16)"))
+        updated = backfill_users_phone_e164(sync_conn)
+        print(f"   ✅ users.phone_e164 backfilled for {updated} users")
+
+    sync_conn.execute(text(
+        "CREATE UNIQUE INDEX IF NOT EXISTS ux_users_phone_e164 ON users (phone_e164)"))
+
+
+async def _seed_categories() -> None:
+    """Seed default categories if empty"""
     async with async_sessionmaker() as session:
         result = await session.execute(func.count(Category.id))
         if result.scalar_one() == 0:
@@ -282,3 +573,43 @@ async def init_db() -> None:
             ]
             session.add_all([Category(name=n) for n in default_names])
             await session.commit()
+
+
+async def init_db() -> None:
+    """Create tables if they don't exist (for first run).
+
+    When the stored schema marker matches schema_fingerprint(), all DDL and
+    introspection is skipped – a warm start costs one SELECT.
+    """
+    timer = StartupTimer("init_db")
+    fingerprint = schema_fingerprint()
+
+    async with async_engine.begin() as conn:
+        with timer.phase("marker"):
+            current = await _current_schema_version(conn)
+
+        if current == fingerprint:
+            logger.info("✅ Database schema is current, skipping DDL checks")
+            timer.log()
+            return
+
+        with timer.phase("create_all"):
+            await conn.run_sync(Base.metadata.create_all)
+
+        with timer.phase("phone_e164"):
+            await conn.run_sync(_add_users_phone_e164)
+
+        if conn.dialect.name == "postgresql":
+            with timer.phase("bigint_fix"):
+                await _fix_telegram_id_overflow(conn)
+
+    with timer.phase("seed_categories"):
+        await _seed_categories()
+
+    with timer.phase("marker_write"):
+        async with async_sessionmaker() as session:
+            await session.merge(SchemaVersion(id=1, version=fingerprint))
+            await session.commit()
+
+    logger.info(f"🗄️ Database schema updated to {fingerprint[:12]} (was {current and current[:12]})")
+    timer.log()
@@ -0,0 +1,115 @@
+"""Streaming exports of applications (Application ⨝ User ⨝ Category).
+
+Rows are read through a server-side cursor (`stream_results` + `yield_per`)
+on the read-only engine and converted to CSV / JSONL chunk by chunk, so
+memory use does not depend on table size. Used by the admin HTTP endpoint
+`/api/admin/export/applications` and `python manage.py export-applications`.
+
+Usage:
+    from bot.services.exports import iter_applications_export
+
+    async for chunk in iter_applications_export("csv"):
+        output.write(chunk)
+"""
+
+from __future__ import annotations
+
+import csv
+import io
+import json
+import logging
+from datetime import date, datetime
+from decimal import Decimal
+from typing import Any, AsyncIterator, Dict, List
+
+from sqlalchemy import select
+
+from bot.config.settings import EXPORT_BATCH_SIZE
+from bot.services.db import readonly_engine, Application, Category, User
+
+logger = logging.getLogger(__name__)
+
+__all__ = ["EXPORT_FORMATS", "EXPORT_COLUMNS", "iter_application_rows", "iter_applications_export"]
+
+# формат → MIME тип ответа
+EXPORT_FORMATS = {
+    "csv": "text/csv; charset=utf-8",
+    "jsonl": "application/x-ndjson",
+}
+
+_COLUMNS = [
+    ("application_id", Application.id),
+    ("created_at", Application.created_at),
+    ("status", Application.status),
+    ("category", Category.name),
+    ("subcategory", Application.subcategory),
+    ("description", Application.description),
+    ("contact_method", Application.contact_method),
+    ("contact_time", Application.contact_time),
+    ("price", Application.price),
+    ("assigned_admin", Application.assigned_admin),
+    ("utm_source", Application.utm_source),
+    ("user_id", User.id),
+    ("tg_id", User.tg_id),
+    ("first_name", User.first_name),
+    ("last_name", User.last_name),
+    ("phone", User.phone),
+    ("email", User.email),
+]
+
+EXPORT_COLUMNS = [name for name, _column in _COLUMNS]
+
+
+def _export_query():
+    return (
+        select(*(column.label(name) for name, column in _COLUMNS))
+        .join(User, Application.user_id == User.id)
+        .join(Category, Application.category_id == Category.id)
+        .order_by(Application.id)
+    )
+
+
+def _to_plain(value: Any) -> Any:
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return str(value)
+    return value
+
+
+async def iter_application_rows(batch_size: int = EXPORT_BATCH_SIZE) -> AsyncIterator[List[Dict[str, Any]]]:
+    """Yield export rows in batches of `batch_size` from a server-side cursor"""
+    stmt = _export_query().execution_options(yield_per=batch_size)
+
+    async with readonly_engine.connect() as conn:
+        result = await conn.stream(stmt)
+        async for partition in result.mappings().partitions():
+            yield [{key: _to_plain(value) for key, value in row.items()} for row in partition]
+
+
+async def iter_applications_export(fmt: str = "csv", batch_size: int = EXPORT_BATCH_SIZE) -> AsyncIterator[str]:
+    """Yield CSV / JSONL text chunks, one per fetched batch"""
+    if fmt not in EXPORT_FORMATS:
+        raise ValueError(f"Unsupported export format: {fmt}")
+
+    total = 0
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=EXPORT_COLUMNS) if fmt == "csv" else None
+
+    if writer:
+        writer.writeheader()
+        yield buffer.getvalue()
+
+    async for rows in iter_application_rows(batch_size):
+        buffer.seek(0)
+        buffer.truncate()
+        if writer:
+            writer.writerows(rows)
+        else:
+            for row in rows:
+                buffer.write(json.dumps(row, ensure_ascii=False))
+                buffer.write("\n")
+        total += len(rows)
+        yield buffer.getvalue()
+
+    logger.info(f"📤 Exported {total} applications as {fmt}")
@@ -0,0 +1,131 @@
+"""Background health snapshot for /health and AI status endpoints.
+
+Building an AIEnhancedManager, initializing it and opening a DB session on
+every probe turned load balancer health checks into real load. Instead one
+background task refreshes a snapshot every HEALTH_REFRESH_INTERVAL seconds
+(with one long-lived AIEnhancedManager) and the endpoints return the cached
+result. The loop is started from the app startup hook; until its first
+refresh finishes probes get a `{"status": "starting"}` placeholder, so a
+probe never runs the checks itself. `/health/live` does no I/O at all.
+
+Usage:
+    from bot.services.health_snapshot import health_monitor
+
+    health_monitor.start()                       # on startup
+    snapshot = health_monitor.get_snapshot()     # cached, refreshed in background
+    await health_monitor.stop()                  # on shutdown
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import time
+from datetime import datetime
+from typing import Any, Dict, Optional
+
+from sqlalchemy import text
+
+from bot.config.settings import HEALTH_CHECK_TIMEOUT, HEALTH_REFRESH_INTERVAL
+from bot.services.db import async_engine
+
+logger = logging.getLogger(__name__)
+
+__all__ = ["HealthMonitor", "health_monitor"]
+
+# отдаётся, пока фоновый цикл не сделал первую проверку
+STARTING_SNAPSHOT = {"status": "starting"}
+
+
+class HealthMonitor:
+    """Periodically refreshed DB + Enhanced AI health snapshot"""
+
+    def __init__(self, interval: float = HEALTH_REFRESH_INTERVAL, timeout: float = HEALTH_CHECK_TIMEOUT):
+        self.interval = interval
+        self.timeout = timeout
+        self._ai_manager = None
+        self._snapshot: Optional[Dict[str, Any]] = None
+        self._refreshed_at = 0.0
+        self._task: Optional[asyncio.Task] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    # -------- checks ----------
+
+    async def _check_db(self) -> Dict[str, Any]:
+        started = time.perf_counter()
+        try:
+            async with async_engine.connect() as conn:
+                await asyncio.wait_for(conn.execute(text("SELECT 1")), self.timeout)
+            return {"status": "connected", "latency_ms": round((time.perf_counter() - started) * 1000, 2)}
+        except Exception as e:
+            return {"status": "disconnected", "error": str(e)}
+
+    async def _check_ai(self) -> Dict[str, Any]:
+        try:
+            if self._ai_manager is None:
+                from bot.services.ai_enhanced import AIEnhancedManager
+                self._ai_manager = AIEnhancedManager()
+            if not self._ai_manager._initialized:
+                await asyncio.wait_for(self._ai_manager.initialize(), self.timeout)
+            health = await asyncio.wait_for(self._ai_manager.health_check(), self.timeout)
+        except Exception as e:
+            health = {"status": "unhealthy", "error": str(e)}
+
+        initialized = bool(self._ai_manager and self._ai_manager._initialized)
+        return {"initialized": initialized, "health": health}
+
+    async def refresh(self) -> Dict[str, Any]:
+        """Run all checks now and replace the snapshot"""
+        started = time.perf_counter()
+        db, ai = await asyncio.gather(self._check_db(), self._check_ai())
+        self._snapshot = {
+            "status": "ready",
+            "db": db,
+            "ai": ai,
+            "checked_at": datetime.now().isoformat(),
+            "check_duration_ms": round((time.perf_counter() - started) * 1000, 2),
+        }
+        self._refreshed_at = time.monotonic()
+        return self._snapshot
+
+    # -------- background loop ----------
+
+    def start(self) -> None:
+        """Start the refresh loop on the running event loop (idempotent)"""
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            self._task = None
+            self._loop = loop
+        if self._task is None or self._task.done():
+            self._task = loop.create_task(self._run(), name="health-snapshot")
+
+    async def _run(self) -> None:
+        while True:
+            # свежий снимок (например, после refresh() вручную) не перепроверяем
+            wait = self.interval - (time.monotonic() - self._refreshed_at)
+            if self._snapshot is None or wait <= 0:
+                try:
+                    await self.refresh()
+                except asyncio.CancelledError:
+                    raise
+                except Exception as e:
+                    logger.error(f"❌ Health snapshot refresh failed: {e}")
+                    self._refreshed_at = time.monotonic()
+                wait = self.interval
+            await asyncio.sleep(wait)
+
+    async def stop(self) -> None:
+        if self._task is not None and self._loop is asyncio.get_running_loop():
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+        self._task = None
+
+    def get_snapshot(self) -> Dict[str, Any]:
+        """Cached snapshot, or STARTING_SNAPSHOT before the first refresh"""
+        if self._snapshot is None:
+            return dict(STARTING_SNAPSHOT)
+        return {**self._snapshot, "age_seconds": round(time.monotonic() - self._refreshed_at, 1)}
+
+
+# Global monitor instance
+health_monitor = HealthMonitor()
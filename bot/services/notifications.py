@@ -9,7 +9,7 @@ Env vars:
 from __future__ import annotations
 
 import os
-from typing import TYPE_CHECKING, Optional
+from typing import TYPE_CHECKING, Dict, Iterable, Optional
 
 if TYPE_CHECKING:
     from bot.services.db import Application, User
@@ -26,12 +26,19 @@ if not SMS_ENABLED:
     print("⚠️ SMS notifications disabled: SMS_RU_API_KEY not set")
 
 
-async def notify_client_application_received(user: "User", app: "Application") -> None:
-    """Notify client that application was received."""
+async def notify_client_application_received(user: "User", app: "Application",
+                                             channels: Optional[Iterable[str]] = None) -> Dict[str, str]:
+    """Notify client that application was received.
+
+    channels limits delivery to some of "email" / "sms" (a retry of the
+    failed ones). Returns channel -> error for deliveries that failed.
+    """
     print(f"📧 [NOTIFY] Application #{app.id} received for user {user.tg_id}")
+    channels = {"email", "sms"} if channels is None else set(channels)
+    failed: Dict[str, str] = {}
 
     # Email notification
-    if EMAIL_ENABLED and user.email:
+    if "email" in channels and EMAIL_ENABLED and user.email:
         try:
             await _send_email(
                 to=user.email,
@@ -40,9 +47,10 @@ async def notify_client_application_received(user: "User", app: "Application") -
             )
         except Exception as e:
             print(f"⚠️ Email error: {e}")
+            failed["email"] = str(e)
 
     # SMS notification
-    if SMS_ENABLED and user.phone and user.preferred_contact == "sms":
+    if "sms" in channels and SMS_ENABLED and user.phone and user.preferred_contact == "sms":
         try:
             await _send_sms(
                 phone=user.phone,
@@ -50,6 +58,9 @@ async def notify_client_application_received(user: "User", app: "Application") -
             )
         except Exception as e:
             print(f"⚠️ SMS error: {e}")
+            failed["sms"] = str(e)
+
+    return failed
 
 
 async def notify_client_status_update(user: "User", app: "Application", status: str) -> None:
@@ -0,0 +1,262 @@
+"""Transactional outbox – side effects that run after the DB commit.
+
+A request enqueues jobs in the same transaction as its own rows
+(`outbox.enqueue(session, kind, payload)`), commits and answers at once;
+background workers then run the registered handler for each job. A job is
+"done" only when its handler returns; a handler that raises is retried with
+exponential backoff up to `max_attempts`, after which the job stays in the
+table with status "failed" and the last error. A handler that got part of
+the work through raises `PartialFailure(message, payload)`: the job is
+retried the same way, with the payload narrowed to what is left.
+
+Claiming is a conditional UPDATE (`status='pending' AND next_attempt_at <= now`)
+that moves `next_attempt_at` forward by OUTBOX_LEASE_SECONDS, so several
+workers / processes never run the same job at once, and a job whose worker
+crashed becomes due again when the lease expires.
+
+Usage:
+    from bot.services.outbox import outbox
+
+    @outbox.handler("submit.sheets")
+    async def append_to_sheets(payload): ...
+
+    @outbox.handler("submit.admin_notification")
+    async def notify_admins(payload):
+        failed = await send(payload.get("admin_ids"))
+        if failed:
+            raise PartialFailure(f"{len(failed)} admins", {**payload, "admin_ids": failed})
+
+    outbox.enqueue(session, "submit.sheets", {"application_id": app.id})
+    await session.commit()
+    outbox.wake()
+
+    await outbox.stop()  # on shutdown
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from sqlalchemy import select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from bot.config.settings import (
+    OUTBOX_LEASE_SECONDS,
+    OUTBOX_MAX_ATTEMPTS,
+    OUTBOX_POLL_INTERVAL,
+    OUTBOX_RETRY_BASE,
+    OUTBOX_RETRY_MAX,
+    OUTBOX_WORKERS,
+)
+from bot.services.db import async_engine, request_session, OutboxJob
+
+logger = logging.getLogger(__name__)
+
+__all__ = ["Outbox", "PartialFailure", "outbox"]
+
+JobHandler = Callable[[Dict[str, Any]], Awaitable[None]]
+
+
+def _utcnow() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+class PartialFailure(Exception):
+    """Part of the job is done – retry it with `payload` (the rest)"""
+
+    def __init__(self, message: str, payload: Dict[str, Any]):
+        super().__init__(message)
+        self.payload = payload
+
+
+class Outbox:
+    """Outbox job registry and worker pool"""
+
+    def __init__(self, workers: int = OUTBOX_WORKERS, batch_size: int = 10):
+        self.workers = workers
+        self.batch_size = batch_size
+        self._handlers: Dict[str, JobHandler] = {}
+
+        self._tasks: List[asyncio.Task] = []
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._wakeup: Optional[asyncio.Event] = None
+
+        # metrics
+        self.enqueued = 0
+        self.succeeded = 0
+        self.retried = 0
+        self.failed = 0
+        self.last_error: Optional[str] = None
+        self.last_run_ms = 0.0
+
+    # -------- registry ----------
+
+    def handler(self, kind: str) -> Callable[[JobHandler], JobHandler]:
+        """Decorator registering the coroutine that runs jobs of `kind`"""
+        def register(func: JobHandler) -> JobHandler:
+            self._handlers[kind] = func
+            return func
+        return register
+
+    def enqueue(self, session: AsyncSession, kind: str, payload: Dict[str, Any],
+                max_attempts: int = OUTBOX_MAX_ATTEMPTS) -> OutboxJob:
+        """Add a job to the session; it becomes visible on commit"""
+        job = OutboxJob(
+            kind=kind,
+            payload=payload,
+            status="pending",
+            attempts=0,
+            max_attempts=max_attempts,
+            next_attempt_at=_utcnow(),
+        )
+        session.add(job)
+        self.enqueued += 1
+        return job
+
+    # -------- lifecycle ----------
+
+    def wake(self) -> None:
+        """Start workers if needed and make them look for due jobs now"""
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            # новый event loop – воркеры создаются заново
+            self._wakeup = asyncio.Event()
+            self._tasks = []
+            self._loop = loop
+
+        self._tasks = [task for task in self._tasks if not task.done()]
+        for i in range(len(self._tasks), self.workers):
+            self._tasks.append(loop.create_task(self._worker(), name=f"outbox-worker-{i}"))
+        self._wakeup.set()
+
+    async def stop(self) -> None:
+        """Stop workers; unfinished jobs stay pending for the next start"""
+        if self._loop is not asyncio.get_running_loop():
+            return
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    # -------- workers ----------
+
+    async def _worker(self) -> None:
+        while True:
+            try:
+                processed = await self.run_due()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                # БД недоступна и т.п. – подождём и попробуем снова
+                logger.error(f"❌ Outbox worker error: {e}")
+                processed = 0
+
+            if processed:
+                continue
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), OUTBOX_POLL_INTERVAL)
+            except asyncio.TimeoutError:
+                pass
+
+    async def _claim(self) -> List[OutboxJob]:
+        now = _utcnow()
+        due = (OutboxJob.status == "pending") & (OutboxJob.next_attempt_at <= now)
+        claimed: List[OutboxJob] = []
+
+        async with async_engine.begin() as conn:
+            candidates = (await conn.execute(
+                select(OutboxJob.id)
+                .where(due)
+                .order_by(OutboxJob.next_attempt_at)
+                .limit(self.batch_size)
+            )).scalars().all()
+
+            for job_id in candidates:
+                result = await conn.execute(
+                    update(OutboxJob)
+                    .where(OutboxJob.id == job_id, due)
+                    .values(
+                        attempts=OutboxJob.attempts + 1,
+                        next_attempt_at=now + timedelta(seconds=OUTBOX_LEASE_SECONDS),
+                    )
+                    .returning(OutboxJob.id, OutboxJob.kind, OutboxJob.payload,
+                               OutboxJob.attempts, OutboxJob.max_attempts)
+                )
+                row = result.first()
+                if row is not None:  # иначе задачу забрал другой воркер
+                    claimed.append(OutboxJob(
+                        id=row.id, kind=row.kind, payload=row.payload,
+                        attempts=row.attempts, max_attempts=row.max_attempts))
+
+        return claimed
+
+    async def run_due(self) -> int:
+        """Claim and run one batch of due jobs; returns how many were run"""
+        jobs = await self._claim()
+        for job in jobs:
+            await self._run(job)
+        return len(jobs)
+
+    async def _run(self, job: OutboxJob) -> None:
+        started = time.perf_counter()
+        handler = self._handlers.get(job.kind)
+        try:
+            if handler is None:
+                raise LookupError(f"No outbox handler for {job.kind!r}")
+            # одна DB-сессия на задачу для всех сервисов
+            async with request_session():
+                await handler(job.payload or {})
+        except Exception as e:
+            await self._record_failure(job, e)
+        else:
+            self.succeeded += 1
+            async with async_engine.begin() as conn:
+                await conn.execute(
+                    update(OutboxJob).where(OutboxJob.id == job.id)
+                    .values(status="done", last_error=None))
+        finally:
+            self.last_run_ms = (time.perf_counter() - started) * 1000
+
+    async def _record_failure(self, job: OutboxJob, error: Exception) -> None:
+        self.last_error = f"{job.kind}: {error}"
+        values: Dict[str, Any] = {"last_error": str(error)[:2000]}
+        if isinstance(error, PartialFailure):
+            values["payload"] = error.payload
+
+        if job.attempts >= job.max_attempts:
+            self.failed += 1
+            values["status"] = "failed"
+            logger.error(f"❌ Outbox job {job.id} ({job.kind}) failed after {job.attempts} attempts: {error}")
+        else:
+            self.retried += 1
+            delay = min(OUTBOX_RETRY_BASE * 2 ** (job.attempts - 1), OUTBOX_RETRY_MAX)
+            values["next_attempt_at"] = _utcnow() + timedelta(seconds=delay)
+            logger.warning(
+                f"⚠️ Outbox job {job.id} ({job.kind}) attempt {job.attempts} failed, retry in {delay:.0f}s: {error}")
+
+        async with async_engine.begin() as conn:
+            await conn.execute(update(OutboxJob).where(OutboxJob.id == job.id).values(**values))
+
+    # -------- metrics ----------
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Worker and job counters of this process"""
+        return {
+            "workers": len([task for task in self._tasks if not task.done()]),
+            "handlers": sorted(self._handlers),
+            "enqueued": self.enqueued,
+            "succeeded": self.succeeded,
+            "retried": self.retried,
+            "failed": self.failed,
+            "last_run_ms": round(self.last_run_ms, 2),
+            "last_error": self.last_error,
+        }
+
+
+# Global outbox instance
+outbox = Outbox()
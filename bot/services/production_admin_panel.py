@@ -11,6 +11,9 @@ from typing import Dict, List, Optional, Any, Tuple
 from telegram import Bot, InlineKeyboardButton, InlineKeyboardMarkup
 from telegram.error import TelegramError
 from telegram.constants import ParseMode
+from sqlalchemy import select, func
+
+from bot.services.db import async_engine, readonly_engine, readonly_sessionmaker, User, ContentFingerprint
 
 logger = logging.getLogger(__name__)
 
@@ -314,7 +317,8 @@ class ProductionAdminPanel:
                 "status": "healthy",
                 "details": {
                     "configured": True,
-                    "url_available": bool(database_url)
+                    "url_available": bool(database_url),
+                    "readonly_replica": readonly_engine is not async_engine
                 }
             }
 
@@ -449,11 +453,29 @@ class ProductionAdminPanel:
 
     async def _count_total_users(self) -> int:
         """Подсчет общего количества пользователей"""
-        return 150  # Заглушка
+        try:
+            async with readonly_sessionmaker() as session:
+                result = await session.execute(select(func.count(User.id)))
+                return result.scalar_one()
+        except Exception as e:
+            logger.error(f"Error counting users: {e}")
+            return 0
 
     async def _count_posts_today(self) -> int:
-        """Подсчет постов за сегодня"""
-        return 12  # Заглушка
+        """Подсчет постов за сегодня (по отпечаткам дедупликации)"""
+        try:
+            today_start = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
+            async with readonly_sessionmaker() as session:
+                result = await session.execute(
+                    select(func.count(ContentFingerprint.id)).where(
+                        ContentFingerprint.content_type == "post",
+                        ContentFingerprint.created_at >= today_start,
+                    )
+                )
+                return result.scalar_one()
+        except Exception as e:
+            logger.error(f"Error counting posts: {e}")
+            return 0
 
     async def _count_comments_today(self) -> int:
         """Подсчет комментариев за сегодня"""
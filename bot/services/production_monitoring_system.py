@@ -13,6 +13,8 @@ from enum import Enum
 from telegram import Bot
 from telegram.error import TelegramError
 
+from bot.services.send_governor import SendPriority, send_governor
+
 logger = logging.getLogger(__name__)
 
 
@@ -295,11 +297,11 @@ class ProductionMonitoringSystem:
         # Отправка в Telegram
         try:
             formatted_message = self._format_alert_message(alert)
-            await self.bot.send_message(
+            await send_governor.send(self.admin_chat_id, lambda: self.bot.send_message(
                 chat_id=self.admin_chat_id,
                 text=formatted_message,
                 parse_mode="Markdown"
-            )
+            ), SendPriority.ADMIN_ALERT)
         except Exception as e:
             logger.error(f"Failed to send alert: {e}")
 
@@ -0,0 +1,259 @@
+"""Query plan regression check for hot-path queries.
+
+Runs EXPLAIN for the queries issued on every user update / admin listing and
+reports any that fall back to a sequential scan. Used by
+`python manage.py check-query-plans`.
+
+PostgreSQL: sequential scans are disabled for the transaction
+(`enable_seqscan = off`), so a "Seq Scan" node in the plan means there is no
+usable index at all – independent of table size and statistics.
+SQLite: `EXPLAIN QUERY PLAN` rows of the form "SCAN <table>" are flagged.
+
+Synthetic rows (DEFAULT_SEED_ROWS unless told otherwise) are inserted first so
+the planner sees realistic cardinality; everything runs in one transaction
+that is rolled back at the end. A query whose table does not exist is
+reported as "skipped" – the command treats that as a failure too.
+"""
+
+from __future__ import annotations
+
+import json
+import logging
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import inspect, select, text
+from sqlalchemy.ext.asyncio import AsyncConnection, AsyncSession
+
+from bot.services.db import async_engine, Category, User, Application, ContentFingerprint
+
+logger = logging.getLogger(__name__)
+
+__all__ = ["HotQuery", "PlanCheck", "HOT_QUERIES", "DEFAULT_SEED_ROWS", "check_hot_query_plans"]
+
+# синтетических строк на таблицу перед EXPLAIN
+DEFAULT_SEED_ROWS = 1000
+
+
+@dataclass(frozen=True)
+class HotQuery:
+    """Query that must be served by an index"""
+    name: str
+    sql: str
+    params: Dict[str, Any]
+    tables: tuple
+
+
+def _hot_queries() -> List[HotQuery]:
+    now = datetime.now()
+    return [
+        HotQuery(
+            "applications_by_status",
+            "SELECT id FROM applications WHERE status = :status "
+            "ORDER BY created_at DESC LIMIT 20",
+            {"status": "new"},
+            ("applications",),
+        ),
+        HotQuery(
+            "applications_keyset_page",
+            "SELECT id FROM applications WHERE (created_at, id) < (:created_at, :id) "
+            "ORDER BY created_at DESC, id DESC LIMIT 21",
+            {"created_at": now, "id": 1_000_000},
+            ("applications",),
+        ),
+        HotQuery(
+            "applications_by_user",
+            "SELECT id FROM applications WHERE user_id = :user_id",
+            {"user_id": 1},
+            ("applications",),
+        ),
+        HotQuery(
+            "user_by_tg_id",
+            "SELECT id FROM users WHERE tg_id = :tg_id",
+            {"tg_id": 1},
+            ("users",),
+        ),
+        HotQuery(
+            "user_by_phone",
+            "SELECT id FROM users WHERE phone_e164 = :phone",
+            {"phone": "+79990000000"},
+            ("users",),
+        ),
+        HotQuery(
+            "active_dialogue_session",
+            "SELECT id FROM dialogue_sessions WHERE user_id = :user_id "
+            "AND resolution_status = 'ongoing' AND last_activity >= :cutoff "
+            "ORDER BY last_activity DESC LIMIT 1",
+            {"user_id": 1, "cutoff": now - timedelta(hours=24)},
+            ("dialogue_sessions",),
+        ),
+        HotQuery(
+            "dialogue_history",
+            "SELECT id, role, content FROM dialogue_messages "
+            "WHERE session_id = :session_id ORDER BY created_at DESC LIMIT 10",
+            {"session_id": 1},
+            ("dialogue_messages",),
+        ),
+        HotQuery(
+            "recent_fingerprints",
+            "SELECT id FROM content_fingerprints WHERE content_type = :content_type "
+            "AND created_at >= :since",
+            {"content_type": "post", "since": now - timedelta(days=7)},
+            ("content_fingerprints",),
+        ),
+    ]
+
+
+HOT_QUERIES = _hot_queries()
+
+
+@dataclass
+class PlanCheck:
+    """Result of EXPLAIN for one hot query"""
+    name: str
+    status: str  # ok / seq_scan / skipped
+    seq_scans: List[str] = field(default_factory=list)
+    plan: List[str] = field(default_factory=list)
+
+    @property
+    def failed(self) -> bool:
+        return self.status == "seq_scan"
+
+
+# -------- plan parsing ----------
+
+def _walk_pg_plan(node: Dict[str, Any], depth: int, lines: List[str], seq_scans: List[str]):
+    node_type = node.get("Node Type", "?")
+    relation = node.get("Relation Name")
+    index = node.get("Index Name")
+    label = node_type
+    if relation:
+        label += f" on {relation}"
+    if index:
+        label += f" using {index}"
+    lines.append("  " * depth + label)
+
+    if node_type == "Seq Scan" and relation:
+        seq_scans.append(relation)
+
+    for child in node.get("Plans", []):
+        _walk_pg_plan(child, depth + 1, lines, seq_scans)
+
+
+async def _explain_postgres(conn: AsyncConnection, query: HotQuery) -> PlanCheck:
+    result = await conn.execute(text(f"EXPLAIN (FORMAT JSON) {query.sql}"), query.params)
+    raw = result.scalar_one()
+    document = json.loads(raw) if isinstance(raw, str) else raw
+
+    lines: List[str] = []
+    seq_scans: List[str] = []
+    _walk_pg_plan(document[0]["Plan"], 0, lines, seq_scans)
+    return PlanCheck(query.name, "seq_scan" if seq_scans else "ok", seq_scans, lines)
+
+
+async def _explain_sqlite(conn: AsyncConnection, query: HotQuery) -> PlanCheck:
+    result = await conn.execute(text(f"EXPLAIN QUERY PLAN {query.sql}"), query.params)
+    lines = [row[-1] for row in result.all()]
+
+    seq_scans = []
+    for detail in lines:
+        # "SCAN users" – полный проход; "SCAN t USING INDEX" – проход по индексу
+        if detail.startswith("SCAN ") and "USING" not in detail:
+            seq_scans.append(detail.split()[1])
+    return PlanCheck(query.name, "seq_scan" if seq_scans else "ok", seq_scans, lines)
+
+
+# -------- seeding ----------
+
+async def _seed(conn: AsyncConnection, rows: int, tables: set) -> None:
+    """Insert synthetic rows so the planner sees realistic cardinality"""
+    session = AsyncSession(bind=conn)
+    try:
+        category_id = (await session.execute(select(Category.id).limit(1))).scalar_one_or_none()
+        if category_id is None:
+            category = Category(name="query-plan-seed")
+            session.add(category)
+            await session.flush()
+            category_id = category.id
+
+        base_tg_id = 9_000_000_000_000
+        users = [
+            User(tg_id=base_tg_id + i, first_name="seed", phone=f"+7900{i:07d}")
+            for i in range(rows)
+        ]
+        session.add_all(users)
+        await session.flush()
+
+        statuses = ("new", "processing", "completed")
+        session.add_all([
+            Application(user_id=user.id, category_id=category_id, status=statuses[i % 3])
+            for i, user in enumerate(users)
+        ])
+
+        if "content_fingerprints" in tables:
+            session.add_all([
+                ContentFingerprint(
+                    title_hash=f"seed{i}", content_hash=f"seed{i}",
+                    full_text_hash=f"query-plan-seed-{i}", content_type="post",
+                )
+                for i in range(rows)
+            ])
+
+        if {"dialogue_sessions", "dialogue_messages"} <= tables:
+            from bot.services.ai_enhanced_models import DialogueSession, DialogueMessage
+
+            sessions = [
+                DialogueSession(user_id=user.id, session_uuid=f"seed-{user.id}")
+                for user in users
+            ]
+            session.add_all(sessions)
+            await session.flush()
+            session.add_all([
+                DialogueMessage(session_id=dialogue.id, role="user", content="seed")
+                for dialogue in sessions
+            ])
+
+        await session.flush()
+    finally:
+        # закрываем сессию, не трогая внешнюю транзакцию соединения
+        await session.close()
+
+
+# -------- public API ----------
+
+async def check_hot_query_plans(
+    seed_rows: int = DEFAULT_SEED_ROWS,
+    queries: Optional[List[HotQuery]] = None,
+) -> List[PlanCheck]:
+    """EXPLAIN every hot query; nothing is persisted"""
+    queries = queries or HOT_QUERIES
+    checks: List[PlanCheck] = []
+
+    async with async_engine.connect() as conn:
+        transaction = await conn.begin()
+        try:
+            dialect = conn.dialect.name
+            tables = set(await conn.run_sync(lambda sync_conn: inspect(sync_conn).get_table_names()))
+
+            if seed_rows > 0:
+                await _seed(conn, seed_rows, tables)
+                await conn.execute(text("ANALYZE"))
+
+            if dialect == "postgresql":
+                await conn.execute(text("SET LOCAL enable_seqscan = off"))
+
+            for query in queries:
+                missing = [table for table in query.tables if table not in tables]
+                if missing:
+                    checks.append(PlanCheck(query.name, "skipped", plan=[f"missing table: {', '.join(missing)}"]))
+                    continue
+
+                if dialect == "postgresql":
+                    checks.append(await _explain_postgres(conn, query))
+                else:
+                    checks.append(await _explain_sqlite(conn, query))
+        finally:
+            await transaction.rollback()
+
+    return checks
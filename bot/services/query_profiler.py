@@ -0,0 +1,279 @@
+"""SQL statement profiling per request, with query budget / N+1 detection.
+
+SQLAlchemy cursor events on the engine count and time every statement. Each
+statement is normalized (literals and bind placeholders become `?`, lists
+of placeholders such as IN (...) collapse to one) and aggregated:
+
+    * globally – calls, total/max time and how often it was flagged as a
+      repeat, for the top-offenders list;
+    * per request – requests are the traces of bot.core.metrics (every
+      handler call, /submit, AI generation). When a trace ends its queries
+      are checked: more than QUERY_BUDGET statements, or one normalized
+      statement run QUERY_REPEAT_THRESHOLD+ times (N+1 pattern), is logged
+      and counted against the trace name.
+
+Top offenders are available as `get_stats()` (admin /queries command,
+GET /api/admin/queries) and on /metrics:
+
+    bot_request_queries{trace}                 statements per request
+    bot_query_flags_total{trace, kind}         kind = budget | repeat
+    bot_top_query_seconds_total{query}         top statements by total time
+    bot_top_query_calls_total{query}
+
+Usage:
+    from bot.services.query_profiler import query_profiler
+
+    query_profiler.install(async_engine)
+    query_profiler.get_stats(top=10)
+"""
+
+from __future__ import annotations
+
+import logging
+import re
+import time
+from collections import OrderedDict, deque
+from functools import lru_cache
+from typing import Any, Deque, Dict, List
+
+from bot.config.settings import QUERY_BUDGET, QUERY_REPEAT_THRESHOLD, QUERY_STATS_MAX_STATEMENTS
+from bot.core.metrics import Trace, current_trace, on_trace_end
+from bot.core.prometheus_metrics import QUERY_FLAGS, REQUEST_QUERIES, register_collector
+
+try:
+    from prometheus_client.core import CounterMetricFamily
+except ImportError:
+    CounterMetricFamily = None
+
+logger = logging.getLogger(__name__)
+
+__all__ = ["normalize_sql", "QueryProfiler", "query_profiler"]
+
+# сколько последних помеченных запросов хранить
+RECENT_FLAGS = 50
+# длина SQL в логах, /queries и метках Prometheus
+SQL_PREVIEW = 160
+
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_NUMBER = re.compile(r"(?<![\w.])-?\d+(?:\.\d+)?\b")
+_PLACEHOLDER = re.compile(r"\$\d+|%\(\w+\)s|%s|(?<!:):\w+|\?")
+_IN_LIST = re.compile(r"\(\s*\?(?:\s*,\s*\?)+\s*\)")
+_SPACES = re.compile(r"\s+")
+
+
+@lru_cache(maxsize=2048)
+def normalize_sql(statement: str) -> str:
+    """`SELECT … WHERE id IN ($1, $2)` -> `SELECT … WHERE id IN (?)`"""
+    sql = _STRING.sub("?", statement)
+    sql = _PLACEHOLDER.sub("?", sql)
+    sql = _NUMBER.sub("?", sql)
+    sql = _IN_LIST.sub("(?)", sql)
+    return _SPACES.sub(" ", sql).strip()
+
+
+def _preview(sql: str) -> str:
+    return sql if len(sql) <= SQL_PREVIEW else sql[:SQL_PREVIEW - 1] + "…"
+
+
+class QueryProfiler:
+    """Global statement stats + per-trace budget and repeat checks"""
+
+    def __init__(self, budget: int = QUERY_BUDGET, repeat_threshold: int = QUERY_REPEAT_THRESHOLD,
+                 max_statements: int = QUERY_STATS_MAX_STATEMENTS):
+        self.budget = budget
+        self.repeat_threshold = repeat_threshold
+        self.max_statements = max_statements
+
+        # normalized SQL -> {"calls", "total_ms", "max_ms", "repeat_flags"}, LRU
+        self._statements: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        # trace name -> {"requests", "queries", "max_queries", "flagged"}
+        self._requests: Dict[str, Dict[str, Any]] = {}
+        self._recent_flags: Deque[Dict[str, Any]] = deque(maxlen=RECENT_FLAGS)
+        self.total_queries = 0
+        self.untraced_queries = 0
+        self._engines = set()
+
+        on_trace_end(self._finish_trace)
+
+    # -------- engine hooks ----------
+
+    def install(self, engine) -> None:
+        """Listen to cursor events of an (async) SQLAlchemy engine"""
+        from sqlalchemy import event
+
+        sync_engine = getattr(engine, "sync_engine", engine)
+        if id(sync_engine) in self._engines:
+            return
+        self._engines.add(id(sync_engine))
+
+        @event.listens_for(sync_engine, "before_cursor_execute")
+        def _before(conn, cursor, statement, parameters, context, executemany):
+            conn.info.setdefault("profiler_started", []).append(time.perf_counter())
+
+        @event.listens_for(sync_engine, "after_cursor_execute")
+        def _after(conn, cursor, statement, parameters, context, executemany):
+            started = conn.info["profiler_started"].pop()
+            self.record(statement, (time.perf_counter() - started) * 1000)
+
+        @event.listens_for(sync_engine, "handle_error")
+        def _error(exception_context):
+            conn = exception_context.connection
+            if conn is not None and conn.info.get("profiler_started"):
+                conn.info["profiler_started"].pop()
+
+    def record(self, statement: str, elapsed_ms: float) -> None:
+        """Account one executed statement"""
+        sql = normalize_sql(statement)
+        self.total_queries += 1
+
+        stats = self._statements.pop(sql, None)
+        if stats is None:
+            stats = {"calls": 0, "total_ms": 0.0, "max_ms": 0.0, "repeat_flags": 0}
+            if len(self._statements) >= self.max_statements:
+                self._statements.popitem(last=False)  # давно не встречавшийся
+        stats["calls"] += 1
+        stats["total_ms"] += elapsed_ms
+        stats["max_ms"] = max(stats["max_ms"], elapsed_ms)
+        self._statements[sql] = stats
+
+        trace = current_trace()
+        if trace is None:
+            self.untraced_queries += 1
+            return
+        queries = trace.extras.get("queries")
+        if queries is None:
+            queries = trace.extras["queries"] = {}
+        entry = queries.get(sql)
+        if entry is None:
+            queries[sql] = [1, elapsed_ms]
+        else:
+            entry[0] += 1
+            entry[1] += elapsed_ms
+
+    # -------- per request ----------
+
+    def _finish_trace(self, trace: Trace) -> None:
+        queries = trace.extras.get("queries")
+        if not queries:
+            return
+        name = trace.root.name
+        count = sum(entry[0] for entry in queries.values())
+        query_ms = sum(entry[1] for entry in queries.values())
+        REQUEST_QUERIES.labels(name).observe(count)
+
+        summary = self._requests.setdefault(name, {"requests": 0, "queries": 0, "max_queries": 0, "flagged": 0})
+        summary["requests"] += 1
+        summary["queries"] += count
+        summary["max_queries"] = max(summary["max_queries"], count)
+
+        repeated = sorted(
+            ((sql, entry[0]) for sql, entry in queries.items() if entry[0] >= self.repeat_threshold),
+            key=lambda item: item[1], reverse=True)
+        over_budget = count > self.budget
+        if not repeated and not over_budget:
+            return
+
+        summary["flagged"] += 1
+        if over_budget:
+            QUERY_FLAGS.labels(name, "budget").inc()
+        if repeated:
+            QUERY_FLAGS.labels(name, "repeat").inc()
+            for sql, _ in repeated:
+                if sql in self._statements:
+                    self._statements[sql]["repeat_flags"] += 1
+
+        flag = {
+            "trace": name,
+            "user_id": trace.root.attrs.get("user_id"),
+            "queries": count,
+            "query_ms": round(query_ms, 1),
+            "total_ms": round(trace.root.duration_ms, 1),
+            "over_budget": over_budget,
+            "repeated": [{"sql": _preview(sql), "times": times} for sql, times in repeated[:3]],
+            "at": time.time(),
+        }
+        self._recent_flags.append(flag)
+
+        reasons = []
+        if over_budget:
+            reasons.append(f"{count} queries > budget {self.budget}")
+        if repeated:
+            sql, times = repeated[0]
+            reasons.append(f"{times}x {_preview(sql)}")
+        logger.warning(f"🔁 {name}: {'; '.join(reasons)} ({query_ms:.0f} ms in SQL)")
+
+    # -------- reports ----------
+
+    def top_statements(self, top: int = 10, by: str = "total_ms") -> List[Dict[str, Any]]:
+        """Statements with the largest total time (or calls / repeat_flags)"""
+        ranked = sorted(self._statements.items(), key=lambda item: item[1][by], reverse=True)[:top]
+        return [
+            {
+                "sql": _preview(sql),
+                "calls": stats["calls"],
+                "total_ms": round(stats["total_ms"], 1),
+                "avg_ms": round(stats["total_ms"] / stats["calls"], 2),
+                "max_ms": round(stats["max_ms"], 1),
+                "repeat_flags": stats["repeat_flags"],
+            }
+            for sql, stats in ranked
+        ]
+
+    def top_requests(self, top: int = 10) -> List[Dict[str, Any]]:
+        """Trace names by average statements per request"""
+        ranked = sorted(self._requests.items(),
+                        key=lambda item: item[1]["queries"] / item[1]["requests"], reverse=True)[:top]
+        return [
+            {
+                "trace": name,
+                "requests": summary["requests"],
+                "avg_queries": round(summary["queries"] / summary["requests"], 1),
+                "max_queries": summary["max_queries"],
+                "flagged": summary["flagged"],
+            }
+            for name, summary in ranked
+        ]
+
+    def get_stats(self, top: int = 10) -> Dict[str, Any]:
+        return {
+            "budget": self.budget,
+            "repeat_threshold": self.repeat_threshold,
+            "total_queries": self.total_queries,
+            "untraced_queries": self.untraced_queries,
+            "tracked_statements": len(self._statements),
+            "top_statements": self.top_statements(top),
+            "top_repeated": [s for s in self.top_statements(top, by="repeat_flags") if s["repeat_flags"]],
+            "top_requests": self.top_requests(top),
+            "recent_flags": list(self._recent_flags)[-top:],
+        }
+
+    def reset(self) -> None:
+        self._statements.clear()
+        self._requests.clear()
+        self._recent_flags.clear()
+        self.total_queries = 0
+        self.untraced_queries = 0
+
+
+class _TopQueriesCollector:
+    """Top statements by total time as counters labelled with the SQL"""
+
+    def __init__(self, profiler: QueryProfiler, top: int = 10):
+        self.profiler = profiler
+        self.top = top
+
+    def collect(self):
+        seconds = CounterMetricFamily(
+            "bot_top_query_seconds", "Total time of the slowest statements", labels=["query"])
+        calls = CounterMetricFamily(
+            "bot_top_query_calls", "Calls of the slowest statements", labels=["query"])
+        for stats in self.profiler.top_statements(self.top):
+            seconds.add_metric([stats["sql"]], stats["total_ms"] / 1000)
+            calls.add_metric([stats["sql"]], stats["calls"])
+        yield seconds
+        yield calls
+
+
+# Global profiler instance
+query_profiler = QueryProfiler()
+register_collector(_TopQueriesCollector(query_profiler))
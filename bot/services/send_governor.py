@@ -0,0 +1,352 @@
+"""One governor for every outbound Telegram send.
+
+Telegram allows ~30 messages/s per bot, ~1/s per private chat and ~20/min
+per group or channel; going over means 429 RetryAfter and stalled senders.
+All send paths – handler replies, admin notifications, channel posts,
+comment replies, monitoring alerts – take a permit here first:
+
+    1. the per-chat bucket reserves the chat's next slot (sleeping if the
+       chat is busy, without holding up other chats);
+    2. the request joins the global lane queue; the dispatcher hands out
+       global tokens in priority order:
+       USER_REPLY > ADMIN_ALERT > CHANNEL_POST > COMMENT.
+
+A RetryAfter from Telegram pauses that chat for the requested time and the
+send is retried (SEND_MAX_RETRIES). Buckets are GCRA (token bucket with
+`rate` and `burst`), one float per chat; idle chats are evicted.
+
+The global bucket is per bot, not per process: with a shared STATE_BACKEND
+(several web workers, and the bot process when it points at the same
+STATE_DB_PATH) its TAT lives in the backend and every token is taken there
+atomically, so all processes together stay within SEND_GLOBAL_RATE.
+
+Two ways in:
+    * explicit – `await send_governor.send(chat_id, lambda: bot.send_message(...),
+      SendPriority.CHANNEL_POST)` works with any bot object;
+    * PTB rate limiter – Applications are built with
+      `.rate_limiter(send_governor)`, so `update.message.reply_text(...)` and
+      other direct calls are governed too (priority USER_REPLY). A permit
+      from `send()` covers exactly one send request: the first one made
+      inside call() uses it, any further one (e.g. a plain-text fallback)
+      takes its own permit in the same lane.
+
+Usage:
+    from bot.services.send_governor import SendPriority, send_governor
+
+    await send_governor.send(chat_id, lambda: bot.send_message(chat_id, text),
+                             SendPriority.ADMIN_ALERT)
+"""
+
+from __future__ import annotations
+
+import asyncio
+import contextvars
+import heapq
+import itertools
+import logging
+import time
+from collections import OrderedDict
+from enum import IntEnum
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from telegram.error import RetryAfter
+from telegram.ext import BaseRateLimiter
+
+from bot.core.prometheus_metrics import TELEGRAM_SEND_WAIT, observe_telegram_request, register_queue_depth
+from bot.services.state_backend import SharedDict, StateBackend, state_backend
+from bot.config.settings import (
+    SEND_CHAT_BURST,
+    SEND_CHAT_RATE,
+    SEND_GLOBAL_BURST,
+    SEND_GLOBAL_RATE,
+    SEND_GROUP_RATE_PER_MINUTE,
+    SEND_MAX_RETRIES,
+)
+
+logger = logging.getLogger(__name__)
+
+__all__ = ["SendPriority", "SendGovernor", "send_governor"]
+
+# Bot API методы, на которые распространяются лимиты отправки (sendChatAction – нет)
+GOVERNED_ENDPOINTS = frozenset({
+    "sendMessage", "sendPhoto", "sendVideo", "sendDocument", "sendAudio", "sendVoice",
+    "sendAnimation", "sendSticker", "sendVideoNote", "sendMediaGroup", "sendLocation",
+    "sendVenue", "sendContact", "sendPoll", "sendDice", "sendInvoice", "sendGame",
+    "copyMessage", "copyMessages", "forwardMessage", "forwardMessages",
+    "editMessageText", "editMessageCaption", "editMessageMedia", "editMessageReplyMarkup",
+    "editMessageLiveLocation", "stopMessageLiveLocation", "stopPoll",
+})
+# сколько просроченных чатов вытеснять за одну отправку
+EVICT_BATCH = 64
+
+
+class _Permit:
+    """Permit of one send() call: one governed request, then spent"""
+
+    __slots__ = ("priority", "spent")
+
+    def __init__(self, priority: int):
+        self.priority = priority
+        self.spent = False
+
+
+# внутри send() – разрешение на один запрос к Bot API
+_permit: contextvars.ContextVar[Optional[_Permit]] = contextvars.ContextVar("send_permit", default=None)
+
+
+class SendPriority(IntEnum):
+    """Lanes, lower value goes first"""
+    USER_REPLY = 0
+    ADMIN_ALERT = 1
+    CHANNEL_POST = 2
+    COMMENT = 3
+
+
+def _retry_after_seconds(error: RetryAfter) -> float:
+    retry_after = error.retry_after
+    return retry_after.total_seconds() if hasattr(retry_after, "total_seconds") else float(retry_after)
+
+
+def _chat_key(chat_id: Any) -> Any:
+    try:
+        return int(chat_id)
+    except (TypeError, ValueError):
+        return str(chat_id)  # "@channel"
+
+
+class SendGovernor(BaseRateLimiter):
+    """Global + per-chat buckets with priority lanes and RetryAfter handling"""
+
+    def __init__(self, global_rate: float = SEND_GLOBAL_RATE, global_burst: int = SEND_GLOBAL_BURST,
+                 chat_rate: float = SEND_CHAT_RATE, chat_burst: int = SEND_CHAT_BURST,
+                 group_rate_per_minute: float = SEND_GROUP_RATE_PER_MINUTE,
+                 max_retries: int = SEND_MAX_RETRIES, backend: Optional[StateBackend] = None):
+        self.global_interval = 1.0 / global_rate
+        self.global_tolerance = self.global_interval * (global_burst - 1)
+        self.private_interval = 1.0 / chat_rate
+        self.group_interval = 60.0 / group_rate_per_minute
+        self.chat_burst = chat_burst
+        self.max_retries = max_retries
+
+        self._global_tat = 0.0
+        self._paused_until = 0.0
+        backend = backend or state_backend
+        # несколько процессов – глобальный бюджет бота общий, в backend
+        self.shared = backend.name != "memory"
+        self._backend = backend
+        self._shared_global = SharedDict("send_governor.global", backend, ttl=60) if self.shared else None
+        # chat -> TAT, в порядке последнего обновления
+        self._chat_tats: "OrderedDict[Any, float]" = OrderedDict()
+        self._waiting: List[Tuple[int, int, asyncio.Future]] = []
+        self._seq = itertools.count()
+
+        self._wake: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+        # metrics
+        self.sent: Dict[str, int] = {lane.name.lower(): 0 for lane in SendPriority}
+        self.max_wait_ms: Dict[str, float] = {lane.name.lower(): 0.0 for lane in SendPriority}
+        self.retry_after_count = 0
+        self.failed = 0
+
+    # -------- PTB BaseRateLimiter ----------
+
+    async def initialize(self) -> None:
+        pass
+
+    async def shutdown(self) -> None:
+        # один governor на все Application – диспетчер живёт вместе с event loop
+        pass
+
+    async def process_request(self, callback, args, kwargs, endpoint, data, rate_limit_args):
+        permit = _permit.get()
+        if endpoint not in GOVERNED_ENDPOINTS or (permit is not None and not permit.spent):
+            if endpoint in GOVERNED_ENDPOINTS:
+                permit.spent = True
+            with observe_telegram_request(endpoint):
+                return await callback(*args, **kwargs)
+
+        if isinstance(rate_limit_args, int):
+            priority = rate_limit_args
+        elif permit is not None:
+            priority = permit.priority  # вторая отправка внутри send() – в той же полосе
+        else:
+            priority = SendPriority.USER_REPLY
+        return await self.send(data.get("chat_id"), lambda: self.process_request(
+            callback, args, kwargs, endpoint, data, rate_limit_args), priority)
+
+    # -------- public API ----------
+
+    async def send(self, chat_id: Any, call: Callable[[], Awaitable[Any]],
+                   priority: SendPriority = SendPriority.USER_REPLY) -> Any:
+        """Wait for a permit, run call(); RetryAfter pauses the chat and retries"""
+        for attempt in range(self.max_retries + 1):
+            await self._acquire(chat_id, priority)
+            token = _permit.set(_Permit(int(priority)))
+            try:
+                return await call()
+            except RetryAfter as e:
+                retry_after = _retry_after_seconds(e)
+                self.retry_after_count += 1
+                self._pause(chat_id, retry_after)
+                if attempt == self.max_retries:
+                    self.failed += 1
+                    raise
+                logger.warning(
+                    f"⚠️ Telegram flood control for chat {chat_id}: retry in {retry_after:.0f}s "
+                    f"({SendPriority(priority).name.lower()}, attempt {attempt + 1})")
+            finally:
+                _permit.reset(token)
+
+    # -------- buckets ----------
+
+    def _chat_interval(self, key: Any) -> float:
+        # группы и каналы: отрицательный id или @username
+        return self.group_interval if isinstance(key, str) or key < 0 else self.private_interval
+
+    def _reserve_chat(self, chat_id: Any, now: float) -> float:
+        """Reserve the chat's next slot, return seconds to wait for it"""
+        key = _chat_key(chat_id)
+        interval = self._chat_interval(key)
+        tat = self._chat_tats.pop(key, None)
+        tat = now if tat is None or tat < now else tat
+        self._chat_tats[key] = tat + interval
+        self._evict_idle(now)
+        return max(0.0, tat - interval * (self.chat_burst - 1) - now)
+
+    def _pause(self, chat_id: Any, seconds: float) -> None:
+        now = time.monotonic()
+        if chat_id is None:
+            self._paused_until = max(self._paused_until, now + seconds)
+            return
+        key = _chat_key(chat_id)
+        interval = self._chat_interval(key)
+        # следующий слот чата – не раньше чем через retry_after
+        self._chat_tats.pop(key, None)
+        self._chat_tats[key] = now + seconds + interval * (self.chat_burst - 1)
+
+    def _evict_idle(self, now: float) -> None:
+        for _ in range(EVICT_BATCH):
+            if not self._chat_tats:
+                return
+            _, tat = next(iter(self._chat_tats.items()))
+            if tat > now:
+                return
+            self._chat_tats.popitem(last=False)
+
+    # -------- global lanes ----------
+
+    def _ensure_started(self) -> None:
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            self._wake = asyncio.Event()
+            self._waiting = []
+            self._task = None
+            self._loop = loop
+        if self._task is None or self._task.done():
+            self._task = loop.create_task(self._dispatch(), name="send-governor")
+
+    async def _acquire(self, chat_id: Any, priority: int) -> None:
+        self._ensure_started()
+        queued_at = time.monotonic()
+
+        if chat_id is not None:
+            wait = self._reserve_chat(chat_id, queued_at)
+            if wait > 0:
+                await asyncio.sleep(wait)
+
+        future = self._loop.create_future()
+        heapq.heappush(self._waiting, (int(priority), next(self._seq), future))
+        self._wake.set()
+        await future
+
+        lane = SendPriority(priority).name.lower()
+        waited = time.monotonic() - queued_at
+        self.sent[lane] += 1
+        self.max_wait_ms[lane] = max(self.max_wait_ms[lane], waited * 1000)
+        TELEGRAM_SEND_WAIT.labels(lane).observe(waited)
+
+    async def _dispatch(self) -> None:
+        while True:
+            if not self._waiting:
+                self._wake.clear()
+                await self._wake.wait()
+                continue
+
+            now = time.monotonic()
+            if self._waiting[0][2].done():
+                heapq.heappop(self._waiting)
+                continue  # отправитель отменён – токен не тратим
+
+            wait = self._paused_until - now
+            if wait <= 0:
+                wait = await self._take_global(now)
+            if wait > 0:
+                # за время ожидания может прийти запрос с более высоким приоритетом
+                await asyncio.sleep(wait)
+                continue
+
+            _, _, future = heapq.heappop(self._waiting)
+            if future.done():
+                continue  # отменён, пока брали токен – он пропадает
+            future.set_result(None)
+
+    async def _take_global(self, now: float) -> float:
+        """Take a global token: 0 if taken, else seconds until one is free"""
+        if self.shared:
+            try:
+                return await self._backend.run(self._take_shared_global)
+            except Exception as e:
+                # backend недоступен – не останавливаем отправки, этот токен считаем в процессе
+                logger.error(f"❌ Shared send budget unavailable, using process budget: {e}")
+
+        wait = self._global_tat - self.global_tolerance - now
+        if wait <= 0:
+            self._global_tat = max(self._global_tat, now) + self.global_interval
+        return wait
+
+    def _take_shared_global(self) -> float:
+        # time.time(): TAT сравнивают разные процессы
+        now = time.time()
+        wait = 0.0
+
+        def take(tat: Optional[float]) -> float:
+            nonlocal wait
+            tat = now if tat is None or tat < now else tat
+            if tat - self.global_tolerance > now:
+                wait = tat - self.global_tolerance - now
+                return tat
+            return tat + self.global_interval
+
+        self._shared_global.modify("tat", take)
+        return wait
+
+    # -------- metrics ----------
+
+    def queued(self) -> Dict[str, int]:
+        """Senders waiting for a global token, per lane"""
+        queued = {lane.name.lower(): 0 for lane in SendPriority}
+        for priority, _, future in self._waiting:
+            if not future.done():
+                queued[SendPriority(priority).name.lower()] += 1
+        return queued
+
+    def get_stats(self) -> Dict[str, Any]:
+        queued = self.queued()
+        return {
+            "queued": queued,
+            "sent": dict(self.sent),
+            "max_wait_ms": {lane: round(ms, 2) for lane, ms in self.max_wait_ms.items()},
+            "retry_after": self.retry_after_count,
+            "failed_after_retries": self.failed,
+            "tracked_chats": len(self._chat_tats),
+            "global_budget": "shared" if self.shared else "process",
+        }
+
+
+# Global governor instance
+send_governor = SendGovernor()
+for _lane in SendPriority:
+    register_queue_depth(f"send_{_lane.name.lower()}",
+                         lambda lane=_lane.name.lower(): send_governor.queued()[lane])
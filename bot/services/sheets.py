@@ -78,8 +78,11 @@ def _get_sheet():
         return ws
 
 
-def append_lead(app: "Application", user: "User", category: "Category") -> None:
-    """Append new lead to Google Sheet. Works synchronously (fast single row)."""
+def append_lead(app: "Application", user: "User", category: "Category", raise_errors: bool = False) -> None:
+    """Append new lead to Google Sheet. Works synchronously (fast single row).
+
+    raise_errors=True re-raises API errors so a background job can retry.
+    """
     if not SHEETS_ENABLED:
         print("⚠️ Skipping Google Sheets: not configured")
         return
@@ -100,3 +103,5 @@ def append_lead(app: "Application", user: "User", category: "Category") -> None:
         ws.append_row(row, value_input_option="USER_ENTERED")
     except Exception as e:
         print(f"⚠️ Google Sheets error: {e}")
+        if raise_errors:
+            raise
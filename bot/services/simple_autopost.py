@@ -13,6 +13,8 @@ from typing import Dict, Any, Optional
 from telegram import Bot, InlineKeyboardButton, InlineKeyboardMarkup
 from telegram.error import TelegramError
 
+from bot.services.send_governor import SendPriority, send_governor
+
 # Импорт системы дедупликации - PostgreSQL версия для production
 try:
     from .content_deduplication_pg import validate_and_register_content
@@ -217,12 +219,12 @@ class SimpleAutopost:
             logger.info("📝 Sending deploy post to channel...")
             
             # Отправляем пост
-            message = await self.bot.send_message(
+            message = await send_governor.send(self.channel_id, lambda: self.bot.send_message(
                 chat_id=self.channel_id,
                 text=post_text,
                 reply_markup=InlineKeyboardMarkup(keyboard),
                 parse_mode='Markdown'
-            )
+            ), SendPriority.CHANNEL_POST)
 
             print(f"✅ Deploy autopost created: {message.message_id}")
             logger.info(f"✅ Deploy autopost created: {message.message_id}")
@@ -301,12 +303,12 @@ class SimpleAutopost:
                 ]]
 
                 # Отправляем пост
-                message = await self.bot.send_message(
+                message = await send_governor.send(self.channel_id, lambda: self.bot.send_message(
                     chat_id=self.channel_id,
                     text=post_text,
                     reply_markup=InlineKeyboardMarkup(keyboard),
                     parse_mode='Markdown'
-                )
+                ), SendPriority.CHANNEL_POST)
 
                 logger.info(f"✅ Unique regular autopost created: {message.message_id} (type: {post_type}) after {attempt + 1} attempts")
                 return {
@@ -1,8 +1,10 @@
-"""Simple conversation memory using in-memory storage"""
+"""Simple conversation memory kept in the shared state backend"""
 from typing import List, Dict, Optional
 from datetime import datetime, timedelta
 import logging
 
+from bot.services.state_backend import SharedDict
+
 logger = logging.getLogger(__name__)
 
 class SimpleConversationMemory:
@@ -11,59 +13,55 @@ class SimpleConversationMemory:
     def __init__(self, max_messages=8, session_timeout_hours=2):
         self.max_messages = max_messages
         self.session_timeout = timedelta(hours=session_timeout_hours)
-        self.conversations = {}  # user_id -> conversation data
+        # user_id -> conversation data; expired sessions drop out of the backend
+        self.conversations = SharedDict(
+            "memory.conversations", ttl=self.session_timeout.total_seconds())
     
     async def get_conversation_history(self, user_id: int) -> List[Dict[str, str]]:
         """Get recent conversation history for user"""
-        if user_id not in self.conversations:
-            self.conversations[user_id] = {
-                "messages": [],
-                "last_activity": datetime.now()
-            }
-        
-        session = self.conversations[user_id]
+        session = await self.conversations.aget(user_id)
+        if session is None:
+            return []
         
         # Check if session expired
         if datetime.now() - session["last_activity"] > self.session_timeout:
-            session["messages"] = []
             logger.info(f"🔄 Cleared expired conversation for user {user_id}")
+            return []
         
         return session["messages"][-self.max_messages:]
     
     async def add_message(self, user_id: int, role: str, content: str):
         """Add message to conversation history"""
-        if user_id not in self.conversations:
-            self.conversations[user_id] = {
-                "messages": [],
-                "last_activity": datetime.now()
-            }
-        
-        session = self.conversations[user_id]
-        session["messages"].append({
-            "role": role,
-            "content": content,
-            "timestamp": datetime.now().isoformat()
-        })
-        
-        # Keep only recent messages
-        if len(session["messages"]) > self.max_messages:
+        def append(session: Optional[Dict]) -> Dict:
+            now = datetime.now()
+            if session is None or now - session["last_activity"] > self.session_timeout:
+                session = {"messages": [], "last_activity": now}
+            
+            session["messages"].append({
+                "role": role,
+                "content": content,
+                "timestamp": now.isoformat()
+            })
+            
+            # Keep only recent messages
             session["messages"] = session["messages"][-self.max_messages:]
+            session["last_activity"] = now
+            return session
         
-        session["last_activity"] = datetime.now()
+        session = await self.conversations.amodify(user_id, append)
         logger.info(f"💭 Added {role} message to conversation for user {user_id} (total: {len(session['messages'])})")
     
     async def clear_session(self, user_id: int):
         """Clear conversation history for user"""
-        if user_id in self.conversations:
-            del self.conversations[user_id]
+        if await self.conversations.apop(user_id) is not None:
             logger.info(f"🗑️ Cleared conversation for user {user_id}")
     
     def get_session_info(self, user_id: int) -> Dict:
         """Get session information for debugging"""
-        if user_id not in self.conversations:
+        session = self.conversations.get(user_id)
+        if session is None:
             return {"exists": False}
         
-        session = self.conversations[user_id]
         return {
             "exists": True,
             "message_count": len(session["messages"]),
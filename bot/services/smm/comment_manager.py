@@ -23,6 +23,8 @@ from telegram import Bot, Message, User, Chat, InlineKeyboardButton, InlineKeybo
 from telegram.error import TelegramError, BadRequest, Forbidden
 from telegram.constants import ChatType, ParseMode
 
+from bot.services.send_governor import SendPriority, send_governor
+
 logger = logging.getLogger(__name__)
 
 
@@ -534,13 +536,13 @@ class CommentManager:
                 logger.info("Response limit reached, skipping response")
                 return
 
-            # Отправляем ответ
-            await self.bot.send_message(
+            # Отправляем ответ – самый низкий приоритет среди исходящих сообщений
+            await send_governor.send(response_task["chat_id"], lambda: self.bot.send_message(
                 chat_id=response_task["chat_id"],
                 text=response_task["expert_response"].content,
                 reply_to_message_id=response_task["reply_to_message_id"],
                 parse_mode=ParseMode.HTML
-            )
+            ), SendPriority.COMMENT)
 
             self.responses_this_hour += 1
 
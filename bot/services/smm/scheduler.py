@@ -10,7 +10,9 @@ from datetime import datetime, timedelta
 from typing import Dict, List, Optional, Any, Tuple
 from dataclasses import dataclass
 from enum import Enum
-import heapq
+
+from bot.core.prometheus_metrics import register_queue_depth
+from bot.services.state_backend import SharedQueue
 
 logger = logging.getLogger(__name__)
 
@@ -76,7 +78,9 @@ class SmartScheduler:
     """Умный планировщик контента"""
 
     def __init__(self, telegram_publisher=None):
-        self.schedule_queue: List[ScheduledPost] = []
+        # (timestamp, post) по post_id, общая для всех воркеров
+        self.schedule_queue = SharedQueue("smm.schedule_queue")
+        register_queue_depth("scheduler", lambda: len(self.schedule_queue))
         self.optimization_engine = ScheduleOptimizationEngine()
         self.ab_test_manager = ABTestManager()
         self.performance_tracker = PerformanceTracker()
@@ -164,7 +168,7 @@ class SmartScheduler:
 
                 # Находим посты для публикации (извлекаем из tuple)
                 posts_to_publish = []
-                for queue_item in self.schedule_queue:
+                for queue_item in await self.schedule_queue.aitems():
                     if isinstance(queue_item, tuple):
                         timestamp, post = queue_item
                         if post.scheduled_time <= current_time:
@@ -175,16 +179,14 @@ class SmartScheduler:
                             posts_to_publish.append((0, queue_item))
 
                 for timestamp, post in posts_to_publish:
+                    # Забираем из очереди до публикации – пост достанется одному воркеру
+                    if await self.schedule_queue.aclaim(post.post_id) is None:
+                        continue
+
                     try:
                         # Публикуем пост
                         await self._publish_post(post)
 
-                        # Удаляем из очереди
-                        queue_item = (
-                            timestamp, post) if timestamp > 0 else post
-                        if queue_item in self.schedule_queue:
-                            self.schedule_queue.remove(queue_item)
-
                         # Запускаем отслеживание эффективности
                         asyncio.create_task(
                             self.performance_tracker.track_post_performance(
@@ -215,7 +217,7 @@ class SmartScheduler:
 
         # Находим посты для потенциальной оптимизации (извлекаем из tuple)
         posts_to_optimize = []
-        for queue_item in self.schedule_queue:
+        for queue_item in await self.schedule_queue.aitems():
             if isinstance(queue_item, tuple):
                 timestamp, post = queue_item
                 if current_time < post.scheduled_time <= cutoff_time:
@@ -232,6 +234,7 @@ class SmartScheduler:
             if optimization and optimization.expected_improvement > 0.1:  # Минимум 10% улучшения
                 # Применяем оптимизацию
                 post.scheduled_time = optimization.optimized_time
+                await self._add_to_schedule_queue(post)
                 optimizations.append(optimization)
 
                 logger.info(
@@ -266,11 +269,9 @@ class SmartScheduler:
     async def _add_to_schedule_queue(self, post: ScheduledPost):
         """Добавление поста в очередь планировщика"""
 
-        # Используем heapq для автоматической сортировки по времени
-        heapq.heappush(
-            self.schedule_queue,
-            (post.scheduled_time.timestamp(), post)
-        )
+        # Очередь отсортирована по времени публикации
+        timestamp = post.scheduled_time.timestamp()
+        await self.schedule_queue.apush(post.post_id, (timestamp, post), score=timestamp)
 
     async def _publish_post(self, post: ScheduledPost):
         """Публикация поста"""
@@ -300,7 +300,7 @@ class ProfessionalSMMSystem:
 
         # Получаем расписание на следующие 24 часа
         upcoming_posts = [
-            post for post in self.scheduler.schedule_queue
+            post for post in await self.scheduler.schedule_queue.aitems()
             if post.scheduled_time <= datetime.now() + timedelta(hours=24)
         ]
 
@@ -532,7 +532,7 @@ class ProfessionalSMMSystem:
         upcoming_posts_count = 0
         try:
             cutoff_time = datetime.now() + timedelta(hours=24)
-            for queue_item in self.scheduler.schedule_queue:
+            for queue_item in await self.scheduler.schedule_queue.aitems():
                 try:
                     if isinstance(queue_item, tuple):
                         timestamp, post = queue_item
@@ -690,7 +690,7 @@ class ProfessionalSMMSystem:
             posts = []
             processed_count = 0
 
-            for queue_item in self.scheduler.schedule_queue:
+            for queue_item in await self.scheduler.schedule_queue.aitems():
                 if processed_count >= limit:
                     break
 
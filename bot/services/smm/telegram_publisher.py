@@ -22,6 +22,10 @@ from telegram import Bot, InlineKeyboardButton, InlineKeyboardMarkup, Message
 from telegram.error import TelegramError, RetryAfter, BadRequest, Forbidden
 from telegram.constants import ParseMode, ChatType
 
+from bot.core.prometheus_metrics import register_queue_depth
+from bot.services.send_governor import SendPriority, send_governor
+from bot.services.state_backend import SharedQueue
+
 logger = logging.getLogger(__name__)
 
 
@@ -76,9 +80,10 @@ class TelegramPublisher:
 
     def __init__(self, bot: Bot):
         self.bot = bot
-        self.publish_queue: List[PublishRequest] = []
+        # PublishRequest по post_id, общая для всех воркеров
+        self.publish_queue = SharedQueue("smm.publish_queue")
+        register_queue_depth("publisher", lambda: len(self.publish_queue))
         self.published_messages: Dict[str, PublishResult] = {}
-        self.rate_limiter = RateLimiter()
         self.retry_manager = RetryManager()
         self.analytics_tracker = PublishAnalyticsTracker()
 
@@ -127,12 +132,12 @@ class TelegramPublisher:
             await self._validate_publish_request(request)
 
             # Проверяем очередь
-            if len(self.publish_queue) >= self.max_queue_size:
+            if await self.publish_queue.alen() >= self.max_queue_size:
                 raise Exception(
                     f"Publish queue is full ({self.max_queue_size} items)")
 
             # Добавляем в очередь
-            self.publish_queue.append(request)
+            await self._enqueue(request)
 
             logger.info(
                 f"📅 Scheduled publish for post {request.post_id} to {request.channel_id}")
@@ -153,11 +158,9 @@ class TelegramPublisher:
             # Валидация
             await self._validate_publish_request(request)
 
-            # Проверка rate limit
-            await self.rate_limiter.wait_if_needed(request.channel_id)
-
-            # Публикация
-            result = await self._execute_publish(request)
+            # Публикация через общий лимитер отправок (канал + глобальный лимит, RetryAfter)
+            result = await send_governor.send(
+                request.channel_id, lambda: self._execute_publish(request), SendPriority.CHANNEL_POST)
 
             # Сохраняем результат
             self.published_messages[request.post_id] = result
@@ -186,7 +189,7 @@ class TelegramPublisher:
 
                 # Находим посты для публикации
                 ready_requests = [
-                    req for req in self.publish_queue
+                    req for req in await self.publish_queue.aitems()
                     if req.scheduled_time and req.scheduled_time <= current_time
                 ]
 
@@ -198,9 +201,11 @@ class TelegramPublisher:
                 batch = ready_requests[:self.processing_batch_size]
 
                 for request in batch:
+                    # Забираем из очереди до публикации – запрос достанется одному воркеру
+                    if await self.publish_queue.aclaim(request.post_id) is None:
+                        continue
                     try:
                         await self.publish_now(request)
-                        self.publish_queue.remove(request)
                     except Exception as e:
                         logger.error(f"Error processing publish request: {e}")
                         await self._handle_publish_error(request, e)
@@ -264,10 +269,8 @@ class TelegramPublisher:
             else:
                 raise Exception("Message was not sent")
 
-        except RetryAfter as e:
-            # Telegram rate limit
-            logger.warning(f"Rate limited, waiting {e.retry_after} seconds")
-            await asyncio.sleep(e.retry_after)
+        except RetryAfter:
+            # Telegram rate limit – паузу и повтор делает send_governor
             raise
 
         except Forbidden as e:
@@ -317,13 +320,12 @@ class TelegramPublisher:
             # Retry with exponential backoff
             delay = 2 ** (3 - request.max_retries) * 60  # 1, 2, 4 minutes
             request.scheduled_time = datetime.now() + timedelta(seconds=delay)
+            await self._enqueue(request)
 
             logger.info(
                 f"Retrying post {request.post_id} in {delay} seconds ({request.max_retries} retries left)")
         else:
-            # Failed permanently
-            self.publish_queue.remove(request)
-
+            # Failed permanently (уже убран из очереди при захвате)
             result = PublishResult(
                 success=False,
                 error_message=str(error),
@@ -348,13 +350,13 @@ class TelegramPublisher:
             return False
 
         try:
-            await self.bot.edit_message_text(
+            await send_governor.send(result.channel_id, lambda: self.bot.edit_message_text(
                 chat_id=result.channel_id,
                 message_id=result.message_id,
                 text=new_content,
                 parse_mode=ParseMode.HTML,
                 reply_markup=new_reply_markup
-            )
+            ), SendPriority.CHANNEL_POST)
 
             logger.info(
                 f"Edited message {result.message_id} in {result.channel_id}")
@@ -436,54 +438,17 @@ class TelegramPublisher:
 
     async def _immediate_publish(self, request: PublishRequest):
         """Немедленная публикация для готовых постов"""
+        if await self.publish_queue.aclaim(request.post_id) is None:
+            return  # уже забрал обработчик очереди
         try:
             await self.publish_now(request)
-            self.publish_queue.remove(request)
         except Exception as e:
             logger.error(f"Failed immediate publish: {e}")
 
-
-class RateLimiter:
-    """Rate limiter для Telegram API"""
-
-    def __init__(self):
-        self.channel_timings: Dict[str, List[datetime]] = {}
-        self.global_timings: List[datetime] = []
-
-        # Лимиты Telegram API
-        self.channel_limit = 20  # сообщений в минуту на канал
-        self.global_limit = 30   # общий лимит в секунду
-
-    async def wait_if_needed(self, channel_id: str):
-        """Ожидание если нужно соблюсти rate limit"""
-        current_time = datetime.now()
-
-        # Проверяем лимит канала
-        if channel_id not in self.channel_timings:
-            self.channel_timings[channel_id] = []
-
-        channel_times = self.channel_timings[channel_id]
-
-        # Удаляем старые записи (старше минуты)
-        cutoff = current_time - timedelta(minutes=1)
-        channel_times[:] = [t for t in channel_times if t > cutoff]
-
-        # Проверяем лимит
-        if len(channel_times) >= self.channel_limit:
-            wait_time = 60 - (current_time - channel_times[0]).total_seconds()
-            if wait_time > 0:
-                logger.info(
-                    f"Rate limit reached for {channel_id}, waiting {wait_time:.1f}s")
-                await asyncio.sleep(wait_time)
-
-        # Записываем время публикации
-        self.channel_timings[channel_id].append(current_time)
-        self.global_timings.append(current_time)
-
-        # Очищаем глобальные записи
-        global_cutoff = current_time - timedelta(seconds=1)
-        self.global_timings[:] = [
-            t for t in self.global_timings if t > global_cutoff]
+    async def _enqueue(self, request: PublishRequest):
+        """Добавление (или замена) запроса в общей очереди"""
+        score = request.scheduled_time.timestamp() if request.scheduled_time else 0.0
+        await self.publish_queue.apush(request.post_id, request, score=score)
 
 
 class RetryManager:
@@ -0,0 +1,459 @@
+"""Pluggable shared state for components that used to keep it in process memory.
+
+With one uvicorn worker an in-process dict is enough; with several workers
+every worker would see its own rate limits, conversation history and
+scheduling queues, and every worker would publish the same scheduled post.
+Components therefore keep such state in a `StateBackend` namespace:
+
+    * ``memory`` (default) – plain dicts, zero overhead, single process only;
+    * ``sqlite`` – one WAL-mode SQLite file (STATE_DB_PATH) shared by all
+      worker processes on the host.
+
+Values are pickled by the shared backend, so objects read from it are
+copies – write them back after changing them. `pop()` is atomic across
+workers and doubles as the "claim" step of the queues: only the worker that
+popped an item processes it; `add()` stores only if the key is absent.
+
+The SQLite calls block (BEGIN IMMEDIATE may wait up to busy_timeout for
+another worker), so code running on the event loop uses the `a`-prefixed
+methods of SharedDict / SharedQueue: they run the call in a thread for a
+blocking backend and inline for the memory one.
+
+Usage:
+    from bot.services.state_backend import SharedDict, SharedQueue
+
+    sessions = SharedDict("memory.conversations", ttl=7200)
+    await sessions.amodify(user_id, lambda s: (s or []) + [message])
+
+    queue = SharedQueue("smm.publish_queue")
+    await queue.apush(request.post_id, request, score=due_timestamp)
+    for request in await queue.aitems():       # ordered by score
+        if await queue.aclaim(request.post_id) is not None:
+            ...                                # this worker owns it now
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import os
+import pickle
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections.abc import MutableMapping
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+from bot.config.settings import STATE_BACKEND, STATE_DB_PATH
+
+logger = logging.getLogger(__name__)
+
+__all__ = [
+    "StateBackend", "MemoryStateBackend", "SQLiteStateBackend",
+    "create_state_backend", "state_backend", "SharedDict", "SharedQueue",
+]
+
+_MISSING = object()
+
+
+class StateBackend(ABC):
+    """Namespaced key/value store with optional TTL and ordering score"""
+
+    name = "abstract"
+    # файл / сеть: из event loop вызывать только через run()
+    blocking = False
+
+    async def run(self, fn: Callable[..., Any], *args, **kwargs) -> Any:
+        """Call fn off the event loop if this backend blocks"""
+        if self.blocking:
+            return await asyncio.to_thread(fn, *args, **kwargs)
+        return fn(*args, **kwargs)
+
+    @abstractmethod
+    def get(self, namespace: str, key: str, default: Any = None) -> Any:
+        ...
+
+    @abstractmethod
+    def set(self, namespace: str, key: str, value: Any,
+            ttl: Optional[float] = None, score: float = 0.0) -> None:
+        ...
+
+    @abstractmethod
+    def pop(self, namespace: str, key: str, default: Any = None) -> Any:
+        """Remove and return; only one caller across workers gets the value"""
+
+    @abstractmethod
+    def add(self, namespace: str, key: str, value: Any,
+            ttl: Optional[float] = None, score: float = 0.0) -> bool:
+        """Store only if the key is absent (or expired); True if stored"""
+
+    @abstractmethod
+    def update(self, namespace: str, key: str, fn: Callable[[Any], Any],
+               ttl: Optional[float] = None, score: float = 0.0) -> Any:
+        """Atomically store fn(current value or None), return the new value"""
+
+    @abstractmethod
+    def items(self, namespace: str) -> List[Tuple[str, Any]]:
+        """Live entries ordered by (score, key)"""
+
+    @abstractmethod
+    def count(self, namespace: str) -> int:
+        ...
+
+    @abstractmethod
+    def clear(self, namespace: str) -> None:
+        ...
+
+    @abstractmethod
+    def purge_expired(self) -> int:
+        """Drop entries whose TTL has passed, return how many"""
+
+    def delete(self, namespace: str, key: str) -> bool:
+        return self.pop(namespace, key, _MISSING) is not _MISSING
+
+
+def _expires_at(ttl: Optional[float]) -> Optional[float]:
+    return time.time() + ttl if ttl else None
+
+
+class MemoryStateBackend(StateBackend):
+    """Per-process dicts; values are stored by reference"""
+
+    name = "memory"
+
+    def __init__(self):
+        # namespace -> key -> (value, score, expires_at)
+        self._data: Dict[str, Dict[str, Tuple[Any, float, Optional[float]]]] = {}
+        self._lock = threading.Lock()
+
+    def _live(self, namespace: str) -> Dict[str, Tuple[Any, float, Optional[float]]]:
+        entries = self._data.setdefault(namespace, {})
+        now = time.time()
+        expired = [key for key, (_, _, expires_at) in entries.items() if expires_at and expires_at <= now]
+        for key in expired:
+            del entries[key]
+        return entries
+
+    def get(self, namespace, key, default=None):
+        entry = self._data.get(namespace, {}).get(key)
+        if entry is None or (entry[2] and entry[2] <= time.time()):
+            return default
+        return entry[0]
+
+    def set(self, namespace, key, value, ttl=None, score=0.0):
+        with self._lock:
+            self._data.setdefault(namespace, {})[key] = (value, score, _expires_at(ttl))
+
+    def pop(self, namespace, key, default=None):
+        with self._lock:
+            entry = self._data.get(namespace, {}).pop(key, None)
+        if entry is None or (entry[2] and entry[2] <= time.time()):
+            return default
+        return entry[0]
+
+    def add(self, namespace, key, value, ttl=None, score=0.0):
+        with self._lock:
+            if self.get(namespace, key, _MISSING) is not _MISSING:
+                return False
+            self._data.setdefault(namespace, {})[key] = (value, score, _expires_at(ttl))
+        return True
+
+    def update(self, namespace, key, fn, ttl=None, score=0.0):
+        with self._lock:
+            value = fn(self.get(namespace, key))
+            self._data.setdefault(namespace, {})[key] = (value, score, _expires_at(ttl))
+        return value
+
+    def items(self, namespace):
+        with self._lock:
+            entries = list(self._live(namespace).items())
+        entries.sort(key=lambda item: (item[1][1], item[0]))
+        return [(key, value) for key, (value, _, _) in entries]
+
+    def count(self, namespace):
+        with self._lock:
+            return len(self._live(namespace))
+
+    def clear(self, namespace):
+        with self._lock:
+            self._data.pop(namespace, None)
+
+    def purge_expired(self):
+        purged = 0
+        with self._lock:
+            for namespace, entries in self._data.items():
+                before = len(entries)
+                self._live(namespace)
+                purged += before - len(entries)
+        return purged
+
+
+class SQLiteStateBackend(StateBackend):
+    """One WAL-mode SQLite file shared by all worker processes on the host"""
+
+    name = "sqlite"
+    blocking = True
+
+    _SCHEMA = """
+        CREATE TABLE IF NOT EXISTS shared_state (
+            namespace TEXT NOT NULL,
+            key TEXT NOT NULL,
+            value BLOB NOT NULL,
+            score REAL NOT NULL DEFAULT 0,
+            expires_at REAL,
+            PRIMARY KEY (namespace, key)
+        ) WITHOUT ROWID;
+        CREATE INDEX IF NOT EXISTS ix_shared_state_namespace_score
+            ON shared_state (namespace, score);
+    """
+
+    def __init__(self, path: str = STATE_DB_PATH, busy_timeout: float = 5.0):
+        self.path = path
+        self.busy_timeout = busy_timeout
+        self._conn: Optional[sqlite3.Connection] = None
+        self._pid: Optional[int] = None
+        self._lock = threading.RLock()
+
+    def _connection(self) -> sqlite3.Connection:
+        # соединение нельзя наследовать через fork – открываем своё в каждом процессе
+        if self._conn is None or self._pid != os.getpid():
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=self.busy_timeout,
+                                   isolation_level=None, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.executescript(self._SCHEMA)
+            self._conn, self._pid = conn, os.getpid()
+        return self._conn
+
+    def _transaction(self, fn: Callable[[sqlite3.Connection], Any]) -> Any:
+        """Run fn under a write lock held across processes (BEGIN IMMEDIATE)"""
+        with self._lock:
+            conn = self._connection()
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                result = fn(conn)
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+            conn.execute("COMMIT")
+            return result
+
+    def _read(self, conn: sqlite3.Connection, namespace: str, key: str) -> Any:
+        row = conn.execute(
+            "SELECT value FROM shared_state WHERE namespace = ? AND key = ? "
+            "AND (expires_at IS NULL OR expires_at > ?)",
+            (namespace, key, time.time())).fetchone()
+        return _MISSING if row is None else pickle.loads(row[0])
+
+    def _write(self, conn: sqlite3.Connection, namespace: str, key: str, value: Any,
+               ttl: Optional[float], score: float) -> None:
+        conn.execute(
+            "INSERT OR REPLACE INTO shared_state (namespace, key, value, score, expires_at) "
+            "VALUES (?, ?, ?, ?, ?)",
+            (namespace, key, pickle.dumps(value, pickle.HIGHEST_PROTOCOL), score, _expires_at(ttl)))
+
+    def get(self, namespace, key, default=None):
+        with self._lock:
+            value = self._read(self._connection(), namespace, key)
+        return default if value is _MISSING else value
+
+    def set(self, namespace, key, value, ttl=None, score=0.0):
+        with self._lock:
+            self._write(self._connection(), namespace, key, value, ttl, score)
+
+    def pop(self, namespace, key, default=None):
+        def claim(conn):
+            value = self._read(conn, namespace, key)
+            conn.execute("DELETE FROM shared_state WHERE namespace = ? AND key = ?", (namespace, key))
+            return value
+
+        value = self._transaction(claim)
+        return default if value is _MISSING else value
+
+    def add(self, namespace, key, value, ttl=None, score=0.0):
+        def insert(conn):
+            if self._read(conn, namespace, key) is not _MISSING:
+                return False
+            self._write(conn, namespace, key, value, ttl, score)
+            return True
+
+        return self._transaction(insert)
+
+    def update(self, namespace, key, fn, ttl=None, score=0.0):
+        def modify(conn):
+            current = self._read(conn, namespace, key)
+            value = fn(None if current is _MISSING else current)
+            self._write(conn, namespace, key, value, ttl, score)
+            return value
+
+        return self._transaction(modify)
+
+    def items(self, namespace):
+        with self._lock:
+            rows = self._connection().execute(
+                "SELECT key, value FROM shared_state WHERE namespace = ? "
+                "AND (expires_at IS NULL OR expires_at > ?) ORDER BY score, key",
+                (namespace, time.time())).fetchall()
+        return [(key, pickle.loads(value)) for key, value in rows]
+
+    def count(self, namespace):
+        with self._lock:
+            return self._connection().execute(
+                "SELECT COUNT(*) FROM shared_state WHERE namespace = ? "
+                "AND (expires_at IS NULL OR expires_at > ?)",
+                (namespace, time.time())).fetchone()[0]
+
+    def clear(self, namespace):
+        with self._lock:
+            self._connection().execute("DELETE FROM shared_state WHERE namespace = ?", (namespace,))
+
+    def purge_expired(self) -> int:
+        with self._lock:
+            return self._connection().execute(
+                "DELETE FROM shared_state WHERE expires_at IS NOT NULL AND expires_at <= ?",
+                (time.time(),)).rowcount
+
+
+def create_state_backend(kind: str = STATE_BACKEND, path: str = STATE_DB_PATH) -> StateBackend:
+    kind = (kind or "memory").lower()
+    if kind == "memory":
+        return MemoryStateBackend()
+    if kind == "sqlite":
+        logger.info(f"🗄️ Shared state backend: SQLite WAL at {path}")
+        return SQLiteStateBackend(path)
+    raise ValueError(f"Unknown STATE_BACKEND: {kind} (expected 'memory' or 'sqlite')")
+
+
+# Global backend instance
+state_backend = create_state_backend()
+
+
+class SharedDict(MutableMapping):
+    """Dict-like view of one namespace; keys are stored as strings"""
+
+    def __init__(self, namespace: str, backend: Optional[StateBackend] = None,
+                 ttl: Optional[float] = None):
+        self.namespace = namespace
+        self.backend = backend or state_backend
+        self.ttl = ttl
+
+    def __getitem__(self, key):
+        value = self.backend.get(self.namespace, str(key), _MISSING)
+        if value is _MISSING:
+            raise KeyError(key)
+        return value
+
+    def __setitem__(self, key, value):
+        self.backend.set(self.namespace, str(key), value, ttl=self.ttl)
+
+    def __delitem__(self, key):
+        if not self.backend.delete(self.namespace, str(key)):
+            raise KeyError(key)
+
+    def __contains__(self, key):
+        return self.backend.get(self.namespace, str(key), _MISSING) is not _MISSING
+
+    def __iter__(self) -> Iterator[str]:
+        return iter([key for key, _ in self.backend.items(self.namespace)])
+
+    def __len__(self):
+        return self.backend.count(self.namespace)
+
+    def items(self):
+        return self.backend.items(self.namespace)
+
+    def values(self):
+        return [value for _, value in self.backend.items(self.namespace)]
+
+    def pop(self, key, default=_MISSING):
+        """Atomic remove-and-return (the claim step across workers)"""
+        value = self.backend.pop(self.namespace, str(key), _MISSING)
+        if value is _MISSING:
+            if default is _MISSING:
+                raise KeyError(key)
+            return default
+        return value
+
+    def modify(self, key, fn: Callable[[Any], Any]) -> Any:
+        """Atomically replace the value with fn(value or None)"""
+        return self.backend.update(self.namespace, str(key), fn, ttl=self.ttl)
+
+    def add(self, key, value) -> bool:
+        """Store only if key is absent; True if this call stored it"""
+        return self.backend.add(self.namespace, str(key), value, ttl=self.ttl)
+
+    def clear(self):
+        self.backend.clear(self.namespace)
+
+    # -------- async (event loop) ----------
+
+    async def aget(self, key, default=None):
+        return await self.backend.run(self.get, key, default)
+
+    async def aset(self, key, value) -> None:
+        await self.backend.run(self.__setitem__, key, value)
+
+    async def apop(self, key, default=None):
+        return await self.backend.run(self.pop, key, default)
+
+    async def amodify(self, key, fn: Callable[[Any], Any]) -> Any:
+        return await self.backend.run(self.modify, key, fn)
+
+    async def aadd(self, key, value) -> bool:
+        return await self.backend.run(self.add, key, value)
+
+    async def aitems(self) -> List[Tuple[str, Any]]:
+        return await self.backend.run(self.items)
+
+    async def alen(self) -> int:
+        return await self.backend.run(len, self)
+
+
+class SharedQueue:
+    """Keyed work queue; iteration yields items ordered by score"""
+
+    def __init__(self, namespace: str, backend: Optional[StateBackend] = None):
+        self.namespace = namespace
+        self.backend = backend or state_backend
+
+    def push(self, key, item: Any, score: float = 0.0) -> None:
+        """Add or replace the item stored under key"""
+        self.backend.set(self.namespace, str(key), item, score=score)
+
+    def claim(self, key) -> Any:
+        """Remove and return the item; None if another worker already took it"""
+        return self.backend.pop(self.namespace, str(key))
+
+    def discard(self, key) -> bool:
+        return self.backend.delete(self.namespace, str(key))
+
+    def __iter__(self) -> Iterator[Any]:
+        return iter([item for _, item in self.backend.items(self.namespace)])
+
+    def __len__(self) -> int:
+        return self.backend.count(self.namespace)
+
+    def __contains__(self, key) -> bool:
+        return self.backend.get(self.namespace, str(key), _MISSING) is not _MISSING
+
+    # -------- async (event loop) ----------
+
+    async def apush(self, key, item: Any, score: float = 0.0) -> None:
+        await self.backend.run(self.push, key, item, score)
+
+    async def aclaim(self, key) -> Any:
+        return await self.backend.run(self.claim, key)
+
+    async def adiscard(self, key) -> bool:
+        return await self.backend.run(self.discard, key)
+
+    async def aitems(self) -> List[Any]:
+        """Items ordered by score"""
+        return await self.backend.run(list, self)
+
+    async def alen(self) -> int:
+        return await self.backend.run(len, self)
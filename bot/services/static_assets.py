@@ -0,0 +1,302 @@
+"""Mini App static assets: build pipeline and precompressed serving.
+
+Build (`python manage.py build-assets [TREE ...]`, default webapp/ – the
+only tree the apps mount) turns each source tree into STATIC_BUILD_DIR/<tree>/:
+
+    * consecutive local <script src> / stylesheet <link> tags of a page are
+      bundled into one file;
+    * JS / CSS are minified (rjsmin / rcssmin when installed);
+    * referenced assets get a content-hashed name (main.3f2a9c1b0d.js) and
+      the HTML is rewritten to it – the unhashed name is kept for old links;
+    * every text asset gets .gz and .br (brotli, when installed) siblings;
+    * manifest.json maps source names to hashed names.
+
+Serving (`webapp_static_files()`) picks the .br / .gz variant by
+Accept-Encoding, sends `Cache-Control: immutable` for hashed names and
+`no-cache` (revalidate via ETag) for everything else. Without a build the
+source tree is served as before.
+
+Usage:
+    from bot.services.static_assets import build_assets, webapp_static_files
+
+    build_assets("webapp")
+    app.mount("/webapp", webapp_static_files("webapp"), name="webapp")
+"""
+
+from __future__ import annotations
+
+import gzip
+import hashlib
+import json
+import logging
+import mimetypes
+import os
+import re
+import shutil
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional
+
+from starlette.datastructures import Headers
+from starlette.responses import FileResponse, Response
+from starlette.staticfiles import NotModifiedResponse, StaticFiles
+
+from bot.config.settings import STATIC_BUILD_DIR
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+try:
+    import rjsmin
+except ImportError:
+    rjsmin = None
+
+try:
+    import rcssmin
+except ImportError:
+    rcssmin = None
+
+logger = logging.getLogger(__name__)
+
+__all__ = ["BuildReport", "build_assets", "PrecompressedStaticFiles", "webapp_static_files"]
+
+# URL, под которым деревья подключены в app.py / start_clean.py
+URL_PREFIX = "/webapp/"
+
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+REVALIDATE_CACHE_CONTROL = "no-cache"
+
+HASHED_NAME = re.compile(r"\.[0-9a-f]{10}\.(?:js|css)$")
+COMPRESSIBLE = {".html", ".js", ".css", ".json", ".svg", ".txt"}
+MIN_COMPRESS_SIZE = 256  # bytes; меньше – выигрыш не окупает заголовков
+
+_SCRIPT_TAG = r'<script src="(?P<src>[^"]+)"></script>'
+_STYLE_TAG = r'<link rel="stylesheet" href="(?P<href>[^"]+)"(?: media="all")?>'
+_SCRIPT_RUN = re.compile(rf"(?:{_SCRIPT_TAG}\s*)+")
+_STYLE_RUN = re.compile(rf"(?:{_STYLE_TAG}\s*)+")
+_PRELOAD = re.compile(r'(<link rel="preload" href=")(?P<href>[^"]+)(")')
+
+
+@dataclass
+class BuildReport:
+    """What build_assets() produced for one tree"""
+    tree: str
+    output_dir: str
+    manifest: Dict[str, str] = field(default_factory=dict)
+    source_bytes: int = 0
+    minified_bytes: int = 0
+    gzip_bytes: int = 0
+    brotli_bytes: int = 0
+
+
+# -------- build ----------
+
+def _minify(name: str, content: str) -> str:
+    if name.endswith(".js") and rjsmin:
+        return rjsmin.jsmin(content)
+    if name.endswith(".css") and rcssmin:
+        return rcssmin.cssmin(content)
+    return content
+
+
+def _content_hash(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()[:10]
+
+
+def _hashed_name(name: str, data: bytes) -> str:
+    stem, ext = os.path.splitext(name)
+    return f"{stem}.{_content_hash(data)}{ext}"
+
+
+class _TreeBuilder:
+    def __init__(self, source_dir: str, output_dir: str):
+        self.source_dir = source_dir
+        self.output_dir = output_dir
+        self.report = BuildReport(tree=os.path.basename(source_dir.rstrip("/")), output_dir=output_dir)
+        self._minified: Dict[str, str] = {}
+
+    def _local_name(self, url: str) -> Optional[str]:
+        """Tree-relative name of a local asset URL, None for external ones"""
+        if url.startswith(URL_PREFIX):
+            name = url[len(URL_PREFIX):]
+        elif "://" in url or url.startswith(("/", "data:")):
+            return None
+        else:
+            name = url
+        name = name.split("?", 1)[0]
+        return name if name in self._minified else None
+
+    def _emit(self, name: str, content: str) -> str:
+        """Write hashed asset, return its URL"""
+        data = content.encode("utf-8")
+        hashed = _hashed_name(name, data)
+        self._write(hashed, data)
+        self.report.manifest[name] = hashed
+        return URL_PREFIX + hashed
+
+    def _write(self, name: str, data: bytes) -> None:
+        path = os.path.join(self.output_dir, name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "wb") as f:
+            f.write(data)
+
+    def _bundle(self, names: List[str], ext: str) -> str:
+        if len(names) == 1:
+            return self._emit(names[0], self._minified[names[0]])
+        # ';' – на случай файла без завершающей точки с запятой
+        separator = "\n;\n" if ext == ".js" else "\n"
+        content = separator.join(self._minified[name] for name in names)
+        bundle_name = f"bundle-{_content_hash('|'.join(names).encode())}{ext}"
+        url = self._emit(bundle_name, content)
+        for name in names:
+            self.report.manifest.setdefault(name, os.path.basename(url))
+        return url
+
+    def _rewrite_html(self, html: str) -> str:
+        def scripts(match: re.Match) -> str:
+            names = [self._local_name(m.group("src")) for m in re.finditer(_SCRIPT_TAG, match.group(0))]
+            if not all(names):
+                return match.group(0)  # есть внешние скрипты – порядок не трогаем
+            return f'<script src="{self._bundle(names, ".js")}"></script>\n'
+
+        def styles(match: re.Match) -> str:
+            names = [self._local_name(m.group("href")) for m in re.finditer(_STYLE_TAG, match.group(0))]
+            if not all(names):
+                return match.group(0)
+            return f'<link rel="stylesheet" href="{self._bundle(names, ".css")}">\n'
+
+        def preload(match: re.Match) -> str:
+            name = self._local_name(match.group("href"))
+            if not name:
+                return match.group(0)
+            hashed = self.report.manifest.get(name) or os.path.basename(self._emit(name, self._minified[name]))
+            return f"{match.group(1)}{URL_PREFIX}{hashed}{match.group(3)}"
+
+        html = _SCRIPT_RUN.sub(scripts, html)
+        html = _STYLE_RUN.sub(styles, html)
+        return _PRELOAD.sub(preload, html)
+
+    def build(self) -> BuildReport:
+        if os.path.isdir(self.output_dir):
+            shutil.rmtree(self.output_dir)
+        os.makedirs(self.output_dir)
+
+        pages: Dict[str, str] = {}
+        for root, _dirs, files in os.walk(self.source_dir):
+            for filename in sorted(files):
+                path = os.path.join(root, filename)
+                name = os.path.relpath(path, self.source_dir).replace(os.sep, "/")
+                ext = os.path.splitext(name)[1]
+                if ext in (".js", ".css"):
+                    with open(path, encoding="utf-8") as f:
+                        source = f.read()
+                    self.report.source_bytes += len(source.encode("utf-8"))
+                    self._minified[name] = _minify(name, source)
+                    self.report.minified_bytes += len(self._minified[name].encode("utf-8"))
+                elif ext == ".html":
+                    with open(path, encoding="utf-8") as f:
+                        pages[name] = f.read()
+                else:
+                    target = os.path.join(self.output_dir, name)
+                    os.makedirs(os.path.dirname(target), exist_ok=True)
+                    shutil.copyfile(path, target)
+
+        # несвязанные с HTML файлы и старые ссылки – под исходным именем
+        for name, content in self._minified.items():
+            self._write(name, content.encode("utf-8"))
+        for name, html in pages.items():
+            self._write(name, self._rewrite_html(html).encode("utf-8"))
+
+        self._compress_all()
+        self._write("manifest.json", json.dumps(self.report.manifest, indent=2, sort_keys=True).encode())
+        return self.report
+
+    def _compress_all(self) -> None:
+        for root, _dirs, files in os.walk(self.output_dir):
+            for filename in files:
+                if os.path.splitext(filename)[1] not in COMPRESSIBLE:
+                    continue
+                path = os.path.join(root, filename)
+                with open(path, "rb") as f:
+                    data = f.read()
+                if len(data) < MIN_COMPRESS_SIZE:
+                    continue
+                compressed = gzip.compress(data, compresslevel=9, mtime=0)
+                with open(path + ".gz", "wb") as f:
+                    f.write(compressed)
+                self.report.gzip_bytes += len(compressed)
+                if brotli is not None:
+                    compressed = brotli.compress(data, quality=11)
+                    with open(path + ".br", "wb") as f:
+                        f.write(compressed)
+                    self.report.brotli_bytes += len(compressed)
+
+
+def build_assets(source_dir: str, output_root: str = STATIC_BUILD_DIR) -> BuildReport:
+    """Build one source tree into output_root/<tree name>"""
+    if not os.path.isdir(source_dir):
+        raise FileNotFoundError(f"Asset source directory not found: {source_dir}")
+    tree = os.path.basename(os.path.normpath(source_dir))
+    report = _TreeBuilder(source_dir, os.path.join(output_root, tree)).build()
+    if rjsmin is None or rcssmin is None:
+        logger.warning("⚠️ rjsmin/rcssmin not installed – JS/CSS copied without minification")
+    if brotli is None:
+        logger.warning("⚠️ brotli not installed – only gzip variants built")
+    return report
+
+
+# -------- serving ----------
+
+def _accepted_encodings(header: str) -> set:
+    accepted = set()
+    for part in header.split(","):
+        coding, _, params = part.strip().partition(";")
+        if params.strip().replace(" ", "") in ("q=0", "q=0.0", "q=0.00", "q=0.000"):
+            continue
+        if coding:
+            accepted.add(coding.strip().lower())
+    return accepted
+
+
+class PrecompressedStaticFiles(StaticFiles):
+    """StaticFiles that serves .br / .gz siblings and sets Cache-Control"""
+
+    def file_response(self, full_path, stat_result, scope, status_code: int = 200) -> Response:
+        request_headers = Headers(scope=scope)
+        accepted = _accepted_encodings(request_headers.get("accept-encoding", ""))
+        media_type = mimetypes.guess_type(str(full_path))[0] or "application/octet-stream"
+
+        response = None
+        for encoding, suffix in (("br", ".br"), ("gzip", ".gz")):
+            if encoding not in accepted:
+                continue
+            try:
+                variant_stat = os.stat(f"{full_path}{suffix}")
+            except OSError:
+                continue
+            response = FileResponse(
+                f"{full_path}{suffix}", status_code=status_code,
+                stat_result=variant_stat, media_type=media_type)
+            response.headers["content-encoding"] = encoding
+            break
+
+        if response is None:
+            response = FileResponse(full_path, status_code=status_code, stat_result=stat_result)
+
+        response.headers["vary"] = "Accept-Encoding"
+        response.headers["cache-control"] = (
+            IMMUTABLE_CACHE_CONTROL if HASHED_NAME.search(str(full_path)) else REVALIDATE_CACHE_CONTROL)
+
+        if self.is_not_modified(response.headers, request_headers):
+            return NotModifiedResponse(response.headers)
+        return response
+
+
+def webapp_static_files(source_dir: str, output_root: str = STATIC_BUILD_DIR) -> StaticFiles:
+    """Built tree if `manage.py build-assets` was run, else the source tree"""
+    built = os.path.join(output_root, os.path.basename(os.path.normpath(source_dir)))
+    if os.path.isfile(os.path.join(built, "manifest.json")):
+        logger.info(f"📦 Serving built assets from {built}")
+        return PrecompressedStaticFiles(directory=built, html=True)
+    return PrecompressedStaticFiles(directory=source_dir, html=True)
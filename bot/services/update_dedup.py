@@ -0,0 +1,138 @@
+"""update_id deduplication for webhook redeliveries.
+
+Telegram redelivers an update when our webhook answers slowly or with an
+error; processing it twice means duplicate AI calls, applications and admin
+notifications. The last UPDATE_DEDUP_CAPACITY update_ids are kept in a ring
+buffer (eviction order) plus a set (O(1) lookup).
+
+With UPDATE_DEDUP_STATE_FILE the window is saved on shutdown and restored on
+start, so a redeploy does not reprocess deliveries that were retried across it.
+
+With a shared STATE_BACKEND (several web workers) a redelivery may reach a
+different worker, so accepted update_ids live in the backend instead
+(namespace "webhook.update_ids", kept UPDATE_DEDUP_TTL seconds) and
+`accept()` is an atomic insert-if-absent: exactly one worker wins.
+
+Usage:
+    from bot.services.update_dedup import update_dedup
+
+    if not await update_dedup.accept(update.update_id):
+        return OK            # duplicate – acknowledge and drop
+    if not queued:
+        await update_dedup.forget(update.update_id)   # Telegram will redeliver
+"""
+
+from __future__ import annotations
+
+import json
+import logging
+import os
+import time
+from collections import deque
+from typing import Any, Deque, Dict, Optional, Set
+
+from bot.config.settings import UPDATE_DEDUP_CAPACITY, UPDATE_DEDUP_STATE_FILE, UPDATE_DEDUP_TTL
+from bot.services.state_backend import SharedDict, StateBackend, state_backend
+
+logger = logging.getLogger(__name__)
+
+__all__ = ["UpdateDeduplicator", "update_dedup"]
+
+# как часто вычищать просроченные update_id из общего backend, секунд
+PURGE_INTERVAL = 300
+
+
+class UpdateDeduplicator:
+    """Bounded window of recently accepted update_ids"""
+
+    def __init__(self, capacity: int = UPDATE_DEDUP_CAPACITY, state_file: Optional[str] = UPDATE_DEDUP_STATE_FILE,
+                 backend: Optional[StateBackend] = None, ttl: float = UPDATE_DEDUP_TTL):
+        self.capacity = capacity
+        self.state_file = state_file
+        self._order: Deque[int] = deque()
+        self._ids: Set[int] = set()
+        self._loaded = False
+        self.dropped = 0
+
+        backend = backend or state_backend
+        # несколько воркеров – окно общее, в backend
+        self.shared = backend.name != "memory"
+        self._backend = backend
+        self._shared_ids = SharedDict("webhook.update_ids", backend, ttl=ttl) if self.shared else None
+        self._last_purge = time.monotonic()
+
+    def _ensure_loaded(self) -> None:
+        if self._loaded:
+            return
+        self._loaded = True
+        if not self.state_file or not os.path.exists(self.state_file):
+            return
+        try:
+            with open(self.state_file, encoding="utf-8") as f:
+                update_ids = json.load(f)
+            for update_id in update_ids[-self.capacity:]:
+                self._add(int(update_id))
+            logger.info(f"📥 Restored {len(self._ids)} recent update_ids from {self.state_file}")
+        except (OSError, ValueError, TypeError) as e:
+            logger.warning(f"⚠️ Could not restore update_ids from {self.state_file}: {e}")
+
+    def _add(self, update_id: int) -> None:
+        if update_id in self._ids:
+            return
+        self._order.append(update_id)
+        self._ids.add(update_id)
+        if len(self._order) > self.capacity:
+            self._ids.discard(self._order.popleft())
+
+    async def accept(self, update_id: int) -> bool:
+        """Record update_id; False if it was already accepted (counted as dropped)"""
+        if self.shared:
+            accepted = await self._shared_ids.aadd(update_id, True)
+            if time.monotonic() - self._last_purge > PURGE_INTERVAL:
+                self._last_purge = time.monotonic()
+                await self._backend.run(self._backend.purge_expired)
+        else:
+            self._ensure_loaded()
+            accepted = update_id not in self._ids
+            if accepted:
+                self._add(update_id)
+
+        if not accepted:
+            self.dropped += 1
+            logger.info(f"🔁 Duplicate update {update_id} dropped (total {self.dropped})")
+        return accepted
+
+    async def forget(self, update_id: int) -> None:
+        """Undo accept() for an update that was not queued, so its redelivery is processed"""
+        if self.shared:
+            await self._shared_ids.apop(update_id)
+        elif update_id in self._ids:
+            self._ids.discard(update_id)
+            self._order.remove(update_id)
+
+    def save(self) -> None:
+        """Persist the window to UPDATE_DEDUP_STATE_FILE (if configured)"""
+        if self.shared or not self.state_file or not self._loaded:
+            return
+        try:
+            tmp_path = f"{self.state_file}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(list(self._order), f)
+            os.replace(tmp_path, self.state_file)
+        except OSError as e:
+            logger.warning(f"⚠️ Could not save update_ids to {self.state_file}: {e}")
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Window size and number of dropped duplicates"""
+        return {
+            # общий backend из /health не опрашиваем – там только счётчики процесса
+            "tracked_update_ids": None if self.shared else len(self._ids),
+            "capacity": None if self.shared else self.capacity,
+            "duplicates_dropped": self.dropped,
+            "persistent": self.shared or bool(self.state_file),
+            "backend": self._backend.name,
+        }
+
+
+# Global deduplicator instance
+update_dedup = UpdateDeduplicator()
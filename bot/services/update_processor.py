@@ -0,0 +1,180 @@
+"""Concurrent PTB update processing, serialized per user.
+
+With the default Application every update waits for the previous one, so a
+slow `ai_chat` for one user stalls all others. `PerUserUpdateProcessor`
+runs up to UPDATE_CONCURRENCY handlers at once while updates of the same
+user still run strictly one after another (conversation state in
+simple_memory and the client flow depend on that order).
+
+Waiting updates of a busy user do not occupy a handler slot: PTB's own
+semaphore only bounds updates in flight (running + waiting), the handler
+slot is taken after the per-user lock.
+
+The time each update waits (per-user lock + free slot) is tracked overall
+and per user; waits over UPDATE_WAIT_WARN_MS are logged.
+
+Usage:
+    from bot.services.update_processor import update_processor
+
+    application = (Application.builder().token(TOKEN)
+                   .concurrent_updates(update_processor).build())
+    update_processor.get_stats()
+"""
+
+from __future__ import annotations
+
+import asyncio
+import contextlib
+import logging
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Dict, Optional
+
+from telegram import Update
+from telegram.ext import BaseUpdateProcessor
+
+from bot.config.settings import UPDATE_CONCURRENCY, UPDATE_WAIT_WARN_MS
+from bot.core.prometheus_metrics import register_queue_depth
+
+logger = logging.getLogger(__name__)
+
+__all__ = ["PerUserUpdateProcessor", "update_processor"]
+
+# обновления в работе + ожидающие, на один слот обработчика
+IN_FLIGHT_PER_SLOT = 32
+# сколько последних пользователей хранить в статистике ожидания
+TRACKED_USERS = 1000
+
+
+def _user_key(update: object) -> Optional[Any]:
+    """Serialization key: user, else chat, else None (no ordering)"""
+    if isinstance(update, Update):
+        if update.effective_user:
+            return update.effective_user.id
+        if update.effective_chat:
+            return ("chat", update.effective_chat.id)
+    return None
+
+
+class PerUserUpdateProcessor(BaseUpdateProcessor):
+    """Up to `concurrency` updates at once, one at a time per user"""
+
+    def __init__(self, concurrency: int = UPDATE_CONCURRENCY, wait_warn_ms: float = UPDATE_WAIT_WARN_MS):
+        self.concurrency = max(1, concurrency)
+        self.wait_warn_ms = wait_warn_ms
+        super().__init__(max_concurrent_updates=self.concurrency * IN_FLIGHT_PER_SLOT)
+
+        self._slots: Optional[asyncio.Semaphore] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        # user key -> [lock, updates holding or waiting for it]
+        self._user_locks: Dict[Any, list] = {}
+
+        # metrics
+        self.processed = 0
+        self.running = 0
+        self.waiting = 0
+        self._started = 0
+        self.max_wait_ms = 0.0
+        self._total_wait_ms = 0.0
+        self._per_user: "OrderedDict[Any, Dict[str, float]]" = OrderedDict()
+
+    async def initialize(self) -> None:
+        self._ensure_loop()
+
+    async def shutdown(self) -> None:
+        self._user_locks.clear()
+
+    def _ensure_loop(self) -> None:
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            self._slots = asyncio.Semaphore(self.concurrency)
+            self._user_locks = {}
+            self._loop = loop
+
+    # -------- processing ----------
+
+    async def do_process_update(self, update: object, coroutine: Awaitable[Any]) -> None:
+        self._ensure_loop()
+        key = _user_key(update)
+        queued_at = time.perf_counter()
+
+        entry = None
+        if key is not None:
+            entry = self._user_locks.get(key)
+            if entry is None:
+                entry = self._user_locks[key] = [asyncio.Lock(), 0]
+            entry[1] += 1
+
+        self.waiting += 1
+        waiting = True
+        try:
+            async with (entry[0] if entry else contextlib.nullcontext()):
+                async with self._slots:
+                    self.waiting -= 1
+                    waiting = False
+                    self._record_wait(key, (time.perf_counter() - queued_at) * 1000)
+                    self.running += 1
+                    try:
+                        await coroutine
+                    finally:
+                        self.running -= 1
+                        self.processed += 1
+        finally:
+            if waiting:
+                self.waiting -= 1  # отменён, не дождавшись очереди
+            if entry is not None:
+                entry[1] -= 1
+                if entry[1] == 0:
+                    self._user_locks.pop(key, None)
+
+    # -------- metrics ----------
+
+    def _record_wait(self, key: Any, wait_ms: float) -> None:
+        self._started += 1
+        self._total_wait_ms += wait_ms
+        self.max_wait_ms = max(self.max_wait_ms, wait_ms)
+        if key is None:
+            return
+
+        stats = self._per_user.pop(key, None) or {"updates": 0, "total_wait_ms": 0.0, "max_wait_ms": 0.0}
+        stats["updates"] += 1
+        stats["total_wait_ms"] += wait_ms
+        stats["max_wait_ms"] = max(stats["max_wait_ms"], wait_ms)
+        stats["last_wait_ms"] = wait_ms
+        self._per_user[key] = stats
+        if len(self._per_user) > TRACKED_USERS:
+            self._per_user.popitem(last=False)
+
+        if wait_ms > self.wait_warn_ms:
+            logger.warning(f"⚠️ Update for {key} waited {wait_ms:.0f} ms in queue")
+
+    def get_user_wait(self, user_id: Any) -> Optional[Dict[str, float]]:
+        """Queue wait stats of one user (None if not seen recently)"""
+        stats = self._per_user.get(user_id)
+        if stats is None:
+            return None
+        return {
+            "updates": stats["updates"],
+            "avg_wait_ms": round(stats["total_wait_ms"] / stats["updates"], 2),
+            "max_wait_ms": round(stats["max_wait_ms"], 2),
+            "last_wait_ms": round(stats["last_wait_ms"], 2),
+        }
+
+    def get_stats(self, top: int = 5) -> Dict[str, Any]:
+        """Concurrency, overall wait and the users that waited longest"""
+        slowest = sorted(self._per_user, key=lambda k: self._per_user[k]["max_wait_ms"], reverse=True)[:top]
+        return {
+            "concurrency": self.concurrency,
+            "running": self.running,
+            "busy_users": len(self._user_locks),
+            "waiting": self.waiting,
+            "processed": self.processed,
+            "avg_wait_ms": round(self._total_wait_ms / self._started, 2) if self._started else 0.0,
+            "max_wait_ms": round(self.max_wait_ms, 2),
+            "slowest_users": {str(key): self.get_user_wait(key) for key in slowest},
+        }
+
+
+# Global processor instance
+update_processor = PerUserUpdateProcessor()
+register_queue_depth("updates_waiting", lambda: update_processor.waiting)
@@ -0,0 +1,290 @@
+"""Webhook update queue – acknowledge Telegram immediately, process in background.
+
+The webhook handler validates the update, calls `update_queue.submit()` and
+returns 200 at once; a pool of workers runs `process_update`. Updates of one
+chat are processed strictly in arrival order, different chats run
+concurrently:
+
+    pending[chat_id] – FIFO of updates waiting for that chat
+    ready            – chats that have pending updates and no worker on them
+
+A worker takes a chat from `ready`, processes one update and puts the chat
+back if more are pending, so a busy chat never blocks the others.
+
+The total number of pending updates is bounded (UPDATE_QUEUE_MAX_SIZE); when
+full `submit()` returns False and the webhook answers 503 so Telegram retries
+later instead of us buffering without limit.
+
+With a shared STATE_BACKEND (several web workers) two updates of one chat
+can reach different workers. On intake every update also takes a turn in
+the chat's namespace of the backend (ordered by intake time); a worker
+processes an update only when its turn is the chat's oldest one and drops
+the turn afterwards. A turn of a worker that died expires after
+UPDATE_CHAT_LEASE seconds.
+
+Usage:
+    from bot.services.update_queue import update_queue
+
+    if not await update_queue.submit(update, application):
+        return Response(status_code=503)
+    ...
+    await update_queue.stop()  # on shutdown: drain and stop workers
+"""
+
+from __future__ import annotations
+
+import asyncio
+import itertools
+import logging
+import os
+import time
+from collections import deque
+from typing import Any, Deque, Dict, List, NamedTuple, Optional
+
+from telegram import Update
+
+from bot.config.settings import UPDATE_CHAT_LEASE, UPDATE_QUEUE_MAX_SIZE, UPDATE_WORKERS
+from bot.services.db import request_session
+from bot.services.state_backend import StateBackend, state_backend
+from bot.core.prometheus_metrics import register_queue_depth
+
+logger = logging.getLogger(__name__)
+
+__all__ = ["UpdateQueue", "update_queue"]
+
+# опрос общей очереди чата, пока его апдейт обрабатывает другой воркер
+TURN_POLL_MIN = 0.02
+TURN_POLL_MAX = 0.5
+
+# номера ходов уникальны в процессе, pid различает процессы
+_turn_seq = itertools.count()
+
+
+class _QueuedUpdate(NamedTuple):
+    update: Update
+    application: Any  # telegram.ext.Application
+    enqueued_at: float
+    turn: Optional[str]  # key of the chat turn in the shared backend
+
+
+def _chat_key(update: Update) -> Any:
+    """Ordering key: chat, else user, else the update itself (no ordering)"""
+    if update.effective_chat:
+        return update.effective_chat.id
+    if update.effective_user:
+        return ("user", update.effective_user.id)
+    return ("update", update.update_id)
+
+
+def _turns_namespace(key: Any) -> str:
+    if isinstance(key, tuple):
+        key = ":".join(str(part) for part in key)
+    return f"webhook.chat_turns.{key}"
+
+
+class UpdateQueue:
+    """Bounded per-chat ordered update queue with a worker pool"""
+
+    def __init__(self, max_size: int = UPDATE_QUEUE_MAX_SIZE, workers: int = UPDATE_WORKERS,
+                 backend: Optional[StateBackend] = None, lease: float = UPDATE_CHAT_LEASE):
+        self.max_size = max_size
+        self.workers = workers
+
+        backend = backend or state_backend
+        # несколько воркеров – очередность чата держим в общем backend
+        self.shared = backend.name != "memory"
+        self._backend = backend
+        self.lease = lease
+        self._intake_lock: Optional[asyncio.Lock] = None
+        self._last_turn_score = 0.0
+
+        self._pending: Dict[Any, Deque[_QueuedUpdate]] = {}
+        self._ready: Optional[asyncio.Queue] = None
+        self._tasks: List[asyncio.Task] = []
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._depth = 0
+        self._idle: Optional[asyncio.Event] = None
+
+        # metrics
+        self.accepted = 0
+        self.rejected = 0
+        self.processed = 0
+        self.failed = 0
+        self.max_depth = 0
+        self.last_wait_ms = 0.0
+        self.max_wait_ms = 0.0
+        self._total_wait_ms = 0.0
+        self.turn_waits = 0
+
+    # -------- lifecycle ----------
+
+    def _ensure_started(self) -> None:
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            # новый event loop – очередь и воркеры создаются заново
+            self._ready = asyncio.Queue()
+            self._idle = asyncio.Event()
+            self._idle.set()
+            self._intake_lock = asyncio.Lock()
+            self._pending.clear()
+            self._depth = 0
+            self._tasks = []
+            self._loop = loop
+
+        self._tasks = [task for task in self._tasks if not task.done()]
+        for i in range(len(self._tasks), self.workers):
+            self._tasks.append(loop.create_task(self._worker(), name=f"update-worker-{i}"))
+
+    async def stop(self, timeout: float = 10.0) -> None:
+        """Wait for pending updates (up to timeout) and stop workers"""
+        if self._loop is not asyncio.get_running_loop():
+            return
+
+        if self._depth:
+            logger.info(f"⏳ Draining {self._depth} queued updates...")
+            try:
+                await asyncio.wait_for(self._idle.wait(), timeout)
+            except asyncio.TimeoutError:
+                logger.warning(f"⚠️ Update queue stop timed out, {self._depth} updates dropped")
+
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    # -------- intake ----------
+
+    async def submit(self, update: Update, application: Any) -> bool:
+        """Queue update for processing; False when the queue is full"""
+        self._ensure_started()
+
+        if self._depth >= self.max_size:
+            self.rejected += 1
+            logger.warning(f"⚠️ Update queue full ({self._depth}), rejecting update {update.update_id}")
+            return False
+
+        key = _chat_key(update)
+        if not self.shared:
+            self._enqueue(key, update, application, None)
+            return True
+
+        # очередь чата в процессе должна идти в том же порядке, что и ходы в backend
+        async with self._intake_lock:
+            turn = await self._take_turn(key, update)
+            self._enqueue(key, update, application, turn)
+        return True
+
+    def _enqueue(self, key: Any, update: Update, application: Any, turn: Optional[str]) -> None:
+        item = _QueuedUpdate(update, application, time.monotonic(), turn)
+        chat_queue = self._pending.get(key)
+        if chat_queue is None:
+            # чат свободен – ставим в очередь готовых
+            self._pending[key] = deque([item])
+            self._ready.put_nowait(key)
+        else:
+            # чат уже в работе или ждёт воркера – воркер заберёт по порядку
+            chat_queue.append(item)
+
+        self._depth += 1
+        self._idle.clear()
+        self.accepted += 1
+        self.max_depth = max(self.max_depth, self._depth)
+
+    # -------- chat turns (shared backend) ----------
+
+    async def _take_turn(self, key: Any, update: Update) -> Optional[str]:
+        """Register the update in the chat's shared order; None if the backend failed"""
+        # строго возрастающая оценка – ходы одного процесса не меняются местами
+        score = max(time.time(), self._last_turn_score + 1e-6)
+        self._last_turn_score = score
+        turn = f"{os.getpid()}:{next(_turn_seq):012d}"
+        try:
+            await self._backend.run(self._backend.set, _turns_namespace(key), turn,
+                                    update.update_id, ttl=self.lease, score=score)
+            return turn
+        except Exception as e:
+            logger.error(f"❌ Chat turn for update {update.update_id} not stored, processing unordered: {e}")
+            return None
+
+    async def _wait_turn(self, key: Any, turn: str) -> None:
+        """Wait until no earlier update of the chat is pending in another worker"""
+        namespace = _turns_namespace(key)
+        delay = TURN_POLL_MIN
+        waited = False
+        while True:
+            turns = [name for name, _ in await self._backend.run(self._backend.items, namespace)]
+            # свой ход истёк (lease) – ждать больше некого
+            if not turns or turns[0] == turn or turn not in turns:
+                break
+            waited = True
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, TURN_POLL_MAX)
+        if waited:
+            self.turn_waits += 1
+
+    async def _release_turn(self, key: Any, turn: str) -> None:
+        try:
+            await self._backend.run(self._backend.delete, _turns_namespace(key), turn)
+        except Exception as e:
+            logger.error(f"❌ Chat turn {turn} not released (expires in {self.lease:.0f}s): {e}")
+
+    # -------- workers ----------
+
+    async def _worker(self) -> None:
+        while True:
+            key = await self._ready.get()
+            chat_queue = self._pending[key]
+            item = chat_queue.popleft()
+
+            wait_ms = (time.monotonic() - item.enqueued_at) * 1000
+            self.last_wait_ms = wait_ms
+            self.max_wait_ms = max(self.max_wait_ms, wait_ms)
+            self._total_wait_ms += wait_ms
+
+            try:
+                if item.turn:
+                    await self._wait_turn(key, item.turn)
+                # Одна DB-сессия на весь апдейт для всех сервисов
+                async with request_session():
+                    await item.application.process_update(item.update)
+                self.processed += 1
+            except Exception as e:
+                self.failed += 1
+                logger.error(f"❌ Error processing update {item.update.update_id}: {e}")
+            finally:
+                if item.turn:
+                    await self._release_turn(key, item.turn)
+                self._depth -= 1
+                if chat_queue:
+                    self._ready.put_nowait(key)
+                else:
+                    del self._pending[key]
+                if self._depth == 0:
+                    self._idle.set()
+
+    # -------- metrics ----------
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Queue depth, wait time and throughput counters"""
+        started = self.processed + self.failed
+        return {
+            "queue_depth": self._depth,
+            "max_queue_depth": self.max_depth,
+            "max_size": self.max_size,
+            "active_chats": len(self._pending),
+            "workers": len([task for task in self._tasks if not task.done()]),
+            "accepted": self.accepted,
+            "rejected": self.rejected,
+            "processed": self.processed,
+            "failed": self.failed,
+            "last_wait_ms": round(self.last_wait_ms, 2),
+            "avg_wait_ms": round(self._total_wait_ms / started, 2) if started else 0.0,
+            "max_wait_ms": round(self.max_wait_ms, 2),
+            "waited_for_other_worker": self.turn_waits,
+            "backend": self._backend.name,
+        }
+
+
+# Global queue instance
+update_queue = UpdateQueue()
+register_queue_depth("webhook_updates", lambda: update_queue._depth)
@@ -0,0 +1,384 @@
+"""Streaming file uploads for Mini App /submit.
+
+Files arrive as multipart/form-data (form fields as JSON in the `data` part,
+files as `files` parts) and are parsed chunk by chunk straight into
+SpooledTemporaryFile objects: small files stay in RAM, larger ones spill to
+disk. MAX_FILE_SIZE, ALLOWED_FILE_TYPES and UPLOAD_MAX_FILES are checked
+while streaming, so an oversized or forbidden file is rejected before the rest
+of the body is read.
+
+Old clients that still post JSON with base64 `files` are accepted too; each
+file is decoded once into the same spooled form.
+
+Each file is uploaded to Telegram once; the returned file_id is reused for the
+other admins (concurrently, via admin_fanout) instead of re-sending the bytes.
+When delivery runs later (outbox job), `store_uploads()` copies the files to
+OUTBOX_FILES_DIR and the job gets them back with `load_stored_uploads()`.
+
+Usage:
+    from bot.services.uploads import read_submission, send_uploads_to_admins, close_uploads
+
+    data, uploads = await read_submission(request)
+    try:
+        ...
+        await send_uploads_to_admins(bot, ADMIN_USERS, uploads, caption=...)
+    finally:
+        close_uploads(uploads)
+"""
+
+from __future__ import annotations
+
+import asyncio
+import base64
+import binascii
+import logging
+import os
+import shutil
+import tempfile
+import time
+import uuid
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+from telegram import InputFile
+
+from bot.config.settings import (
+    ALLOWED_FILE_TYPES,
+    MAX_FILE_SIZE,
+    OUTBOX_FILES_DIR,
+    UPLOAD_MAX_FIELD_SIZE,
+    UPLOAD_MAX_FILES,
+    UPLOAD_SPOOL_SIZE,
+)
+from bot.services.admin_fanout import FanoutResult, admin_fanout
+from bot.services.send_governor import SendPriority, send_governor
+from bot.utils.fast_json import loads, read_json
+
+try:
+    from python_multipart.multipart import MultipartParser, parse_options_header
+except ImportError:
+    try:
+        # python-multipart < 0.0.13
+        from multipart.multipart import MultipartParser, parse_options_header
+    except ImportError:
+        MultipartParser = parse_options_header = None
+
+logger = logging.getLogger(__name__)
+
+__all__ = [
+    "UploadError",
+    "SpooledUpload",
+    "StoredUpload",
+    "read_submission",
+    "send_uploads_to_admins",
+    "close_uploads",
+    "store_uploads",
+    "load_stored_uploads",
+    "discard_stored_uploads",
+]
+
+
+class UploadError(Exception):
+    """Upload rejected; status_code is the HTTP status to answer with"""
+
+    def __init__(self, message: str, status_code: int = 400):
+        super().__init__(message)
+        self.message = message
+        self.status_code = status_code
+
+
+@dataclass
+class SpooledUpload:
+    """One uploaded file backed by a spooled temp file"""
+    filename: str
+    content_type: Optional[str] = None
+    size: int = 0
+    file: Any = field(default_factory=lambda: tempfile.SpooledTemporaryFile(max_size=UPLOAD_SPOOL_SIZE))
+
+    def write(self, data: bytes) -> None:
+        if self.size + len(data) > MAX_FILE_SIZE:
+            raise UploadError(
+                f"Файл {self.filename} больше {MAX_FILE_SIZE // (1024 * 1024)}MB", status_code=413)
+        self.file.write(data)
+        self.size += len(data)
+
+    def read(self) -> bytes:
+        self.file.seek(0)
+        return self.file.read()
+
+    def close(self) -> None:
+        self.file.close()
+
+
+@dataclass
+class StoredUpload:
+    """Upload copied to OUTBOX_FILES_DIR for delivery by a background job"""
+    filename: str
+    path: str
+    size: int = 0
+    content_type: Optional[str] = None
+
+    def read(self) -> bytes:
+        with open(self.path, "rb") as f:
+            return f.read()
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"filename": self.filename, "path": self.path,
+                "size": self.size, "content_type": self.content_type}
+
+
+def _safe_filename(raw: str) -> str:
+    # браузеры/клиенты могут прислать путь – берём только имя
+    return os.path.basename(raw.replace("\\", "/")).strip()
+
+
+def _new_upload(filename: str, content_type: Optional[str], count: int) -> SpooledUpload:
+    if count >= UPLOAD_MAX_FILES:
+        raise UploadError(f"Максимум {UPLOAD_MAX_FILES} файлов", status_code=413)
+    extension = os.path.splitext(filename)[1].lower()
+    if extension not in ALLOWED_FILE_TYPES:
+        raise UploadError(f"Неподдерживаемый формат файла: {filename}", status_code=415)
+    return SpooledUpload(filename=filename, content_type=content_type)
+
+
+def close_uploads(uploads: Iterable[SpooledUpload]) -> None:
+    for upload in uploads:
+        upload.close()
+
+
+def _store(uploads: List[SpooledUpload], directory: str) -> List[Dict[str, Any]]:
+    os.makedirs(directory, exist_ok=True)
+    stored = []
+    for upload in uploads:
+        path = os.path.join(directory, f"{uuid.uuid4().hex}_{upload.filename}")
+        upload.file.seek(0)
+        with open(path, "wb") as f:
+            shutil.copyfileobj(upload.file, f)
+        stored.append(StoredUpload(upload.filename, path, upload.size, upload.content_type).to_dict())
+    return stored
+
+
+async def store_uploads(uploads: List[SpooledUpload], directory: str = OUTBOX_FILES_DIR) -> List[Dict[str, Any]]:
+    """Copy spooled uploads to disk; returns JSON-serializable descriptors"""
+    if not uploads:
+        return []
+    return await asyncio.to_thread(_store, uploads, directory)
+
+
+def load_stored_uploads(items: Iterable[Dict[str, Any]]) -> List[StoredUpload]:
+    return [StoredUpload(**item) for item in items]
+
+
+def discard_stored_uploads(items: Iterable[Dict[str, Any]]) -> None:
+    for item in items:
+        try:
+            os.remove(item["path"])
+        except OSError:
+            pass
+
+
+# -------- multipart ----------
+
+class _MultipartCollector:
+    """python-multipart callbacks that route parts into fields / spooled files"""
+
+    def __init__(self):
+        self.fields: Dict[str, str] = {}
+        self.uploads: List[SpooledUpload] = []
+        self._headers: Dict[bytes, bytes] = {}
+        self._header_field = b""
+        self._header_value = b""
+        self._name = ""
+        self._field_value: Optional[bytearray] = None
+        self._upload: Optional[SpooledUpload] = None
+
+    def callbacks(self) -> Dict[str, Callable]:
+        return {
+            "on_part_begin": self.on_part_begin,
+            "on_header_field": self.on_header_field,
+            "on_header_value": self.on_header_value,
+            "on_header_end": self.on_header_end,
+            "on_headers_finished": self.on_headers_finished,
+            "on_part_data": self.on_part_data,
+            "on_part_end": self.on_part_end,
+        }
+
+    def on_part_begin(self) -> None:
+        self._headers = {}
+        self._name = ""
+        self._field_value = None
+        self._upload = None
+
+    def on_header_field(self, data: bytes, start: int, end: int) -> None:
+        self._header_field += data[start:end]
+
+    def on_header_value(self, data: bytes, start: int, end: int) -> None:
+        self._header_value += data[start:end]
+
+    def on_header_end(self) -> None:
+        self._headers[self._header_field.lower()] = self._header_value
+        self._header_field = b""
+        self._header_value = b""
+
+    def on_headers_finished(self) -> None:
+        _disposition, options = parse_options_header(self._headers.get(b"content-disposition", b""))
+        self._name = options.get(b"name", b"").decode("utf-8", "replace")
+
+        if b"filename" not in options:
+            self._field_value = bytearray()
+            return
+
+        filename = _safe_filename(options[b"filename"].decode("utf-8", "replace"))
+        if not filename:
+            return  # пустой <input type="file"> – часть без файла
+        content_type = self._headers.get(b"content-type")
+        self._upload = _new_upload(
+            filename, content_type.decode("latin-1") if content_type else None, len(self.uploads))
+
+    def on_part_data(self, data: bytes, start: int, end: int) -> None:
+        if self._upload is not None:
+            self._upload.write(data[start:end])
+        elif self._field_value is not None:
+            if len(self._field_value) + (end - start) > UPLOAD_MAX_FIELD_SIZE:
+                raise UploadError(f"Поле {self._name} слишком большое", status_code=413)
+            self._field_value += data[start:end]
+
+    def on_part_end(self) -> None:
+        if self._upload is not None:
+            self._upload.file.seek(0)
+            self.uploads.append(self._upload)
+        elif self._field_value is not None:
+            self.fields[self._name] = self._field_value.decode("utf-8", "replace")
+        self._upload = None
+        self._field_value = None
+
+
+async def _read_multipart(request) -> Tuple[Dict[str, Any], List[SpooledUpload]]:
+    if MultipartParser is None:
+        raise UploadError("multipart uploads are not available (python-multipart not installed)", status_code=415)
+
+    _content_type, params = parse_options_header(request.headers.get("content-type", ""))
+    boundary = params.get(b"boundary")
+    if not boundary:
+        raise UploadError("Missing multipart boundary")
+
+    collector = _MultipartCollector()
+    parser = MultipartParser(boundary, collector.callbacks())
+    try:
+        async for chunk in request.stream():
+            parser.write(chunk)
+        parser.finalize()
+    except Exception as e:
+        close_uploads(collector.uploads)
+        if collector._upload is not None:
+            collector._upload.close()
+        if isinstance(e, UploadError):
+            raise
+        raise UploadError(f"Malformed multipart body: {e}") from e
+
+    fields = collector.fields
+    data: Dict[str, Any] = {}
+    if "data" in fields:
+        try:
+            data = loads(fields.pop("data"))
+        except ValueError as e:
+            close_uploads(collector.uploads)
+            raise UploadError(f"Invalid JSON in data field: {e}") from e
+    data.update(fields)  # простые поля формы, если клиент прислал их по одному
+    return data, collector.uploads
+
+
+# -------- legacy JSON/base64 ----------
+
+async def _read_json(request) -> Tuple[Dict[str, Any], List[SpooledUpload]]:
+    data = await read_json(request)
+    uploads: List[SpooledUpload] = []
+    try:
+        for i, file_data in enumerate(data.pop("files", None) or []):
+            encoded = file_data.get("data")
+            filename = _safe_filename(file_data.get("name") or f"file_{i + 1}")
+            if not encoded:
+                continue
+            upload = _new_upload(filename, file_data.get("type"), len(uploads))
+            uploads.append(upload)
+            # до декодирования: base64 длиннее данных в 4/3 раза
+            if len(encoded) * 3 // 4 > MAX_FILE_SIZE + 2:
+                raise UploadError(
+                    f"Файл {filename} больше {MAX_FILE_SIZE // (1024 * 1024)}MB", status_code=413)
+            try:
+                upload.write(base64.b64decode(encoded))
+            except (binascii.Error, ValueError) as e:
+                raise UploadError(f"Invalid base64 data for {filename}") from e
+            upload.file.seek(0)
+    except Exception:
+        close_uploads(uploads)
+        raise
+    return data, uploads
+
+
+async def read_submission(request) -> Tuple[Dict[str, Any], List[SpooledUpload]]:
+    """Form fields and spooled files of a /submit request (multipart or JSON)"""
+    content_type = request.headers.get("content-type", "")
+    if content_type.startswith("multipart/form-data"):
+        return await _read_multipart(request)
+    return await _read_json(request)
+
+
+# -------- delivery ----------
+
+async def send_uploads_to_admins(
+    bot,
+    admin_ids: Iterable[int],
+    uploads: List[Any],
+    caption: Callable[[Any], str],
+    parse_mode: Optional[str] = "Markdown",
+) -> FanoutResult:
+    """Send every upload (SpooledUpload / StoredUpload) to every admin.
+
+    Bytes go to Telegram once per file: the first successful send_document
+    returns a file_id, the remaining admins get that file_id concurrently via
+    admin_fanout. In the result `delivered` are the admins that got every
+    file, `failed` maps the others to the last error.
+    """
+    started = time.perf_counter()
+    admin_ids = list(admin_ids)
+    failed: Dict[int, str] = {}
+
+    for upload in uploads:
+        file_id: Optional[str] = None
+        remaining = list(admin_ids)
+        while remaining and file_id is None:
+            admin_id = remaining.pop(0)
+            try:
+                # bytes read only for this single upload (PTB reads file objects fully anyway)
+                message = await send_governor.send(admin_id, lambda: bot.send_document(
+                    chat_id=admin_id,
+                    document=InputFile(upload.read(), filename=upload.filename),
+                    caption=caption(upload),
+                    parse_mode=parse_mode,
+                ), SendPriority.ADMIN_ALERT)
+                file_id = message.document.file_id if message.document else None
+                logger.info(f"✅ Sent file {upload.filename} to admin {admin_id}")
+            except Exception as e:
+                failed[admin_id] = str(e)
+                logger.error(f"❌ Failed to send file {upload.filename} to admin {admin_id}: {e}")
+
+        if file_id is None or not remaining:
+            continue
+
+        result = await admin_fanout.run(
+            lambda chat_id, file_id=file_id, upload=upload: bot.send_document(
+                chat_id=chat_id,
+                document=file_id,
+                caption=caption(upload),
+                parse_mode=parse_mode,
+            ),
+            remaining,
+        )
+        failed.update(result.failed)
+
+    return FanoutResult(
+        delivered=[admin_id for admin_id in admin_ids if admin_id not in failed],
+        failed=failed,
+        elapsed_ms=(time.perf_counter() - started) * 1000,
+    )
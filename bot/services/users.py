@@ -0,0 +1,197 @@
+"""User upsert service – single place for get-or-create of `User` by tg_id.
+
+One `INSERT ... ON CONFLICT (tg_id) DO UPDATE ... RETURNING` round trip replaces
+the SELECT → INSERT → COMMIT → REFRESH sequence and is safe under concurrent
+updates for the same Telegram user. Resolved ids are kept in a bounded
+tg_id → users.id LRU, so hot paths that only need the primary key skip the
+database entirely.
+
+Usage:
+    from bot.services.users import user_service
+
+    user_pk = await user_service.get_user_id(tg_id)             # cached
+    user = await user_service.upsert_user(session, tg_id,
+                                          first_name="Иван",
+                                          defaults={"preferred_contact": "telegram"})
+"""
+
+from __future__ import annotations
+
+import logging
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+from sqlalchemy import event, func, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from bot.config.settings import USER_ID_CACHE_SIZE
+from bot.services.db import async_engine, session_scope, User
+from bot.utils.helpers import normalize_phone_e164
+
+logger = logging.getLogger(__name__)
+
+__all__ = ["UserService", "user_service"]
+
+_PENDING_KEY = "pending_user_ids"
+
+# Значения для новых пользователей, если вызывающий код их не передал
+DEFAULT_USER_VALUES = {
+    "first_name": "Пользователь",
+    "preferred_contact": "telegram",
+}
+
+
+def _dialect_insert():
+    """`insert` construct with ON CONFLICT support for the current database"""
+    if async_engine.dialect.name == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+    else:
+        from sqlalchemy.dialects.sqlite import insert
+    return insert
+
+
+class UserService:
+    """Atomic user upsert with tg_id → user.id LRU cache"""
+
+    def __init__(self, cache_size: int = USER_ID_CACHE_SIZE):
+        self.cache_size = cache_size
+        self._ids: "OrderedDict[int, int]" = OrderedDict()
+        self.cache_hits = 0
+        self.cache_misses = 0
+
+    # -------- cache ----------
+
+    def _remember(self, tg_id: int, user_pk: int) -> None:
+        self._ids[tg_id] = user_pk
+        self._ids.move_to_end(tg_id)
+        if len(self._ids) > self.cache_size:
+            self._ids.popitem(last=False)
+
+    def _remember_after_commit(self, session: AsyncSession, tg_id: int, user_pk: int) -> None:
+        # строка может быть ещё не закоммичена – кэшируем только после COMMIT
+        session.info.setdefault(_PENDING_KEY, {})[tg_id] = user_pk
+
+    def cached_user_id(self, tg_id: int) -> Optional[int]:
+        """users.id from cache without touching the database"""
+        user_pk = self._ids.get(tg_id)
+        if user_pk is not None:
+            self._ids.move_to_end(tg_id)
+        return user_pk
+
+    # -------- upsert ----------
+
+    async def _build_upsert(
+        self,
+        session: AsyncSession,
+        tg_id: int,
+        fields: Dict[str, Any],
+        defaults: Optional[Dict[str, Any]],
+    ):
+        # пустые значения не затирают то, что уже сохранено
+        updates = {key: value for key, value in fields.items() if value}
+        if "phone" in updates:
+            updates["phone_e164"] = normalize_phone_e164(updates["phone"])
+            if updates["phone_e164"]:
+                await self._release_phone(session, tg_id, updates["phone_e164"])
+        values = {**DEFAULT_USER_VALUES, **(defaults or {}), **updates, "tg_id": tg_id}
+
+        insert = _dialect_insert()
+        stmt = insert(User).values(**values)
+        return stmt.on_conflict_do_update(
+            index_elements=[User.tg_id],
+            # updated_at всегда обновляется, чтобы RETURNING отдал строку
+            set_={**{key: stmt.excluded[key] for key in updates}, "updated_at": func.now()},
+        )
+
+    async def _release_phone(self, session: AsyncSession, tg_id: int, phone_e164: str) -> None:
+        """Unique phone_e164: the number belongs to the user who saved it last"""
+        await session.execute(
+            update(User)
+            .where(User.phone_e164 == phone_e164, User.tg_id != tg_id)
+            .values(phone_e164=None)
+        )
+
+    async def find_by_phone(self, session: AsyncSession, phone: str) -> Optional[User]:
+        """User by phone number in any format (index seek on phone_e164)"""
+        phone_e164 = normalize_phone_e164(phone)
+        if not phone_e164:
+            return None
+        result = await session.execute(select(User).where(User.phone_e164 == phone_e164))
+        return result.scalar_one_or_none()
+
+    async def upsert_user(
+        self,
+        session: AsyncSession,
+        tg_id: int,
+        *,
+        defaults: Optional[Dict[str, Any]] = None,
+        **fields: Any,
+    ) -> User:
+        """Insert or update user by tg_id and return the ORM object.
+
+        `fields` overwrite stored values when non-empty; `defaults` are used
+        only when the row is created. The caller commits; the id is cached
+        once the transaction is committed.
+        """
+        stmt = await self._build_upsert(session, tg_id, fields, defaults)
+        result = await session.execute(stmt.returning(User), execution_options={"populate_existing": True})
+        user = result.scalar_one()
+        self._remember_after_commit(session, tg_id, user.id)
+        return user
+
+    async def upsert_user_id(
+        self,
+        session: AsyncSession,
+        tg_id: int,
+        *,
+        defaults: Optional[Dict[str, Any]] = None,
+        **fields: Any,
+    ) -> int:
+        """Same as upsert_user but returns only users.id"""
+        stmt = await self._build_upsert(session, tg_id, fields, defaults)
+        user_pk = (await session.execute(stmt.returning(User.id))).scalar_one()
+        self._remember_after_commit(session, tg_id, user_pk)
+        return user_pk
+
+    async def get_user_id(self, tg_id: int, session: Optional[AsyncSession] = None) -> int:
+        """users.id for tg_id, creating a minimal user if needed"""
+        user_pk = self.cached_user_id(tg_id)
+        if user_pk is not None:
+            self.cache_hits += 1
+            return user_pk
+
+        self.cache_misses += 1
+        if session is not None:
+            return await self.upsert_user_id(session, tg_id)
+
+        async with session_scope() as db_session:
+            user_pk = await self.upsert_user_id(db_session, tg_id)
+            await db_session.commit()
+            return user_pk
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Cache statistics"""
+        return {
+            "cached_ids": len(self._ids),
+            "cache_size": self.cache_size,
+            "cache_hits": self.cache_hits,
+            "cache_misses": self.cache_misses,
+        }
+
+
+# Global service instance
+user_service = UserService()
+
+
+# -------- cache population on commit ----------
+
+@event.listens_for(Session, "after_commit")
+def _remember_committed_ids(session):
+    for tg_id, user_pk in session.info.pop(_PENDING_KEY, {}).items():
+        user_service._remember(tg_id, user_pk)
+
+
+@event.listens_for(Session, "after_rollback")
+def _forget_uncommitted_ids(session):
+    session.info.pop(_PENDING_KEY, None)
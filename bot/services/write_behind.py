@@ -0,0 +1,238 @@
+"""Write-behind queue – batches fire-and-forget inserts off the reply path.
+
+Dialogue messages and analytics rows do not need to be durable before the bot
+answers, so instead of one session + COMMIT per message they are queued and
+written by a background task: one multi-row INSERT per table per batch, with
+a batch closed by size (WRITE_BEHIND_BATCH_SIZE) or time window
+(WRITE_BEHIND_FLUSH_INTERVAL). A full queue applies backpressure instead of
+dropping rows. A batch that fails is retried once, then written group by
+group and finally row by row, so only the rows that really fail are lost.
+`drain()` flushes everything on shutdown.
+
+Usage:
+    from bot.services.write_behind import write_behind
+
+    await write_behind.insert(DialogueMessage, {"session_id": 1, "role": "user", "content": "..."})
+    await write_behind.execute(UPDATE_STMT, {"session_pk": 1, ...})   # executemany per batch
+    await write_behind.drain()
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import time
+from typing import Any, Dict, List, NamedTuple, Optional
+
+from sqlalchemy import Table
+
+from bot.config.settings import (
+    WRITE_BEHIND_BATCH_SIZE,
+    WRITE_BEHIND_FLUSH_INTERVAL,
+    WRITE_BEHIND_MAX_QUEUE,
+)
+from bot.services.db import async_engine
+
+logger = logging.getLogger(__name__)
+
+__all__ = ["WriteBehindQueue", "write_behind"]
+
+
+class _Write(NamedTuple):
+    kind: str  # insert / execute
+    target: Any  # Table for insert, executable statement for execute
+    params: Dict[str, Any]
+
+    @property
+    def group_key(self):
+        if self.kind == "insert":
+            # multi-row VALUES требует одинаковый набор колонок
+            return ("insert", self.target, tuple(sorted(self.params)))
+        return ("execute", self.target)
+
+
+class WriteBehindQueue:
+    """Background batching writer with queue depth / flush latency metrics"""
+
+    def __init__(
+        self,
+        batch_size: int = WRITE_BEHIND_BATCH_SIZE,
+        flush_interval: float = WRITE_BEHIND_FLUSH_INTERVAL,
+        max_queue: int = WRITE_BEHIND_MAX_QUEUE,
+    ):
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_queue = max_queue
+
+        self._queue: Optional[asyncio.Queue] = None
+        self._worker: Optional[asyncio.Task] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+        # metrics
+        self.enqueued = 0
+        self.rows_written = 0
+        self.rows_failed = 0
+        self.batches = 0
+        self.max_depth = 0
+        self.last_flush_ms = 0.0
+        self.max_flush_ms = 0.0
+        self._total_flush_ms = 0.0
+
+    # -------- lifecycle ----------
+
+    def _ensure_started(self) -> asyncio.Queue:
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            # новый event loop (перезапуск) – старая очередь к нему не привязана
+            self._queue = asyncio.Queue(maxsize=self.max_queue)
+            self._worker = None
+            self._loop = loop
+        if self._worker is None or self._worker.done():
+            self._worker = loop.create_task(self._run(), name="write-behind")
+        return self._queue
+
+    async def drain(self, timeout: float = 10.0) -> None:
+        """Flush queued rows and stop the worker (call on shutdown)"""
+        if self._queue is None or self._loop is not asyncio.get_running_loop():
+            return
+
+        pending = self._queue.qsize()
+        try:
+            await asyncio.wait_for(self._queue.join(), timeout)
+        except asyncio.TimeoutError:
+            logger.warning(f"⚠️ Write-behind drain timed out, {self._queue.qsize()} rows not written")
+
+        if self._worker and not self._worker.done():
+            self._worker.cancel()
+            try:
+                await self._worker
+            except asyncio.CancelledError:
+                pass
+        self._worker = None
+        logger.info(f"✅ Write-behind drained ({pending} queued rows)")
+
+    # -------- enqueue ----------
+
+    async def insert(self, model_or_table: Any, values: Dict[str, Any]) -> None:
+        """Queue one row for a multi-row INSERT into the model's table"""
+        table = model_or_table if isinstance(model_or_table, Table) else model_or_table.__table__
+        await self._put(_Write("insert", table, values))
+
+    async def execute(self, statement: Any, params: Dict[str, Any]) -> None:
+        """Queue parameters for a prepared statement (executemany per batch).
+
+        Pass the same statement object every time so rows can be grouped.
+        """
+        await self._put(_Write("execute", statement, params))
+
+    async def _put(self, write: _Write) -> None:
+        queue = self._ensure_started()
+        # при переполнении ждём место, а не теряем строки
+        await queue.put(write)
+        self.enqueued += 1
+        self.max_depth = max(self.max_depth, queue.qsize())
+
+    # -------- worker ----------
+
+    async def _next_batch(self, queue: asyncio.Queue) -> List[_Write]:
+        batch = [await queue.get()]
+        deadline = time.monotonic() + self.flush_interval
+
+        while len(batch) < self.batch_size:
+            try:
+                batch.append(queue.get_nowait())
+                continue
+            except asyncio.QueueEmpty:
+                pass
+
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(queue.get(), remaining))
+            except asyncio.TimeoutError:
+                break
+
+        return batch
+
+    async def _run(self) -> None:
+        queue = self._queue
+        while True:
+            batch = await self._next_batch(queue)
+            try:
+                await self._flush(batch)
+            finally:
+                for _ in batch:
+                    queue.task_done()
+
+    async def _write_groups(self, groups: List[List[_Write]]) -> None:
+        """All groups in one transaction"""
+        async with async_engine.begin() as conn:
+            for writes in groups:
+                first = writes[0]
+                rows = [write.params for write in writes]
+                if first.kind == "insert":
+                    await conn.execute(first.target.insert().values(rows))
+                else:
+                    await conn.execute(first.target, rows)
+
+    async def _flush(self, batch: List[_Write]) -> None:
+        grouped: Dict[Any, List[_Write]] = {}
+        for write in batch:
+            grouped.setdefault(write.group_key, []).append(write)
+        groups = list(grouped.values())
+
+        started = time.perf_counter()
+        try:
+            # весь батч; при ошибке ещё раз (обрыв соединения, deadlock и т.п.)
+            for attempt in range(2):
+                try:
+                    await self._write_groups(groups)
+                    self.rows_written += len(batch)
+                    return
+                except Exception as e:
+                    logger.warning(f"⚠️ Write-behind flush of {len(batch)} rows failed "
+                                   f"(attempt {attempt + 1}): {e}")
+
+            # одна плохая строка не должна терять остальные: по группам, затем по строкам
+            for writes in groups:
+                try:
+                    await self._write_groups([writes])
+                    self.rows_written += len(writes)
+                    continue
+                except Exception:
+                    pass
+                for write in writes:
+                    try:
+                        await self._write_groups([[write]])
+                        self.rows_written += 1
+                    except Exception as e:
+                        self.rows_failed += 1
+                        logger.error(f"❌ Write-behind row lost ({write.kind} {write.params}): {e}")
+        finally:
+            elapsed_ms = (time.perf_counter() - started) * 1000
+            self.batches += 1
+            self.last_flush_ms = elapsed_ms
+            self.max_flush_ms = max(self.max_flush_ms, elapsed_ms)
+            self._total_flush_ms += elapsed_ms
+
+    # -------- metrics ----------
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Queue depth and flush latency"""
+        return {
+            "queue_depth": self._queue.qsize() if self._queue else 0,
+            "max_queue_depth": self.max_depth,
+            "enqueued": self.enqueued,
+            "rows_written": self.rows_written,
+            "rows_failed": self.rows_failed,
+            "batches": self.batches,
+            "last_flush_ms": round(self.last_flush_ms, 2),
+            "avg_flush_ms": round(self._total_flush_ms / self.batches, 2) if self.batches else 0.0,
+            "max_flush_ms": round(self.max_flush_ms, 2),
+            "running": bool(self._worker and not self._worker.done()),
+        }
+
+
+# Global queue instance
+write_behind = WriteBehindQueue()
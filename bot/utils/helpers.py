@@ -29,6 +29,27 @@ def format_phone_number(phone: str) -> str:
     
     return phone  # Return original if can't format
 
+def normalize_phone_e164(phone: Optional[str]) -> Optional[str]:
+    """Normalize phone number to E.164 (+79991234567) for storage and lookup"""
+    if not phone:
+        return None
+
+    digits = re.sub(r'\D', '', phone)
+    # 9991234567 → 79991234567 (same rule as validate_phone)
+    if len(digits) == 10 and digits.startswith('9'):
+        digits = '7' + digits
+
+    # Russian numbers: reuse display formatting (8 → +7), then keep digits only
+    formatted = format_phone_number(digits)
+    if formatted != digits:
+        return '+' + re.sub(r'\D', '', formatted)
+
+    # Other countries: only when given in international form
+    if phone.strip().startswith('+') and 8 <= len(digits) <= 15:
+        return '+' + digits
+
+    return None
+
 def validate_email(email: str) -> bool:
     """Validate email address"""
     pattern = r'^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}$'
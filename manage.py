@@ -10,6 +10,8 @@
 """
 
 import asyncio
+import contextlib
+import json
 import os
 import sys
 import click
@@ -146,6 +148,247 @@ def migration_status():
         click.echo(f"❌ Migration check failed: {e}")
 
 
+@cli.command()
+@click.option('--seed-rows', default=1000, show_default=True,
+              help='Insert N synthetic rows before EXPLAIN (rolled back)')
+@click.option('--allow-skipped', is_flag=True,
+              help='Do not fail on queries whose tables are missing')
+@click.option('--verbose', is_flag=True, help='Print full query plans')
+def check_query_plans(seed_rows, allow_skipped, verbose):
+    """🔎 EXPLAIN hot queries, fail on sequential scans"""
+    click.echo("🔎 Query plan regression check")
+    click.echo("=" * 30)
+
+    if not asyncio.run(_check_query_plans_async(seed_rows, allow_skipped, verbose)):
+        sys.exit(1)
+
+
+async def _check_query_plans_async(seed_rows, allow_skipped, verbose):
+    """Query plan check implementation"""
+    from bot.services.query_plans import check_hot_query_plans
+
+    checks = await check_hot_query_plans(seed_rows=seed_rows)
+
+    for check in checks:
+        if check.status == "ok":
+            click.echo(f"✅ {check.name}")
+        elif check.status == "skipped":
+            click.echo(f"⏭️  {check.name}: {'; '.join(check.plan)}")
+        else:
+            click.echo(
+                f"❌ {check.name}: sequential scan on {', '.join(check.seq_scans)}")
+
+        if check.status != "skipped" and (verbose or check.failed):
+            for line in check.plan:
+                click.echo(f"    {line}")
+
+    failed = [check.name for check in checks if check.failed]
+    skipped = [check.name for check in checks if check.status == "skipped"]
+    if failed:
+        click.echo(f"\n❌ {len(failed)} hot queries without index: {', '.join(failed)}")
+    if skipped and not allow_skipped:
+        # непроверенный запрос – не «зелёный» результат
+        click.echo(f"\n❌ {len(skipped)} hot queries not checked: {', '.join(skipped)} "
+                   f"(use --allow-skipped to ignore)")
+    if failed or (skipped and not allow_skipped):
+        return False
+
+    if skipped:
+        click.echo(f"\n✅ Checked hot queries use indexes ({len(skipped)} skipped)")
+    else:
+        click.echo("\n✅ All hot queries use indexes")
+    return True
+
+
+@cli.command()
+@click.option('--format', 'fmt', type=click.Choice(['csv', 'jsonl']), default='csv',
+              show_default=True, help='Output format')
+@click.option('--output', '-o', type=click.Path(dir_okay=False), default=None,
+              help='Output file (default: stdout)')
+@click.option('--batch-size', default=None, type=int,
+              help='Rows per server-side cursor fetch (default: EXPORT_BATCH_SIZE)')
+def export_applications(fmt, output, batch_size):
+    """📤 Stream all applications with user and category to CSV/JSONL"""
+    asyncio.run(_export_applications_async(fmt, output, batch_size))
+
+
+async def _export_applications_async(fmt, output, batch_size):
+    """Streaming export implementation"""
+    # модули БД печатают баннеры при импорте – не смешиваем их с выгрузкой
+    with contextlib.redirect_stdout(sys.stderr):
+        from bot.config.settings import EXPORT_BATCH_SIZE
+        from bot.services.exports import iter_applications_export
+
+    chunks = iter_applications_export(fmt, batch_size or EXPORT_BATCH_SIZE)
+    if output is None:
+        async for chunk in chunks:
+            sys.stdout.write(chunk)
+        sys.stdout.flush()
+        return
+
+    with open(output, 'w', encoding='utf-8', newline='') as f:
+        async for chunk in chunks:
+            f.write(chunk)
+    click.echo(f"✅ Export written to {output}", err=True)
+
+
+@cli.command()
+@click.option('--output', '-o', type=click.Path(file_okay=False), default=None,
+              help='Build directory (default: STATIC_BUILD_DIR)')
+@click.argument('trees', nargs=-1)
+def build_assets(output, trees):
+    """📦 Bundle, minify, hash and precompress Mini App assets"""
+    from bot.config.settings import STATIC_BUILD_DIR
+    from bot.services.static_assets import build_assets as build_tree
+
+    root = os.path.dirname(os.path.abspath(__file__))
+    # по умолчанию только webapp/ – он смонтирован в /webapp и /admin
+    for tree in trees or ('webapp',):
+        report = build_tree(os.path.join(root, tree), output or os.path.join(root, STATIC_BUILD_DIR))
+        click.echo(f"✅ {tree} → {report.output_dir}: {len(report.manifest)} hashed assets")
+        click.echo(f"   JS/CSS {report.source_bytes:,} → {report.minified_bytes:,} bytes minified, "
+                   f"gzip {report.gzip_bytes:,}, brotli {report.brotli_bytes:,} (all text files)")
+
+
+def _sample_updates():
+    """Telegram updates shaped like the ones the webhook actually receives"""
+    user = {"id": 123456789, "is_bot": False, "first_name": "Анна", "last_name": "Петрова",
+            "username": "anna_petrova", "language_code": "ru"}
+    chat = {"id": 123456789, "first_name": "Анна", "last_name": "Петрова",
+            "username": "anna_petrova", "type": "private"}
+    text = ("Здравствуйте! Подскажите, пожалуйста, как оспорить штраф ГИБДД, "
+            "если постановление пришло спустя два месяца? /start consult")
+    return {
+        "message": {
+            "update_id": 900000001,
+            "message": {
+                "message_id": 4211, "from": user, "chat": chat, "date": 1735689600,
+                "text": text,
+                "entities": [{"offset": len(text) - 14, "length": 6, "type": "bot_command"}],
+            },
+        },
+        "callback_query": {
+            "update_id": 900000002,
+            "callback_query": {
+                "id": "5298473829384729384", "from": user, "chat_instance": "-7283947293847293847",
+                "data": "category_7",
+                "message": {
+                    "message_id": 4212, "from": {"id": 7000000001, "is_bot": True, "first_name": "Юрист",
+                                                 "username": "legal_center_bot"},
+                    "chat": chat, "date": 1735689660, "text": "Выберите категорию:",
+                    "reply_markup": {"inline_keyboard": [
+                        [{"text": f"Категория {i}", "callback_data": f"category_{i}"}] for i in range(12)]},
+                },
+            },
+        },
+        "web_app_data": {
+            "update_id": 900000003,
+            "message": {
+                "message_id": 4213, "from": user, "chat": chat, "date": 1735689720,
+                "web_app_data": {
+                    "button_text": "📝 Подать заявку",
+                    "data": json.dumps({
+                        "category_id": 7, "category_name": "Автоправо", "name": "Анна Петрова",
+                        "phone": "+79991234567", "email": "anna@example.com", "contact_method": "telegram",
+                        "description": "Оспаривание штрафа ГИБДД. " * 20,
+                    }, ensure_ascii=False),
+                },
+            },
+        },
+        "channel_forward": {
+            "update_id": 900000004,
+            "message": {
+                "message_id": 4214, "from": user, "chat": chat, "date": 1735689780,
+                "forward_origin": {"type": "channel", "date": 1735600000, "message_id": 987,
+                                   "chat": {"id": -1001234567890, "title": "Юридические новости",
+                                            "username": "legal_news", "type": "channel"}},
+                "text": "Разбор изменений в Гражданском кодексе. " * 60,
+                "entities": [{"offset": i * 41, "length": 10, "type": "bold"} for i in range(60)],
+            },
+        },
+    }
+
+
+@cli.command()
+@click.option('--seconds', default=0.5, show_default=True, help='Time budget per measurement')
+def bench_json(seconds):
+    """⚡ Compare stdlib json and orjson on Telegram update payloads"""
+    import time
+    from bot.utils import fast_json
+
+    def ops_per_second(func):
+        count, started = 0, time.perf_counter()
+        deadline = started + seconds
+        while time.perf_counter() < deadline:
+            for _ in range(100):
+                func()
+            count += 100
+        return count / (time.perf_counter() - started)
+
+    def stdlib_dumps(obj):
+        return json.dumps(obj, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+    try:
+        from telegram import Update
+    except ImportError:
+        Update = None
+
+    click.echo(f"⚡ JSON benchmark (orjson {'installed' if fast_json.HAS_ORJSON else 'NOT installed'})")
+    click.echo(f"{'payload':<16}{'bytes':>8}  {'op':<14}{'json ops/s':>12}{'fast ops/s':>12}{'speedup':>9}")
+    for name, update in _sample_updates().items():
+        body = stdlib_dumps(update)
+        rows = [
+            ("loads", lambda: json.loads(body), lambda: fast_json.loads(body)),
+            ("dumps", lambda: stdlib_dumps(update), lambda: fast_json.dumps(update)),
+        ]
+        if Update is not None:
+            # весь путь вебхука: разбор тела + Update.de_json
+            rows.append(("loads+de_json",
+                         lambda: Update.de_json(json.loads(body), None),
+                         lambda: Update.de_json(fast_json.loads(body), None)))
+        for op, baseline, fast in rows:
+            base_rate, fast_rate = ops_per_second(baseline), ops_per_second(fast)
+            click.echo(f"{name:<16}{len(body):>8}  {op:<14}{base_rate:>12,.0f}{fast_rate:>12,.0f}"
+                       f"{fast_rate / base_rate:>8.1f}x")
+
+
+@cli.command()
+@click.option('--users', default=2_000_000, show_default=True, help='Distinct user ids to simulate')
+@click.option('--users-per-second', default=5_000, show_default=True,
+              help='New users per simulated second (live ≈ this × window / limit)')
+def bench_rate_limiter(users, users_per_second):
+    """🚦 Show flat rate limiter memory over millions of distinct users"""
+    import time
+    import tracemalloc
+    from bot.config.settings import RATE_LIMIT_WINDOW
+    from bot.core.rate_limiter import RateLimiter
+    from bot.services.state_backend import MemoryStateBackend
+
+    now = [0.0]
+    tracemalloc.start()
+    limiter = RateLimiter(backend=MemoryStateBackend(), clock=lambda: now[0])
+    baseline = tracemalloc.get_traced_memory()[0]
+
+    click.echo(f"🚦 GCRA limiter, window {RATE_LIMIT_WINDOW}s, {users_per_second:,} new users/s")
+    click.echo(f"{'users seen':>12}{'live entries':>14}{'evicted':>12}{'memory MB':>12}{'ops/s':>12}")
+    checkpoint = max(users // 10, 1)
+    started = time.perf_counter()
+    for user_id in range(1, users + 1):
+        if user_id % users_per_second == 0:
+            now[0] += 1.0
+        if not limiter.is_rate_limited(user_id):
+            limiter.record_request(user_id)
+        if user_id % checkpoint == 0:
+            memory_mb = (tracemalloc.get_traced_memory()[0] - baseline) / 1024 / 1024
+            rate = user_id / (time.perf_counter() - started)
+            stats = limiter.get_stats()
+            click.echo(f"{user_id:>12,}{stats['active_users']:>14,}{stats['evicted_users']:>12,}"
+                       f"{memory_mb:>12.1f}{rate:>12,.0f}")
+    tracemalloc.stop()
+    click.echo("(ops/s measured under tracemalloc; the old per-user timestamp lists "
+               f"would have kept all {users:,} users)")
+
+
 @cli.command()
 def diagnostics():
     """🔍 Run production diagnostics"""
@@ -73,13 +73,32 @@ def start_telegram_bot():
         traceback.print_exc()
 
 
+def configure_workers():
+    """Число uvicorn воркеров (WEB_CONCURRENCY) и общее состояние для них"""
+    workers = max(1, int(os.getenv("WEB_CONCURRENCY", "1")))
+    if workers == 1:
+        return 1
+
+    # каждый воркер поднимает свой Application и принимает webhook, поэтому
+    # rate limits, память диалогов, очереди постов, update_id и очередность
+    # апдейтов чата должны быть общими
+    backend = os.environ.setdefault("STATE_BACKEND", "sqlite").lower()
+    if backend == "memory":
+        print(f"⚠️ WEB_CONCURRENCY={workers} needs a shared STATE_BACKEND, "
+              "STATE_BACKEND=memory set – falling back to 1 worker")
+        return 1
+
+    print(f"🧩 {workers} workers, shared state: {backend} "
+          f"({os.getenv('STATE_DB_PATH', 'shared_state.db')})")
+    return workers
+
+
 def start_web_server():
     """Запуск FastAPI Web Server"""
     try:
         print("\n🌐 Starting Web Server...")
 
-        # Import FastAPI app from app.py
-        from app import app
+        workers = configure_workers()
 
         # Get port from environment (Railway sets this)
         port = int(os.getenv("PORT", 8000))
@@ -87,11 +106,19 @@ def start_web_server():
 
         print(f"🌐 Web Server starting on {host}:{port}")
 
+        if workers > 1:
+            # каждый воркер импортирует app.py сам
+            app = "app:app"
+        else:
+            # Import FastAPI app from app.py
+            from app import app
+
         # Start uvicorn server
         uvicorn.run(
             app,
             host=host,
             port=port,
+            workers=workers,
             log_level="info",
             access_log=True,
             loop="asyncio"
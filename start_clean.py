@@ -10,8 +10,7 @@ import asyncio
 import threading
 import uvicorn
 from fastapi import FastAPI, Request
-from fastapi.responses import JSONResponse
-from fastapi.staticfiles import StaticFiles
+from bot.utils.fast_json import FastJSONResponse, read_json
 import logging
 
 # BLOCK any ai_enhanced imports
@@ -27,14 +26,20 @@ print("🚫 AI Enhanced imports BLOCKED")
 print("🤖 Starting CLEAN bot with OpenAI only...")
 
 # Create simple FastAPI app for health check and webhooks
-app = FastAPI(title="Clean Legal Bot")
+app = FastAPI(title="Clean Legal Bot", default_response_class=FastJSONResponse)
 
 # Mount static files for webapp
-app.mount("/webapp", StaticFiles(directory="webapp", html=True), name="webapp")
+from bot.services.static_assets import webapp_static_files
+app.mount("/webapp", webapp_static_files("webapp"), name="webapp")
 
 @app.get("/health")
 async def health_check():
-    return JSONResponse({"status": "healthy", "ai_enhanced": "blocked"})
+    return FastJSONResponse({"status": "healthy", "ai_enhanced": "blocked"})
+
+@app.get("/health/live")
+async def health_live():
+    """Liveness probe: the process serves requests, no I/O"""
+    return FastJSONResponse({"status": "alive"})
 
 @app.get("/test")
 async def test_page():
@@ -64,13 +69,13 @@ async def clean_app():
 async def submit_application(request: Request):
     """Handle application submission from Mini App"""
     try:
-        data = await request.json()
+        data = await read_json(request)
         print(f"📋 Application received: {data}")
         
         # Process application data
-        from bot.services.db import async_sessionmaker, Application as AppModel, User, Category
+        from bot.services.db import async_sessionmaker, Application as AppModel
+        from bot.services.users import user_service
         from datetime import datetime
-        from sqlalchemy import select
         
         # Create or get user (we don't have telegram user, so create temporary)
         async with async_sessionmaker() as session:
@@ -81,24 +86,22 @@ async def submit_application(request: Request):
             # Get or create category
             category_id = data.get('category_id', 1)
             
-            # Create temporary user if not exists
-            user_result = await session.execute(select(User).where(User.phone == phone))
-            user = user_result.scalar_one_or_none()
+            # Existing user by phone in any format (phone_e164), profile left as is
+            user = await user_service.find_by_phone(session, phone)
             
             if not user:
                 # Generate unique negative tg_id for webapp users
                 import random
                 webapp_tg_id = -random.randint(1000000, 9999999)
                 
-                user = User(
-                    tg_id=webapp_tg_id,  # Negative ID for webapp users
+                user = await user_service.upsert_user(
+                    session,
+                    webapp_tg_id,  # Negative ID for webapp users
                     first_name=name,
                     phone=phone,
                     email=data.get('email', ''),
                     preferred_contact=data.get('contact_method', 'phone')
                 )
-                session.add(user)
-                await session.flush()  # Get user.id
             
             # Create application record
             application = AppModel(
@@ -127,7 +130,7 @@ async def submit_application(request: Request):
 async def notify_client(request: Request):
     """Send notification to admin about new application"""
     try:
-        data = await request.json()
+        data = await read_json(request)
         print(f"📨 Admin notification request: {data}")
         
         # TODO: Send telegram message to admins
@@ -175,9 +178,16 @@ async def webhook_handler(token: str, request: Request):
     if bot_instance and bot_instance.application:
         try:
             from telegram import Update
-            update_dict = await request.json()
+            update_dict = await read_json(request)
+            from bot.services.db import request_session
+            from bot.services.update_dedup import update_dedup
             update = Update.de_json(update_dict, bot_instance.application.bot)
-            await bot_instance.application.process_update(update)
+            # Повторная доставка того же апдейта – не обрабатываем второй раз
+            if not await update_dedup.accept(update.update_id):
+                return {"status": "duplicate"}
+            # Одна DB-сессия на весь апдейт для всех сервисов
+            async with request_session():
+                await bot_instance.application.process_update(update)
             return {"status": "ok"}
         except Exception as e:
             print(f"❌ Webhook error: {e}")
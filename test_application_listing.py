@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+"""
+🧪 Keyset pagination of admin application listing (bot.services.application_listing)
+"""
+
+import asyncio
+import os
+import tempfile
+from datetime import datetime, timedelta
+
+# отдельная временная БД – до импорта bot.services.db
+TEST_DB_PATH = os.path.join(tempfile.gettempdir(), "test_application_listing.db")
+os.environ.pop("DATABASE_PRIVATE_URL", None)
+os.environ["DATABASE_URL"] = f"sqlite+aiosqlite:///{TEST_DB_PATH}"
+
+import pytest
+from sqlalchemy import delete
+
+from bot.services.application_listing import decode_cursor, encode_cursor, list_applications
+from bot.services import db
+from bot.services.db import Application, Base, Category, User, async_engine, async_sessionmaker
+
+if not db.DATABASE_URL.endswith(TEST_DB_PATH):
+    # bot.services.db уже импортирован другим модулем с рабочей БД – её не трогаем
+    pytest.skip(f"database already configured: {db.DATABASE_URL[:30]}...", allow_module_level=True)
+
+SAME_TIME = datetime(2026, 1, 15, 12, 0, 0)
+
+
+async def _seed():
+    async with async_engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+        for model in (Application, User, Category):
+            await conn.execute(delete(model))
+
+    async with async_sessionmaker() as session:
+        session.add(Category(id=1, name="Семейное право"))
+        user = User(tg_id=1001, first_name="Иван", last_name="Петров", phone="+79001112233")
+        session.add(user)
+        await session.flush()
+
+        # 1..5 – одинаковый created_at (порядок только по id), 6..7 – раньше
+        for application_id in range(1, 6):
+            session.add(Application(id=application_id, user_id=user.id, category_id=1,
+                                    status="new", created_at=SAME_TIME))
+        for application_id, minutes in ((6, 10), (7, 20)):
+            session.add(Application(id=application_id, user_id=user.id, category_id=1,
+                                    status="new", created_at=SAME_TIME - timedelta(minutes=minutes)))
+        await session.commit()
+
+
+@pytest.fixture(scope="module", autouse=True)
+def seeded_db():
+    asyncio.run(_seed())
+    yield
+    asyncio.run(async_engine.dispose())
+    if os.path.exists(TEST_DB_PATH):
+        os.remove(TEST_DB_PATH)
+
+
+def _all_pages(limit, **filters):
+    async def collect():
+        pages = []
+        cursor = None
+        while True:
+            page = await list_applications(cursor=cursor, limit=limit, **filters)
+            pages.append(page)
+            if page.next_cursor is None:
+                return pages
+            cursor = page.next_cursor
+    return asyncio.run(collect())
+
+
+def test_equal_created_at_is_ordered_by_id():
+    pages = _all_pages(limit=2)
+    ids = [item["id"] for page in pages for item in page.items]
+
+    # одинаковый created_at не теряет и не повторяет строк на границе страниц
+    assert ids == [5, 4, 3, 2, 1, 6, 7]
+    assert [len(page.items) for page in pages] == [2, 2, 2, 1]
+
+
+def test_last_page_has_no_next_cursor():
+    # ровно 7 строк при limit=7: «лишней» строки нет – курсора тоже
+    page = asyncio.run(list_applications(limit=7))
+    assert len(page.items) == 7
+    assert page.next_cursor is None
+
+    pages = _all_pages(limit=3)
+    assert all(page.next_cursor for page in pages[:-1])
+    assert pages[-1].next_cursor is None
+
+
+def test_cursor_round_trip():
+    cursor = encode_cursor(SAME_TIME, 3)
+    assert decode_cursor(cursor) == (SAME_TIME, 3)
+
+    page = asyncio.run(list_applications(cursor=cursor, limit=10))
+    assert [item["id"] for item in page.items] == [2, 1, 6, 7]
+
+
+@pytest.mark.parametrize("cursor", [
+    "not-a-cursor",
+    "e30",                                  # {}
+    encode_cursor(SAME_TIME, 1)[:-3],       # обрезанный
+    "WyJ5ZXN0ZXJkYXkiLCAxXQ",               # ["yesterday", 1]
+])
+def test_malformed_cursor_is_rejected(cursor):
+    with pytest.raises(ValueError):
+        decode_cursor(cursor)
+    with pytest.raises(ValueError):
+        asyncio.run(list_applications(cursor=cursor))
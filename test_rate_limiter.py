@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+"""
+🧪 GCRA rate limiter: burst, rejection and recovery after the emission interval
+"""
+
+import pytest
+
+from bot.core.rate_limiter import RateLimiter
+from bot.services.state_backend import MemoryStateBackend, SQLiteStateBackend
+
+
+class FakeClock:
+    def __init__(self, now: float = 1_000_000.0):
+        self.now = now
+
+    def __call__(self) -> float:
+        return self.now
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def backend(request, tmp_path):
+    if request.param == "memory":
+        return MemoryStateBackend()
+    return SQLiteStateBackend(str(tmp_path / "state.db"))
+
+
+def request_allowed(limiter: RateLimiter, user_id: int) -> bool:
+    if limiter.is_rate_limited(user_id):
+        return False
+    limiter.record_request(user_id)
+    return True
+
+
+def test_burst_then_reject_then_recover(backend):
+    clock = FakeClock()
+    limiter = RateLimiter(requests=10, window=60, backend=backend, clock=clock)
+    assert limiter.emission_interval == 6
+
+    # 10 запросов подряд проходят
+    assert [request_allowed(limiter, 1) for _ in range(10)] == [True] * 10
+    assert limiter.get_user_request_count(1) == 10
+
+    # 11-й отклонён, повторные попытки не продлевают блокировку
+    assert not request_allowed(limiter, 1)
+    assert not request_allowed(limiter, 1)
+    assert limiter.limited == 2
+
+    # чуть меньше интервала – всё ещё лимит
+    clock.now += limiter.emission_interval - 0.001
+    assert not request_allowed(limiter, 1)
+
+    # через интервал эмиссии освобождается ровно одно место
+    clock.now += 0.001
+    assert request_allowed(limiter, 1)
+    assert not request_allowed(limiter, 1)
+
+
+def test_users_are_independent(backend):
+    clock = FakeClock()
+    limiter = RateLimiter(requests=10, window=60, backend=backend, clock=clock)
+
+    for _ in range(10):
+        request_allowed(limiter, 1)
+
+    assert not request_allowed(limiter, 1)
+    assert request_allowed(limiter, 2)
+
+
+def test_full_window_restores_burst(backend):
+    clock = FakeClock()
+    limiter = RateLimiter(requests=10, window=60, backend=backend, clock=clock)
+
+    for _ in range(10):
+        request_allowed(limiter, 1)
+
+    clock.now += 60
+    assert limiter.get_user_request_count(1) == 0
+    assert [request_allowed(limiter, 1) for _ in range(10)] == [True] * 10
+    assert not request_allowed(limiter, 1)
+
+
+def test_blocked_user_is_always_limited(backend):
+    limiter = RateLimiter(requests=10, window=60, backend=backend, clock=FakeClock())
+
+    limiter.block_user(7)
+    assert limiter.is_rate_limited(7)
+
+    limiter.unblock_user(7)
+    assert request_allowed(limiter, 7)
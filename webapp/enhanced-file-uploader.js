@@ -7,6 +7,9 @@
  * - Валидация типов и размеров
  * - Сжатие изображений
  * - Пакетная загрузка
+ *
+ * Файлы отправляются на /submit как multipart/form-data (см. appendToFormData),
+ * без base64 – сервер принимает их потоково.
  */
 
 class EnhancedFileUploader {
@@ -199,7 +202,7 @@ class EnhancedFileUploader {
     }
 
     /**
-     * Обработка файла (сжатие изображений, преобразование в base64)
+     * Обработка файла (сжатие изображений)
      */
     async processFile(file) {
         const fileData = {
@@ -209,7 +212,7 @@ class EnhancedFileUploader {
             type: file.type,
             extension: file.name.split('.').pop().toLowerCase(),
             originalFile: file,
-            data: null,
+            blob: file,
             thumbnail: null,
             uploadProgress: 0
         };
@@ -221,13 +224,9 @@ class EnhancedFileUploader {
             // Сжимаем если размер больше 1MB
             if (file.size > 1024 * 1024) {
                 const compressedFile = await this.compressImage(file);
-                fileData.data = await this.fileToBase64(compressedFile);
+                fileData.blob = compressedFile;
                 fileData.size = compressedFile.size;
-            } else {
-                fileData.data = await this.fileToBase64(file);
             }
-        } else {
-            fileData.data = await this.fileToBase64(file);
         }
 
         return fileData;
@@ -319,21 +318,6 @@ class EnhancedFileUploader {
         });
     }
 
-    /**
-     * Преобразование файла в base64
-     */
-    async fileToBase64(file) {
-        return new Promise((resolve) => {
-            const reader = new FileReader();
-            reader.onload = (e) => {
-                // Убираем префикс data:mime;base64,
-                const base64 = e.target.result.split(',')[1];
-                resolve(base64);
-            };
-            reader.readAsDataURL(file);
-        });
-    }
-
     /**
      * Отображение превью файла
      */
@@ -427,11 +411,11 @@ class EnhancedFileUploader {
      * Обновление данных формы
      */
     updateFormData() {
+        // Только метаданные – сами файлы уходят через appendToFormData
         const filesData = this.files.map(file => ({
             name: file.name,
             type: file.type,
-            size: file.size,
-            data: file.data
+            size: file.size
         }));
         
         // Обновляем глобальные данные формы
@@ -501,10 +485,20 @@ class EnhancedFileUploader {
             name: file.name,
             type: file.type,
             size: file.size,
-            data: file.data
+            blob: file.blob
         }));
     }
 
+    /**
+     * Добавление файлов в FormData для отправки на /submit
+     */
+    appendToFormData(formData, fieldName = 'files') {
+        this.files.forEach(file => {
+            formData.append(fieldName, file.blob, file.name);
+        });
+        return formData;
+    }
+
     /**
      * Очистка всех файлов
      */
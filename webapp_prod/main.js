@@ -332,30 +332,20 @@ function handleFiles(files) {
             return;
         }
         
-        const reader = new FileReader();
-        reader.onload = function(e) {
-            const fileData = {
-                name: file.name,
-                type: file.type,
-                size: file.size,
-                data: e.target.result.split(',')[1] // Base64 без префикса
-            };
-            
-            uploadedFiles.push(fileData);
-            formData.files = uploadedFiles;
-            
-            // Add preview
-            const preview = document.createElement('div');
-            preview.className = 'mobile-file-preview';
-            preview.innerHTML = `
-                <span class="mobile-file-name">${file.name}</span>
-                <span class="mobile-file-size">${(file.size/1024).toFixed(1)}KB</span>
-                <button type="button" onclick="removeFile(${uploadedFiles.length-1})" 
-                        class="mobile-file-remove">✕</button>
-            `;
-            fileList.appendChild(preview);
-        };
-        reader.readAsDataURL(file);
+        // Сам File уходит в multipart при отправке – без чтения в base64
+        uploadedFiles.push(file);
+        formData.files = uploadedFiles;
+        
+        // Add preview
+        const preview = document.createElement('div');
+        preview.className = 'mobile-file-preview';
+        preview.innerHTML = `
+            <span class="mobile-file-name">${file.name}</span>
+            <span class="mobile-file-size">${(file.size/1024).toFixed(1)}KB</span>
+            <button type="button" onclick="removeFile(${uploadedFiles.length-1})" 
+                    class="mobile-file-remove">✕</button>
+        `;
+        fileList.appendChild(preview);
     });
 }
 
@@ -512,13 +502,19 @@ async function submitForm() {
         console.log('Submitting to:', submitUrl);
         console.log('Form data:', formData);
         
+        // multipart/form-data: поля формы в "data" (JSON), файлы отдельными частями.
+        // Content-Type с boundary выставляет браузер.
+        const { files, ...fields } = formData;
+        const body = new FormData();
+        body.append('data', JSON.stringify(fields));
+        files.forEach(file => body.append('files', file, file.name));
+        
         const response = await fetch(submitUrl, {
             method: 'POST',
             headers: {
-                'Content-Type': 'application/json',
                 'Accept': 'application/json'
             },
-            body: JSON.stringify(formData)
+            body
         });
         
         console.log('Response status:', response.status);